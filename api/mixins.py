@@ -1,6 +1,18 @@
-from auctions import models
+import hashlib
+import itertools
+from django import http
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models as db_models
+from auctions import exports, models
 from authentication import models as auth_models
-from rest_framework import permissions
+from rest_framework import (
+    decorators, exceptions, permissions, renderers, serializers, status
+)
+from rest_framework.response import Response
+from rest_framework.reverse import reverse
+from . import renderers as api_renderers, throttling
 
 
 class MultipleSerializersMixin:
@@ -16,6 +28,150 @@ class MultipleSerializersMixin:
             self.action, self.serializer_class)
 
 
+class SparseFieldsSerializerMixin:
+    """
+    Drops the fields of a read left out of the `fields` query parameter, or
+    listed in the `omit` one, both comma separated, e.g.
+    `?fields=title,end_time`. Only the top level serializer, or the child of
+    a top level list, is pruned, so nested representations stay whole.
+
+    `select_related_fields` and `prefetch_related_fields` map field names to
+    the relations they read, and `annotated_fields` to the annotations they
+    read, by name, for `OptimizedQuerysetMixin`. The relations of nested
+    serializers need no declaration: a to-one relation is selected, and a
+    to-many one prefetched, along with what the nested serializer declares.
+    """
+    fields_query_param = 'fields'
+    omit_query_param = 'omit'
+    select_related_fields = {}
+    prefetch_related_fields = {}
+    annotated_fields = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or request.method not in permissions.SAFE_METHODS:
+            return fields
+        if self.parent is not None and not (
+                isinstance(self.parent, serializers.ListSerializer) and
+                self.parent.parent is None):
+            return fields
+        kept = _query_param_names(request, self.fields_query_param)
+        omitted = _query_param_names(request, self.omit_query_param)
+        for name in list(fields):
+            if (kept is not None and name not in kept) or \
+                    (omitted is not None and name in omitted):
+                del fields[name]
+        return fields
+
+    def get_related(self):
+        """Returns the relations to select and to prefetch, and the
+        annotations, read by the fields, following the nested serializers.
+        """
+        select, prefetch, annotations = [], [], {}
+        model = getattr(getattr(self, 'Meta', None), 'model', None)
+        for name, field in self.fields.items():
+            if field.write_only:
+                continue
+            select.extend(self.select_related_fields.get(name, ()))
+            prefetch.extend(self.prefetch_related_fields.get(name, ()))
+            annotations.update(self.annotated_fields.get(name, {}))
+            relation = _nested_relation(model, field)
+            if relation is None:
+                continue
+            nested = getattr(field, 'child', field)
+            nested_select, nested_prefetch, nested_annotations = \
+                nested.get_related() \
+                if isinstance(nested, SparseFieldsSerializerMixin) \
+                else ([], [], {})
+            source = field.source
+            if relation.one_to_many or relation.many_to_many:
+                prefetch.append(db_models.Prefetch(
+                    source,
+                    queryset=optimize_queryset(
+                        relation.related_model._default_manager.all(),
+                        nested_select, nested_prefetch, nested_annotations)))
+            else:
+                # The annotations of a joined relation can not be selected,
+                # its serializer falls back to a query of its own.
+                select.append(source)
+                select.extend(f'{source}__{lookup}' for lookup in nested_select)
+                prefetch.extend(
+                    _prefixed_prefetch(source, lookup)
+                    for lookup in nested_prefetch)
+        return select, prefetch, annotations
+
+
+def _query_param_names(request, param):
+    value = request.GET.get(param)
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def _nested_relation(model, field):
+    """Returns the relation of `model` represented by `field`, when it is a
+    nested serializer of a relation.
+    """
+    if model is None or not isinstance(
+            getattr(field, 'child', field), serializers.BaseSerializer):
+        return None
+    if field.source == '*' or '.' in field.source:
+        return None
+    try:
+        relation = model._meta.get_field(field.source)
+    except FieldDoesNotExist:
+        return None
+    return relation if relation.is_relation else None
+
+
+def _prefixed_prefetch(source, lookup):
+    if isinstance(lookup, db_models.Prefetch):
+        return db_models.Prefetch(
+            f'{source}__{lookup.prefetch_through}',
+            queryset=lookup.queryset, to_attr=lookup.to_attr)
+    return f'{source}__{lookup}'
+
+
+def optimize_queryset(queryset, select=(), prefetch=(), annotations=None):
+    """Returns `queryset` selecting and prefetching the relations, and
+    annotated with the annotations not already there.
+    """
+    if select:
+        queryset = queryset.select_related(*dict.fromkeys(select))
+    if prefetch:
+        queryset = queryset.prefetch_related(*dict.fromkeys(prefetch))
+    annotations = {
+        name: annotation
+        for name, annotation in (annotations or {}).items()
+        if name not in queryset.query.annotations
+    }
+    if annotations:
+        queryset = queryset.annotate(**annotations)
+    return queryset
+
+
+class OptimizedQuerysetMixin:
+    """
+    Selects and prefetches the relations, and annotates the values, read by
+    the fields of the serializer of the action, see
+    `SparseFieldsSerializerMixin`, so a list costs the same queries whatever
+    its size, and the fields left out of a sparse fieldset cost no join nor
+    query.
+
+    The serializers of another model, such as those of the nested writes,
+    are ignored.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer = self.get_serializer()
+        if not isinstance(serializer, SparseFieldsSerializerMixin) or \
+                getattr(serializer.Meta, 'model', None) is not queryset.model:
+            return queryset
+        return optimize_queryset(queryset, *serializer.get_related())
+
+
 class ListingSerializerMixin:
     def get_category(self, obj):
         if not hasattr(obj, 'id') or not isinstance(obj, models.Listing):
@@ -23,8 +179,165 @@ class ListingSerializerMixin:
         return obj.category.name
 
 
+class ValuesListMixin:
+    """
+    Serves the list action from the `values()` rows of the queryset with
+    `values_serializer_class`, see `serializers.ValuesSerializer`, instead
+    of model instances and the serializer of the view.
+    """
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        return self.values_list_response(
+            self.filter_queryset(self.get_queryset()))
+
+    def values_list_response(self, queryset):
+        serializer = self.values_serializer_class(
+            context=self.get_serializer_context())
+        queryset = serializer.select(queryset)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(queryset))
+
+
+class StreamingListMixin:
+    """
+    Streams the unpaginated list action as a JSON array, serializing the
+    rows of a server-side cursor `stream_chunk_size` at a time, so the
+    memory of a request does not grow with the collection.
+
+    Other renderers, such as the browsable API, get the whole list.
+    """
+    stream_chunk_size = 1000
+
+    def list(self, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        if self.paginator is not None or \
+                not isinstance(renderer, renderers.JSONRenderer):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return http.StreamingHttpResponse(
+            self.stream_list(queryset, renderer),
+            content_type=renderer.media_type)
+
+    def stream_list(self, queryset, renderer):
+        rows = queryset.iterator(chunk_size=self.stream_chunk_size)
+        separator = b'['
+        while True:
+            chunk = list(itertools.islice(rows, self.stream_chunk_size))
+            if not chunk:
+                break
+            data = self.get_serializer(chunk, many=True).data
+            # Each chunk is rendered as an array, without its brackets.
+            yield separator + renderer.render(data)[1:-1]
+            separator = b','
+        yield b'[]' if separator == b'[' else b']'
+
+
+class ExportMixin:
+    """
+    Exports the rows of the view as NDJSON or CSV, see `auctions.exports`,
+    filtered by `since`, `until` and `listing` (a list of ids), and scoped
+    to the owner given by `export_scope`, a mapping of export filters to
+    URL keyword arguments.
+
+    A GET streams the export, in the format negotiated with the `Accept`
+    header or the `format` query parameter. A POST, with the format and the
+    filters in its body, queues the export as a job written to a media
+    file, whose progress is served by the `export-job` action.
+    """
+    export_kind = None
+    export_scope = {}
+
+    def get_export_filters(self, params):
+        try:
+            return exports.parse_filters(
+                since=params.get('since'),
+                until=params.get('until'),
+                listings=params.get('listing'),
+                **{
+                    name: self.kwargs[kwarg]
+                    for name, kwarg in self.export_scope.items()
+                },
+            )
+        except ValueError as error:
+            raise exceptions.ValidationError({'detail': str(error)})
+
+    @decorators.action(
+        detail=False,
+        methods=['get', 'post'],
+        renderer_classes=[
+            api_renderers.ORJSONRenderer,
+            api_renderers.NDJSONRenderer,
+            api_renderers.CSVRenderer,
+        ],
+    )
+    def export(self, request, **kwargs):
+        if request.method == 'POST':
+            return self.start_export(request)
+        filters = self.get_export_filters(request.query_params)
+        format = request.accepted_renderer.format
+        if format not in exports.FORMATS:
+            format = 'ndjson'
+        response = http.StreamingHttpResponse(
+            exports.stream(self.export_kind, format, filters),
+            content_type=exports.FORMATS[format])
+        response['Content-Disposition'] = 'attachment; filename="' + \
+            exports.filename(self.export_kind, format) + '"'
+        return response
+
+    def start_export(self, request):
+        format = request.data.get('format', 'ndjson')
+        if format not in exports.FORMATS:
+            raise exceptions.ValidationError({
+                'format': [f"Must be one of {', '.join(exports.FORMATS)}."]
+            })
+        filters = self.get_export_filters(request.data)
+        job = exports.start(self.export_kind, format, filters, request.user)
+        url = reverse(
+            f'{self.basename}-export-job',
+            kwargs={
+                **{kwarg: self.kwargs[kwarg]
+                   for kwarg in self.export_scope.values()},
+                'job': job,
+            },
+            request=request
+        )
+        return Response(
+            {'job': job, 'status': exports.PENDING, 'url': url},
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': url}
+        )
+
+    @decorators.action(
+        detail=False,
+        methods=['get'],
+        url_path=r'export/(?P<job>[0-9a-f-]+)',
+        url_name='export-job',
+    )
+    def export_job(self, request, job, **kwargs):
+        state = exports.status(job)
+        if state is None or state['user'] != request.user.id or \
+                state['kind'] != self.export_kind:
+            raise http.Http404
+        data = {'job': job}
+        data.update(
+            (key, state[key]) for key in (
+                'status', 'format', 'rows', 'total', 'url', 'detail')
+            if key in state
+        )
+        return Response(data)
+
+
 class ListingQuerysetMixin:
 
+    def get_throttles(self):
+        throttles = super().get_throttles()
+        if self.action == 'list' and 'q' in self.request.GET:
+            throttles.append(throttling.TokenBucketThrottle('search'))
+        return throttles
+
     def get_queryset(self):
         queryset = super().get_queryset()
         if self.action == 'list':
@@ -35,3 +348,80 @@ class ListingQuerysetMixin:
             if category is not None:
                 queryset = queryset.from_category(category)
         return queryset
+
+
+class IdempotentCreateMixin:
+    """
+    Replays the response of a create request retried with the same
+    `Idempotency-Key` header, from the cache, instead of creating again.
+
+    Keys are scoped by path and by user (or address, for anonymous users),
+    and remembered for `IDEMPOTENCY_KEY_TTL` seconds along with a digest of
+    the request body, so a key reused for another request is refused.
+
+    Views creating in another way, such as queueing the creation, override
+    `create_response` instead of `create`, so their responses are replayed
+    as well.
+    """
+
+    idempotency_header = 'Idempotency-Key'
+
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get(self.idempotency_header)
+        if not key:
+            return self.create_response(request, *args, **kwargs)
+
+        cache_key = self.get_idempotency_cache_key(request, key)
+        digest = hashlib.sha256(request.body).hexdigest()
+        stored = cache.get(cache_key)
+        if stored is None and cache.add(
+                cache_key, {'digest': digest},
+                timeout=settings.IDEMPOTENCY_KEY_TTL):
+            return self.create_once(request, cache_key, digest, *args, **kwargs)
+
+        stored = stored or cache.get(cache_key) or {}
+        if stored.get('digest') != digest:
+            raise exceptions.ValidationError({
+                'detail': f"The {self.idempotency_header} was used by "
+                "another request."
+            })
+        if 'status' not in stored:
+            return Response(
+                {'detail': "A request with this key is in progress."},
+                status=status.HTTP_409_CONFLICT
+            )
+        response = Response(
+            stored['data'], status=stored['status'], headers=stored['headers'])
+        response['Idempotent-Replayed'] = 'true'
+        return response
+
+    def create_once(self, request, cache_key, digest, *args, **kwargs):
+        try:
+            response = self.create_response(request, *args, **kwargs)
+        except exceptions.APIException as error:
+            response = self.handle_exception(error)
+        except Exception:
+            # Left for the retry to run again.
+            cache.delete(cache_key)
+            raise
+        if response.status_code >= 500:
+            cache.delete(cache_key)
+        else:
+            cache.set(cache_key, {
+                'digest': digest,
+                'status': response.status_code,
+                'data': response.data,
+                'headers': {
+                    name: value for name, value in response.items()
+                    if name in ('Location', 'Retry-After')
+                },
+            }, timeout=settings.IDEMPOTENCY_KEY_TTL)
+        return response
+
+    def create_response(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    def get_idempotency_cache_key(self, request, key):
+        owner = request.user.pk if request.user.is_authenticated \
+            else request.META.get('REMOTE_ADDR')
+        return f'idempotency:{request.path}:{owner}:{key}'
@@ -0,0 +1,82 @@
+from collections import OrderedDict
+from rest_framework import exceptions, pagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils import urls
+from auctions import pagination as keyset
+
+
+class KeysetPagination(pagination.BasePagination):
+    """
+    Cursor pagination on a unique ordering key, e.g. `('end_time', 'id')`,
+    using `auctions.pagination.KeysetPaginator`. Responses carry the next
+    and previous links only, so the collection is never counted.
+    """
+    ordering = None
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_ordering(self, request, queryset, view):
+        return self.ordering
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        paginator = keyset.KeysetPaginator(
+            self.get_ordering(request, queryset, view),
+            self.get_page_size(request),
+        )
+        try:
+            self.page = paginator.paginate(
+                queryset, request.query_params.get(self.cursor_query_param))
+        except keyset.InvalidCursor:
+            raise exceptions.NotFound(self.invalid_cursor_message)
+        return list(self.page)
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return urls.replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self.get_link(self.page.next_cursor)
+
+    def get_previous_link(self):
+        return self.get_link(self.page.previous_cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+
+class ListingPagination(KeysetPagination):
+
+    def get_ordering(self, request, queryset, view):
+        return keyset.listing_ordering(queryset)
+
+
+class BidPagination(KeysetPagination):
+    ordering = ('-creation_time', '-id')
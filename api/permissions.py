@@ -8,7 +8,7 @@ class ListingPermission(permissions.IsAuthenticatedOrReadOnly):
             return True
         return bool(
             view.action in ('update', 'partial_update') and
-            request.user == obj.author
+            request.user.id == obj.author_id
         )
 
 
@@ -22,7 +22,7 @@ class QuestionPermission(permissions.IsAuthenticatedOrReadOnly):
             request.user == obj.user
         ) or bool(
             view.action == 'answer' and
-            request.user == obj.listing.author
+            request.user.id == obj.listing.author_id
         )
 
 
@@ -0,0 +1,64 @@
+import csv
+import io
+import orjson
+from rest_framework import renderers
+from rest_framework.utils import encoders
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    """
+    Renders JSON with orjson, with the same output as `JSONRenderer`.
+
+    Dates and times, and the types orjson does not know, such as lazy
+    strings and decimals, are passed to the encoder of `JSONRenderer`.
+    Indented responses are left to `JSONRenderer`.
+    """
+    options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+    default = encoders.JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = orjson.dumps(data, default=self.default, option=self.options)
+        # Escaped like `JSONRenderer` does, to be valid JavaScript.
+        return ret.replace(
+            b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class NDJSONRenderer(renderers.BaseRenderer):
+    """
+    Negotiates the NDJSON exports, see `mixins.ExportMixin`, and renders
+    their other responses, such as errors, as a single line.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return orjson.dumps(
+            data, default=ORJSONRenderer.default,
+            option=orjson.OPT_APPEND_NEWLINE)
+
+
+class CSVRenderer(renderers.BaseRenderer):
+    """
+    Negotiates the CSV exports, see `mixins.ExportMixin`, and renders their
+    other responses, such as errors, as a header and a row.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not data:
+            return b''
+        if not isinstance(data, dict):
+            data = {'detail': data}
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(data)
+        writer.writerow(data.values())
+        return output.getvalue().encode(self.charset)
@@ -1,3 +1,7 @@
+import operator
+import types
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from rest_framework import serializers, exceptions, relations, reverse as uri
 from rest_framework_extensions import serializers as extended_serializers
 from auctions import models
@@ -33,7 +37,8 @@ class ParameterisedHyperlinkedIdentityField(
                            format=format)
 
 
-class BidAbstractSerializer(serializers.ModelSerializer):
+class BidAbstractSerializer(mixins.SparseFieldsSerializerMixin,
+                            serializers.ModelSerializer):
     on = serializers.DateTimeField(source='creation_time', read_only=True)
     user = auth_serializers.UserSerializer(read_only=True)
 
@@ -46,7 +51,41 @@ class BidAbstractSerializer(serializers.ModelSerializer):
         ]
 
 
-class ListingAbstractSerializer(serializers.ModelSerializer,
+class ListingBidSerializer(BidAbstractSerializer):
+    max_value = serializers.DecimalField(
+        max_digits=9, decimal_places=2, required=False, allow_null=True,
+        write_only=True)
+
+    class Meta(BidAbstractSerializer.Meta):
+        fields = BidAbstractSerializer.Meta.fields + ['max_value']
+
+    def validate(self, data):
+        if (data.get('max_value') is not None and
+                data['max_value'] < data['value']):
+            raise serializers.ValidationError({
+                'max_value': ["The maximum bid can not be lower than the bid."]
+            })
+        return data
+
+
+class CurrentBidSerializer(serializers.Serializer):
+    """
+    Represents the current bid of a listing from its denormalized columns,
+    with the same shape as `BidAbstractSerializer`.
+    """
+    value = serializers.DecimalField(
+        source='current_price', max_digits=9, decimal_places=2)
+    user = auth_serializers.UserSerializer(source='current_bidder')
+    on = serializers.DateTimeField(source='current_bid_time')
+
+    def to_representation(self, instance):
+        if instance.current_bidder_id is None:
+            return None
+        return super().to_representation(instance)
+
+
+class ListingAbstractSerializer(mixins.SparseFieldsSerializerMixin,
+                                serializers.ModelSerializer,
                                 mixins.MultipleSerializersMixin):
 
     url = serializers.HyperlinkedIdentityField(
@@ -54,7 +93,8 @@ class ListingAbstractSerializer(serializers.ModelSerializer,
         lookup_field='pk',
         read_only=True
     )
-    current_bid = BidAbstractSerializer(source='bids.first', read_only=True)
+    current_bid = CurrentBidSerializer(source='*', read_only=True)
+    select_related_fields = {'current_bid': ['current_bidder']}
 
     class Meta:
         model = models.Listing
@@ -75,7 +115,123 @@ class ListingAbstractSerializer(serializers.ModelSerializer,
         }
 
 
-class BidSerializer(serializers.ModelSerializer):
+class ValuesSerializer:
+    """
+    Represents the `values()` rows of a queryset like `serializer_class`
+    represents its instances, for the list actions.
+
+    The accessor of each field is built once per serializer: scalar fields
+    use the `to_representation` of the matching field of `serializer_class`
+    on their column, and hyperlinks fill in a URL reversed once with
+    placeholders. Other fields need a `get_<field>_accessor(field)` method,
+    which adds the columns it reads to `selected`.
+
+    The fields of `serializer_class` are pruned by the sparse fieldset of
+    the request, and so are the columns, and the joins they need.
+    """
+    serializer_class = None
+
+    def __init__(self, context=None):
+        self.context = context or {}
+        fields = self.serializer_class(context=self.context).fields
+        self.accessors = []
+        self.selected = {'id'}
+        for name, field in fields.items():
+            if field.write_only:
+                continue
+            accessor = getattr(self, f'get_{name}_accessor', None)
+            if accessor is not None:
+                self.accessors.append((name, accessor(field)))
+            elif isinstance(field, relations.HyperlinkedIdentityField):
+                self.accessors.append((name, self.get_url_accessor(field)))
+            elif isinstance(field, relations.RelatedField):
+                self.selected.add(field.source)
+                self.accessors.append(
+                    (name, operator.itemgetter(field.source)))
+            elif isinstance(field, serializers.Serializer) or \
+                    field.source == '*' or '.' in field.source:
+                raise TypeError(
+                    f"{type(self).__name__} can not represent the field "
+                    f"{name!r}, add a get_{name}_accessor method.")
+            else:
+                self.selected.add(field.source)
+                self.accessors.append(
+                    (name, self.get_column_accessor(field, field.source)))
+
+    def select(self, queryset):
+        """Returns the rows of `queryset` the serializer reads, with its
+        annotations, such as the search rank the pagination orders by.
+        """
+        return queryset.values(*self.selected, *queryset.query.annotations)
+
+    def serialize(self, rows):
+        accessors = self.accessors
+        return [
+            {name: accessor(row) for name, accessor in accessors}
+            for row in rows
+        ]
+
+    @staticmethod
+    def get_column_accessor(field, column):
+        to_representation = field.to_representation
+
+        def accessor(row):
+            value = row[column]
+            return None if value is None else to_representation(value)
+        return accessor
+
+    def get_url_accessor(self, field):
+        if isinstance(field, ParameterisedHyperlinkedIdentityField):
+            lookups = [lookup for lookup, _ in field.lookup_fields]
+        else:
+            lookups = [field.lookup_field]
+        columns = ['id' if lookup == 'pk' else lookup for lookup in lookups]
+        self.selected.update(columns)
+        placeholders = types.SimpleNamespace(**{
+            lookup: f'__{column}__'
+            for lookup, column in zip(lookups, columns)
+        })
+        url = field.get_url(
+            placeholders, field.view_name, self.context.get('request'),
+            self.context.get('format'))
+        template = url.replace('{', '{{').replace('}', '}}')
+        for column in columns:
+            template = template.replace(f'__{column}__', f'{{{column}}}')
+        return template.format_map
+
+
+class ListingValuesSerializer(ValuesSerializer):
+    serializer_class = ListingAbstractSerializer
+
+    def get_current_bid_accessor(self, field):
+        self.selected.update((
+            'current_price',
+            'current_bid_time',
+            'current_bidder',
+            'current_bidder__first_name',
+            'current_bidder__last_name',
+            'current_bidder__email',
+        ))
+        value = self.get_column_accessor(
+            field.fields['value'], 'current_price')
+        on = self.get_column_accessor(field.fields['on'], 'current_bid_time')
+
+        def accessor(row):
+            if row['current_bidder'] is None:
+                return None
+            # Same as `User.get_full_name()`.
+            name = (f"{row['current_bidder__first_name']} "
+                    f"{row['current_bidder__last_name']}").strip()
+            return {
+                'value': value(row),
+                'user': {'name': name, 'email': row['current_bidder__email']},
+                'on': on(row),
+            }
+        return accessor
+
+
+class BidSerializer(mixins.SparseFieldsSerializerMixin,
+                    serializers.ModelSerializer):
     on = serializers.DateTimeField(source='creation_time', read_only=True)
     user = auth_serializers.UserSerializer(read_only=True)
     listing = ListingAbstractSerializer(read_only=True)
@@ -91,14 +247,16 @@ class BidSerializer(serializers.ModelSerializer):
 
 
 class ListingSerializer(
+        mixins.SparseFieldsSerializerMixin,
         mixins.ListingSerializerMixin,
         serializers.ModelSerializer):
 
     url = ParameterisedHyperlinkedIdentityField(
         view_name='dashboard-listings-detail',
-        lookup_fields=(('author.pk', 'parent_lookup_author'), ('pk', 'pk')),
+        lookup_fields=(('author_id', 'parent_lookup_author'), ('pk', 'pk')),
     )
-    current_bid = BidAbstractSerializer(source='bids.first', read_only=True)
+    current_bid = CurrentBidSerializer(source='*', read_only=True)
+    select_related_fields = {'current_bid': ['current_bidder']}
 
     class Meta:
         model = models.Listing
@@ -112,18 +270,27 @@ class ListingSerializer(
         ]
 
 
+class DashboardListingValuesSerializer(ListingValuesSerializer):
+    serializer_class = ListingSerializer
+
+
 class ListingDetailSerializer(
+        mixins.SparseFieldsSerializerMixin,
         mixins.ListingSerializerMixin,
         serializers.ModelSerializer):
 
     author = auth_serializers.UserSerializer(read_only=True)
     category = serializers.SerializerMethodField(read_only=True)
-    current_bid = BidAbstractSerializer(source='bids.first')
+    current_bid = CurrentBidSerializer(source='*', read_only=True)
     all_bids = serializers.HyperlinkedIdentityField(
         view_name='listing-bids-list',
         lookup_field='pk',
         lookup_url_kwarg='parent_lookup_listing'
     )
+    select_related_fields = {
+        'category': ['category'],
+        'current_bid': ['current_bidder'],
+    }
 
     class Meta:
         model = models.Listing
@@ -135,6 +302,7 @@ class ListingDetailSerializer(
             'category',
             'initial_price',
             'current_bid',
+            'bid_count',
             'all_bids',
             'creation_time',
             'end_time',
@@ -143,6 +311,7 @@ class ListingDetailSerializer(
 
 
 class ListingUpdateSerializer(
+        mixins.SparseFieldsSerializerMixin,
         extended_serializers.PartialUpdateSerializerMixin,
         serializers.ModelSerializer,
         mixins.ListingSerializerMixin):
@@ -150,6 +319,7 @@ class ListingUpdateSerializer(
     category = serializers.SerializerMethodField(read_only=True)
     ended = serializers.BooleanField(source='ended_manually')
     bids = BidAbstractSerializer(read_only=True, many=True)
+    select_related_fields = {'category': ['category']}
 
     class Meta:
         model = models.Listing
@@ -182,7 +352,8 @@ class ListingUpdateSerializer(
         return data
 
 
-class AnswerSerializer(serializers.ModelSerializer):
+class AnswerSerializer(mixins.SparseFieldsSerializerMixin,
+                       serializers.ModelSerializer):
     on = serializers.DateTimeField(source='time', read_only=True)
     author = auth_serializers.UserSerializer(read_only=True)
 
@@ -195,10 +366,12 @@ class AnswerSerializer(serializers.ModelSerializer):
         ]
 
 
-class QuestionSerializer(serializers.ModelSerializer):
+class QuestionSerializer(mixins.SparseFieldsSerializerMixin,
+                         serializers.ModelSerializer):
     on = serializers.DateTimeField(source='time', read_only=True)
     user = serializers.CharField(source='user.get_full_name', read_only=True)
     answer = AnswerSerializer(read_only=True)
+    select_related_fields = {'user': ['user']}
 
     class Meta:
         model = models.Question
@@ -211,7 +384,17 @@ class QuestionSerializer(serializers.ModelSerializer):
         ]
 
 
-class DashboardSerializer(serializers.ModelSerializer):
+def _count(model, field):
+    """Returns the number of rows of `model` whose `field` is the outer
+    row, as a subquery, so several counts do not multiply each other.
+    """
+    count = model.objects.filter(**{field: OuterRef('pk')}).order_by() \
+        .values(field).annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(count), Value(0))
+
+
+class DashboardSerializer(mixins.SparseFieldsSerializerMixin,
+                          serializers.ModelSerializer):
     listings = serializers.SerializerMethodField(
         method_name='get_listings_url'
     )
@@ -222,6 +405,11 @@ class DashboardSerializer(serializers.ModelSerializer):
     bids_count = serializers.SerializerMethodField()
     watchlist = serializers.SerializerMethodField()
     wins = serializers.SerializerMethodField()
+    annotated_fields = {
+        'listings_count': {
+            'listings_count': _count(models.Listing, 'author')},
+        'bids_count': {'bids_count': _count(models.Bid, 'user')},
+    }
 
     class Meta:
         model = auth_models.User
@@ -240,6 +428,8 @@ class DashboardSerializer(serializers.ModelSerializer):
         return uri.reverse('dashboard-listings-list', kwargs=kwargs)
 
     def get_listings_count(self, obj):
+        if hasattr(obj, 'listings_count'):
+            return obj.listings_count
         return obj.listings.count()
 
     def get_bids_url(self, obj):
@@ -247,6 +437,8 @@ class DashboardSerializer(serializers.ModelSerializer):
         return uri.reverse('dashboard-bids-list', kwargs=kwargs)
 
     def get_bids_count(self, obj):
+        if hasattr(obj, 'bids_count'):
+            return obj.bids_count
         return obj.bids.count()
 
     def get_watchlist(self, obj):
@@ -0,0 +1,25 @@
+from rest_framework import throttling
+from auctions import throttling as token_buckets
+
+
+class TokenBucketThrottle(throttling.BaseThrottle):
+    """
+    Throttles the requests in a scope of `THROTTLE_RATES`, given or taken
+    from the `throttle_scope` of the view, per user and per IP address.
+    """
+
+    def __init__(self, scope=None):
+        self.scope = scope
+        self.wait_time = 0
+
+    def allow_request(self, request, view):
+        scope = self.scope or getattr(view, 'throttle_scope', None)
+        if scope is None:
+            return True
+        user_id = request.user.id if request.user.is_authenticated else None
+        self.wait_time = token_buckets.consume(
+            token_buckets.buckets(scope, user_id, self.get_ident(request)))
+        return not self.wait_time
+
+    def wait(self):
+        return self.wait_time
@@ -4,27 +4,37 @@ from rest_framework import (
     decorators,
     status,
     generics,
+    exceptions,
 )
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 from rest_framework_extensions import mixins as extension_mixins
-from . import serializers, permissions as api_permissions
+from . import (
+    pagination, serializers, throttling, permissions as api_permissions
+)
 from rest_framework import permissions
 from . import mixins as api_mixins
-from auctions import models
+from auctions import bidding, intake, models
 from authentication import models as auth_models
 
+from django import http
 from django.shortcuts import get_object_or_404
 
 
-class BidsViewSet(viewsets.GenericViewSet,
+class BidsViewSet(api_mixins.OptimizedQuerysetMixin,
+                  viewsets.GenericViewSet,
                   mixins.ListModelMixin):
 
     queryset = models.Bid.objects.all()
     serializer_class = serializers.BidSerializer
     permission_classes = (permissions.IsAuthenticated,)
+    pagination_class = pagination.BidPagination
 
 
-class ListingViewSet(extension_mixins.DetailSerializerMixin,
+class ListingViewSet(api_mixins.OptimizedQuerysetMixin,
+                     extension_mixins.DetailSerializerMixin,
+                     api_mixins.IdempotentCreateMixin,
+                     api_mixins.ValuesListMixin,
                      api_mixins.ListingQuerysetMixin,
                      mixins.ListModelMixin,
                      mixins.RetrieveModelMixin,
@@ -32,19 +42,64 @@ class ListingViewSet(extension_mixins.DetailSerializerMixin,
                      mixins.UpdateModelMixin,
                      viewsets.GenericViewSet):
 
-    queryset = models.Listing.objects.active()
-    queryset_detail = queryset.prefetch_related('bids')
+    queryset = models.Listing.objects.all()
+    queryset_detail = queryset
     permission_classes = (api_permissions.ListingPermission,)
+    pagination_class = pagination.ListingPagination
     serializer_class = serializers.ListingAbstractSerializer
     serializer_detail_class = serializers.ListingDetailSerializer
+    values_serializer_class = serializers.ListingValuesSerializer
+    batch_max_size = 100
+    # The largest primary key the database takes, larger ids are refused.
+    batch_max_id = 2 ** 63 - 1
+    # Set by the throttled actions.
+    throttle_scope = None
+
+    def get_queryset(self):
+        # Filtered per request, as `active()` depends on the current time.
+        return super().get_queryset().active()
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @decorators.action(
+        detail=False,
+        methods=['get'],
+        serializer_class=serializers.ListingDetailSerializer,
+    )
+    def batch(self, request, **kwargs):
+        """Retrieves the listings of the `ids` query parameter, comma
+        separated, in their order, with a constant number of queries. The
+        ids of the listings not found are listed in `missing`.
+        """
+        values = request.query_params.get('ids', '').split(',')
+        try:
+            ids = list(dict.fromkeys(int(pk) for pk in values if pk.strip()))
+            if any(not 0 < pk <= self.batch_max_id for pk in ids):
+                raise ValueError
+        except ValueError:
+            raise exceptions.ValidationError(
+                {'ids': ["Must be a comma separated list of ids."]})
+        if not ids:
+            raise exceptions.ValidationError(
+                {'ids': ["This field is required."]})
+        if len(ids) > self.batch_max_size:
+            raise exceptions.ValidationError({'ids': [
+                f"Ensure there are no more than {self.batch_max_size} ids."]})
+        listings = self.get_queryset().in_bulk(ids)
+        serializer = self.get_serializer(
+            [listings[pk] for pk in ids if pk in listings], many=True)
+        return Response({
+            'results': serializer.data,
+            'missing': [pk for pk in ids if pk not in listings],
+        })
+
     @decorators.action(
         detail=False,
         methods=['post'],
         name='Watch Listing',
+        throttle_classes=[throttling.TokenBucketThrottle],
+        throttle_scope='watch',
     )
     def watch(self, request, **kwargs):
         listing = generics.get_object_or_404(
@@ -58,24 +113,89 @@ class ListingViewSet(extension_mixins.DetailSerializerMixin,
 
 
 class ListingBidsViewSet(extension_mixins.NestedViewSetMixin,
+                         api_mixins.IdempotentCreateMixin,
+                         api_mixins.StreamingListMixin,
                          mixins.CreateModelMixin,
                          mixins.RetrieveModelMixin,
                          mixins.DestroyModelMixin,
                          BidsViewSet):
 
-    serializer_class = serializers.BidAbstractSerializer
+    serializer_class = serializers.ListingBidSerializer
     pagination_class = None
 
+    def get_throttles(self):
+        throttles = super().get_throttles()
+        if self.action == 'create':
+            throttles.append(throttling.TokenBucketThrottle('bids'))
+        return throttles
+
+    def create_response(self, request, *args, **kwargs):
+        if not intake.enabled():
+            return super().create_response(request, *args, **kwargs)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        listing_id = self.kwargs.get('parent_lookup_listing')
+        if not models.Listing.objects.filter(pk=listing_id).exists():
+            raise http.Http404
+        ticket = intake.submit(
+            listing_id,
+            request.user,
+            serializer.validated_data['value'],
+            serializer.validated_data.get('max_value'),
+        )
+        url = reverse(
+            'listing-bids-ticket',
+            kwargs={'parent_lookup_listing': listing_id, 'ticket': ticket},
+            request=request
+        )
+        return Response(
+            {'ticket': ticket, 'status': intake.PENDING, 'url': url},
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': url}
+        )
+
+    @decorators.action(
+        detail=False,
+        methods=['get'],
+        url_path=r'tickets/(?P<ticket>[0-9a-f-]+)',
+        url_name='ticket',
+    )
+    def ticket(self, request, ticket, **kwargs):
+        state = intake.status(ticket)
+        if (state is None or state['user'] != request.user.id or
+                str(state['listing']) != kwargs.get('parent_lookup_listing')):
+            raise http.Http404
+        data = {'ticket': ticket, 'status': state['status']}
+        if 'detail' in state:
+            data['detail'] = state['detail']
+        if 'bid' in state:
+            bid = get_object_or_404(
+                models.Bid.objects.select_related('user'), pk=state['bid'])
+            data['bid'] = serializers.BidAbstractSerializer(
+                bid, context=self.get_serializer_context()).data
+        return Response(data)
+
     def perform_create(self, serializer):
-        serializer.save(
-            user=self.request.user,
-            listing=models.Listing.objects.get(
-                pk=self.kwargs.get('parent_lookup_listing')
+        try:
+            serializer.instance = bidding.place_bid(
+                self.kwargs.get('parent_lookup_listing'),
+                self.request.user,
+                serializer.validated_data['value'],
+                serializer.validated_data.get('max_value'),
             )
-        )
+        except models.Listing.DoesNotExist:
+            raise http.Http404
+        except bidding.BidRejected as error:
+            raise exceptions.ValidationError({'value': [str(error)]})
 
+    def perform_destroy(self, instance):
+        bidding.withdraw_bid(instance)
 
-class ListingQuestionsViewSet(extension_mixins.NestedViewSetMixin,
+
+class ListingQuestionsViewSet(api_mixins.OptimizedQuerysetMixin,
+                              extension_mixins.NestedViewSetMixin,
+                              api_mixins.StreamingListMixin,
                               viewsets.ModelViewSet):
 
     queryset = models.Question.objects.all()
@@ -99,7 +219,9 @@ class ListingQuestionsViewSet(extension_mixins.NestedViewSetMixin,
         lookup_url_kwarg='parent_lookup_listing'
     )
     def answer(self, request, **kwargs):
-        question = get_object_or_404(models.Question, pk=kwargs.get('pk'))
+        question = get_object_or_404(
+            models.Question.objects.select_related('listing'),
+            pk=kwargs.get('pk'))
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         self.check_object_permissions(request, question)
@@ -108,16 +230,20 @@ class ListingQuestionsViewSet(extension_mixins.NestedViewSetMixin,
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
-class DashboardViewSet(api_mixins.MultipleSerializersMixin,
+class DashboardViewSet(api_mixins.OptimizedQuerysetMixin,
+                       api_mixins.MultipleSerializersMixin,
+                       api_mixins.ValuesListMixin,
                        viewsets.GenericViewSet):
 
     queryset = auth_models.User.objects.all()
     permission_classes = (api_permissions.DashboardPermission,)
+    pagination_class = pagination.ListingPagination
     serializer_classes = {
         'home': serializers.DashboardSerializer,
         'watchlist': serializers.ListingSerializer,
         'wins': serializers.ListingSerializer
     }
+    values_serializer_class = serializers.DashboardListingValuesSerializer
 
     @decorators.action(
         detail=True,
@@ -125,7 +251,9 @@ class DashboardViewSet(api_mixins.MultipleSerializersMixin,
         name="Dashboard Home"
     )
     def home(self, request, **kwargs):
-        return Response(self.get_serializer(request.user).data,
+        # The user is read again with the annotations of the serializer.
+        user = self.get_queryset().get(pk=request.user.pk)
+        return Response(self.get_serializer(user).data,
                         status=status.HTTP_200_OK)
 
     @decorators.action(
@@ -133,25 +261,21 @@ class DashboardViewSet(api_mixins.MultipleSerializersMixin,
         methods=['get'],
     )
     def watchlist(self, request, **kwargs):
-        queryset = request.user.watchlist.active()
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return self.values_list_response(request.user.watchlist.active())
 
     @decorators.action(
         detail=True,
         methods=['get']
     )
     def wins(self, request, **kwargs):
-        return Response(self.get_serializer(request.user.wins).data,
-                        status=status.HTTP_200_OK)
+        return self.values_list_response(request.user.wins.all())
 
 
-class DashboardListingsViewSet(extension_mixins.NestedViewSetMixin,
+class DashboardListingsViewSet(api_mixins.OptimizedQuerysetMixin,
+                               extension_mixins.NestedViewSetMixin,
+                               api_mixins.ExportMixin,
                                extension_mixins.DetailSerializerMixin,
+                               api_mixins.ValuesListMixin,
                                api_mixins.ListingQuerysetMixin,
                                mixins.ListModelMixin,
                                mixins.RetrieveModelMixin,
@@ -159,15 +283,27 @@ class DashboardListingsViewSet(extension_mixins.NestedViewSetMixin,
                                viewsets.GenericViewSet):
 
     queryset = models.Listing.objects.all()
-    queryset_detail = queryset.prefetch_related('bids')
+    queryset_detail = queryset
     permission_classes = (
         api_permissions.DashboardPermission,
         api_permissions.ListingPermission,
     )
     serializer_class = serializers.ListingSerializer
     serializer_detail_class = serializers.ListingUpdateSerializer
+    values_serializer_class = serializers.DashboardListingValuesSerializer
+    export_kind = 'listings'
+    export_scope = {'author': 'parent_lookup_author'}
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        # The update drops the prefetched bids, so the listing is serialized
+        # from a fresh copy instead.
+        serializer.instance = self.get_queryset().get(pk=serializer.instance.pk)
 
 
 class DashboardBidsViewSet(extension_mixins.NestedViewSetMixin,
+                           api_mixins.ExportMixin,
                            BidsViewSet):
     permission_classes = (api_permissions.DashboardPermission,)
+    export_kind = 'bids'
+    export_scope = {'bidder': 'parent_lookup_user'}
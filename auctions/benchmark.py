@@ -0,0 +1,108 @@
+import contextlib
+import statistics
+import threading
+import time
+from django.db import connection, connections
+
+
+@contextlib.contextmanager
+def test_database(keepdb=False, verbosity=0):
+    """Runs the block against a throwaway test database created from the
+    default database settings, so benchmarks never touch real data.
+    """
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(
+        verbosity=verbosity, autoclobber=True, keepdb=keepdb)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(
+            old_name, verbosity=verbosity, keepdb=keepdb)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    index = min(len(values) - 1, round(fraction * (len(values) - 1)))
+    return values[index]
+
+
+def summarize(timings):
+    """Summarizes a list of timings, in seconds, as milliseconds.
+    """
+    return {
+        'count': len(timings),
+        'mean': statistics.fmean(timings) * 1000,
+        'p50': percentile(timings, 0.50) * 1000,
+        'p99': percentile(timings, 0.99) * 1000,
+        'max': max(timings) * 1000,
+    }
+
+
+def measure(func, repeat=10):
+    """Calls `func` `repeat` times and summarizes the timings.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return summarize(timings)
+
+
+def run_concurrently(workers, target):
+    """Calls `target(index)` from `workers` threads released together, and
+    returns their results and the wall time from their release until the
+    last one returns.
+
+    Each thread has its own database connection, closed when it is done.
+    """
+    barrier = threading.Barrier(workers + 1)
+    results = [None] * workers
+    errors = []
+
+    def run(index):
+        try:
+            barrier.wait()
+            results[index] = target(index)
+        except Exception as error:
+            errors.append(error)
+        finally:
+            connections.close_all()
+
+    threads = [
+        threading.Thread(target=run, args=(index,)) for index in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if errors:
+        raise errors[0]
+    return results, elapsed
+
+
+def compare(previous, current, tolerance=0.2):
+    """Returns the regressions of a benchmark report from a previous one: a
+    throughput lower, or a latency or number of queries higher, by more than
+    `tolerance`, and any new integrity violation.
+    """
+    regressions = []
+    for name, stats in current['scenarios'].items():
+        before = previous.get('scenarios', {}).get(name)
+        if before is None:
+            continue
+        if stats['throughput'] < before['throughput'] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {before['throughput']:.1f} -> "
+                f"{stats['throughput']:.1f} requests/s")
+        for key in ('p50', 'p99', 'queries'):
+            if stats[key] > before[key] * (1 + tolerance):
+                regressions.append(
+                    f"{name}: {key} {before[key]:.2f} -> {stats[key]:.2f}")
+    for key, count in current.get('integrity', {}).items():
+        if count > previous.get('integrity', {}).get(key, 0):
+            regressions.append(f"{key}: {count}")
+    return regressions
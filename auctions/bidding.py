@@ -0,0 +1,261 @@
+import functools
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    Count, DateTimeField, F, OuterRef, Q, Subquery, Value
+)
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from . import latest_bids, listing_cache, live, models
+
+
+class BidRejected(Exception):
+    """Raised when a bid can not be placed on a listing.
+    """
+
+
+def place_bid(listing_id, user, value, max_value=None):
+    """Places a bid on a listing and returns the bid of the user.
+
+    A bid with a `max_value` is a proxy bid: when outbid, it is raised by
+    `BID_INCREMENT` over the competing bid, up to its maximum. The maximum
+    of the current bidder is kept in `Listing.proxy_max`, so a new bid is
+    resolved against the top two maxima, the standing one and its own, and
+    writes at most two bids whatever the number of increments.
+
+    A bid above the standing maximum is accepted with a single conditional
+    UPDATE against the denormalized listing columns, which also extends the
+    auction when the bid falls in its soft close window. The UPDATE holds
+    the listing row lock until the transaction ends, so concurrent bidders
+    are serialized by the database. The others lock the listing row and are
+    resolved against the standing proxy bid.
+
+    A bid of the current bidder under their own maximum writes no bid, it
+    only raises the maximum of their leading bid, which is returned with
+    `max_only` set. The bid returned has `leading` set when the user leads
+    the listing, and not when the bid was outbid by the standing proxy.
+    """
+    value = _as_price(value)
+    max_value = value if max_value is None else _as_price(max_value)
+    if max_value < value:
+        raise BidRejected(
+            "Bid denied. The maximum bid can not be lower than the bid.")
+    now = timezone.now()
+    with transaction.atomic():
+        accepted = models.Listing.objects.filter(
+            Q(proxy_max__lt=value) |
+            Q(proxy_max__isnull=True, initial_price__lt=value),
+            pk=listing_id,
+            ended_manually=False,
+            closed=False,
+            end_time__gt=now,
+        ).update(
+            current_price=value,
+            current_bidder=user,
+            current_bid_time=now,
+            proxy_max=max_value,
+            bid_count=F('bid_count') + 1,
+            end_time=_soft_close_end_time(now),
+        )
+        max_only = False
+        # Read along with the locked listing, so announcing the bids costs
+        # no query per bid. The fast path leaves the title to the latest
+        # bids buffer, which only reads it when warm.
+        title = None
+        usernames = {user.id: user.username}
+        if accepted:
+            bids = [models.Bid.objects.create(
+                listing_id=listing_id, user=user, value=value,
+                max_value=max_value, creation_time=now)]
+        else:
+            bids, max_only, listing = _resolve_proxy_bids(
+                listing_id, user, value, max_value)
+            title = listing['title']
+            usernames.setdefault(
+                listing['current_bidder'], listing['current_bidder__username'])
+        if not max_only:
+            for bid in bids:
+                username = usernames[bid.user_id]
+                transaction.on_commit(functools.partial(
+                    latest_bids.push, bid, username, title))
+                live.publish_bid(bid, username)
+        bid = next(bid for bid in reversed(bids) if bid.user_id == user.id)
+        bid.max_only = max_only
+        # The leading bid is written last.
+        bid.leading = bids[-1] is bid
+        return bid
+
+
+def _resolve_proxy_bids(listing_id, user, value, max_value):
+    """Resolves a bid against the standing proxy bid of a locked listing
+    and returns the bids written, the leading one last, whether the bid only
+    raised the maximum of the leading bid of the user instead, and the
+    locked listing, with its title and the username of its leader.
+    """
+    # Only the listing row is locked, not the user row of its leader.
+    listing = models.Listing.objects.select_for_update(of=('self',)).filter(
+        pk=listing_id
+    ).values(
+        'initial_price', 'current_price', 'current_bidder', 'proxy_max',
+        'ended_manually', 'closed', 'end_time', 'title',
+        'current_bidder__username'
+    ).first()
+    # Read once the lock is held, as the listing may have ended meanwhile.
+    now = timezone.now()
+    reason = _rejection_reason(listing_id, listing, value, now)
+    if reason:
+        raise BidRejected(reason)
+
+    leader = listing['current_bidder']
+    price = listing['current_price']
+    proxy_max = listing['proxy_max']
+    increment = settings.BID_INCREMENT
+
+    if leader == user.id:
+        # Bidding under one's own maximum only raises the maximum.
+        top_bid = models.Bid.objects.filter(listing_id=listing_id).order_by(
+            '-value', 'creation_time', 'id').first()
+        if max_value > proxy_max:
+            top_bid.max_value = max_value
+            top_bid.save(update_fields=['max_value'])
+            models.Listing.objects.filter(pk=listing_id).update(
+                proxy_max=max_value)
+        return [top_bid], True, listing
+
+    def bid(bidder, bid_value, bid_max):
+        bidder = {'user': bidder} if bidder == user else {'user_id': bidder}
+        return models.Bid(
+            listing_id=listing_id, value=bid_value, max_value=bid_max,
+            creation_time=now, **bidder)
+
+    if leader is None or value > proxy_max:
+        # The standing maximum changed since the conditional UPDATE.
+        bids = [bid(user, value, max_value)]
+        leading = user.id
+    elif max_value > proxy_max:
+        # The standing proxy is exhausted and the new one leads by an
+        # increment over it.
+        bids = [bid(user, min(max_value, proxy_max + increment), max_value)]
+        if proxy_max > price:
+            bids.insert(0, bid(leader, proxy_max, proxy_max))
+        leading = user.id
+    else:
+        # The standing proxy answers up to its maximum, and wins the ties
+        # as the earlier bid.
+        bids = [
+            bid(leader, min(proxy_max, max_value + increment), proxy_max),
+            bid(user, max_value, max_value),
+        ]
+        leading = leader
+        max_value = proxy_max
+
+    # Created one by one, so the ids break the ties between equal bids.
+    for new_bid in bids:
+        new_bid.save()
+    bids.sort(key=lambda new_bid: new_bid.user_id == leading)
+    models.Listing.objects.filter(pk=listing_id).update(
+        current_price=bids[-1].value,
+        current_bidder=leading,
+        current_bid_time=now,
+        proxy_max=max_value,
+        bid_count=F('bid_count') + len(bids),
+        end_time=_soft_close_end_time(now),
+    )
+    return bids, False, listing
+
+
+def _soft_close_end_time(now):
+    # A bid in the last `SOFT_CLOSE_WINDOW` of an auction pushes its end
+    # back to a full window after the bid, so no bid is left unanswered.
+    return Greatest(
+        F('end_time'),
+        Value(now + settings.SOFT_CLOSE_WINDOW, output_field=DateTimeField())
+    )
+
+
+def _as_price(value):
+    field = models.Bid._meta.get_field('value')
+    return field.to_python(value).quantize(
+        Decimal(1).scaleb(-field.decimal_places))
+
+
+def _rejection_reason(listing_id, listing, value, now):
+    if listing is None:
+        raise models.Listing.DoesNotExist(
+            f"Listing {listing_id} does not exist.")
+    if listing['ended_manually'] or listing['closed'] or \
+            listing['end_time'] <= now:
+        return "Bid denied. This auction is finished."
+    if listing['current_price'] is None:
+        if value <= listing['initial_price']:
+            return "Bid denied. A bid must exceed the initial price."
+    elif value <= listing['current_price']:
+        return (
+            "Bid denied. A bid must exceed the current bid of "
+            f"${listing['current_price']}."
+        )
+    return None
+
+
+def withdraw_bid(bid):
+    """Deletes a bid and recomputes the current bid columns of its listing.
+    """
+    with transaction.atomic():
+        list(models.Listing.objects.select_for_update().filter(
+            pk=bid.listing_id).values_list('pk'))
+        bid.delete()
+        models.Listing.objects.filter(pk=bid.listing_id).update(
+            **_current_bid_from_bids())
+        transaction.on_commit(latest_bids.invalidate)
+
+
+def _current_bid_from_bids():
+    top_bid = models.Bid.objects.filter(
+        listing=OuterRef('pk')
+    ).order_by('-value', 'creation_time', 'id')
+    bid_count = models.Bid.objects.filter(
+        listing=OuterRef('pk')
+    ).order_by().values('listing').annotate(count=Count('pk')).values('count')
+    return {
+        'current_price': Subquery(top_bid.values('value')[:1]),
+        'current_bidder_id': Subquery(top_bid.values('user')[:1]),
+        'current_bid_time': Subquery(top_bid.values('creation_time')[:1]),
+        'proxy_max': Subquery(top_bid.values(
+            max=Coalesce('max_value', 'value'))[:1]),
+        'bid_count': Coalesce(Subquery(bid_count), Value(0)),
+    }
+
+
+def reconcile_listings(queryset=None, batch_size=1000, dry_run=False):
+    """Rewrites the current bid columns of the listings whose values drifted
+    from their bids, and returns how many listings were out of sync.
+    """
+    if queryset is None:
+        queryset = models.Listing.objects.all()
+    expected = _current_bid_from_bids()
+    queryset = queryset.order_by('pk').annotate(**{
+        f'expected_{field}': expression
+        for field, expression in expected.items()
+    })
+    fields = list(expected)
+    values = ['pk'] + fields + [f'expected_{field}' for field in fields]
+
+    drifted_count = 0
+    last_pk = 0
+    while True:
+        rows = list(
+            queryset.filter(pk__gt=last_pk).values(*values)[:batch_size])
+        if not rows:
+            return drifted_count
+        last_pk = rows[-1]['pk']
+        drifted = [
+            row['pk'] for row in rows
+            if any(row[field] != row[f'expected_{field}'] for field in fields)
+        ]
+        drifted_count += len(drifted)
+        if drifted and not dry_run:
+            models.Listing.objects.filter(pk__in=drifted).update(
+                **_current_bid_from_bids())
+            for pk in drifted:
+                listing_cache.bump(pk)
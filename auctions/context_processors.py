@@ -1,7 +1,18 @@
 from django.conf import settings
+from django.utils import functional
 
 
 def default_listing_img(request):
     return {
         'default_listing_img' : f'{settings.STATIC_URL}img/default_listing_img.jpg'
-    }
\ No newline at end of file
+    }
+
+
+def watchlist_count(request):
+    # Counted once, and only by the pages that show it. Views that already
+    # know the count can override it in their context.
+    def count():
+        if not request.user.is_authenticated:
+            return 0
+        return request.user.watchlist.count()
+    return {'watchlist_count': functional.SimpleLazyObject(count)}
@@ -0,0 +1,235 @@
+"""
+Bulk exports of bids and listings as NDJSON or CSV, for the sellers and the
+back office.
+
+Rows are read from a server-side cursor and written as they come, so an
+export runs in constant memory whatever its size. Exports too large for a
+request run as a Celery job writing to a media file, with their progress
+kept in the cache, like the tickets of `intake`.
+"""
+import csv
+import datetime
+import itertools
+import tempfile
+import uuid
+import orjson
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils import dateparse, timezone
+from . import models, tasks
+
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+# The columns of each kind of export, by name, and the lookups they read.
+COLUMNS = {
+    'bids': {
+        'id': 'id',
+        'listing': 'listing_id',
+        'listing_title': 'listing__title',
+        'user': 'user_id',
+        'user_email': 'user__email',
+        'value': 'value',
+        'max_value': 'max_value',
+        'time': 'creation_time',
+    },
+    'listings': {
+        'id': 'id',
+        'title': 'title',
+        'category': 'category__name',
+        'author': 'author_id',
+        'initial_price': 'initial_price',
+        'current_price': 'current_price',
+        'current_bidder': 'current_bidder_id',
+        'bid_count': 'bid_count',
+        'creation_time': 'creation_time',
+        'end_time': 'end_time',
+        'closed': 'closed',
+        'winner': 'winner_id',
+        'public': 'public',
+    },
+}
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+JOB_TIMEOUT = 24 * 60 * 60
+CHUNK_SIZE = 2000
+
+
+def parse_filters(since=None, until=None, listings=None, author=None,
+                  bidder=None):
+    """Validates the filters of an export, given as strings, and returns
+    them in a form that can be passed to a Celery task.
+
+    `since` and `until` are dates or date times, an export covers the rows
+    created from `since` and before `until`. Raises `ValueError`.
+    """
+    filters = {}
+    for name, value in (('since', since), ('until', until)):
+        if value:
+            filters[name] = _parse_time(name, value).isoformat()
+    if listings:
+        if isinstance(listings, str):
+            listings = listings.split(',')
+        try:
+            filters['listings'] = sorted({int(pk) for pk in listings})
+        except ValueError:
+            raise ValueError("listing must be a list of ids.")
+    for name, value in (('author', author), ('bidder', bidder)):
+        if value is not None:
+            filters[name] = int(value)
+    return filters
+
+
+def _parse_time(name, value):
+    try:
+        time = dateparse.parse_datetime(value)
+        if time is None:
+            date = dateparse.parse_date(value)
+            time = date and datetime.datetime.combine(date, datetime.time())
+    except ValueError:
+        time = None
+    if time is None:
+        raise ValueError(f"{name} must be a date or a date and time.")
+    if timezone.is_naive(time):
+        time = timezone.make_aware(time)
+    return time
+
+
+def queryset(kind, filters):
+    """Returns the rows of an export, as tuples of its columns.
+    """
+    if kind == 'bids':
+        queryset = models.Bid.objects.all()
+        listing, author = 'listing_id', 'listing__author_id'
+        if 'bidder' in filters:
+            queryset = queryset.filter(user_id=filters['bidder'])
+    else:
+        queryset = models.Listing.objects.all()
+        listing, author = 'id', 'author_id'
+    if 'since' in filters:
+        queryset = queryset.filter(
+            creation_time__gte=datetime.datetime.fromisoformat(
+                filters['since']))
+    if 'until' in filters:
+        queryset = queryset.filter(
+            creation_time__lt=datetime.datetime.fromisoformat(
+                filters['until']))
+    if 'listings' in filters:
+        queryset = queryset.filter(**{f'{listing}__in': filters['listings']})
+    if 'author' in filters:
+        queryset = queryset.filter(**{author: filters['author']})
+    return queryset.order_by('id').values_list(*COLUMNS[kind].values())
+
+
+def render(kind, format, rows, chunk_size=CHUNK_SIZE, progress=None):
+    """Renders the rows of an export and yields them `chunk_size` at a time,
+    as bytes. `progress` is called with the number of rows rendered after
+    each chunk.
+    """
+    names = list(COLUMNS[kind])
+    if format == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(names).encode()
+
+        def line(row):
+            return writer.writerow([
+                value.isoformat() if isinstance(value, datetime.datetime)
+                else value
+                for value in row
+            ]).encode()
+    else:
+        def line(row):
+            return orjson.dumps(
+                dict(zip(names, row)), default=str,
+                option=orjson.OPT_APPEND_NEWLINE)
+
+    rows = iter(rows)
+    count = 0
+    while True:
+        chunk = [line(row) for row in itertools.islice(rows, chunk_size)]
+        if not chunk:
+            break
+        count += len(chunk)
+        yield b''.join(chunk)
+        if progress is not None:
+            progress(count)
+
+
+class _Echo:
+    """A file that returns what is written to it, for `csv.writer` to
+    render lines.
+    """
+
+    def write(self, value):
+        return value
+
+
+def stream(kind, format, filters, chunk_size=CHUNK_SIZE, progress=None):
+    """Yields an export, reading its rows from a server-side cursor.
+    """
+    rows = queryset(kind, filters).iterator(chunk_size=chunk_size)
+    return render(kind, format, rows, chunk_size, progress)
+
+
+def filename(kind, format):
+    return f'{kind}.{format}'
+
+
+def _job_key(job):
+    return f'export-job:{job}'
+
+
+def start(kind, format, filters, user=None):
+    """Queues an export job, written to a media file, and returns its id.
+    """
+    job = str(uuid.uuid4())
+    cache.set(_job_key(job), {
+        'status': PENDING,
+        'kind': kind,
+        'format': format,
+        'user': user and user.id,
+    }, timeout=JOB_TIMEOUT)
+    tasks.export_task.delay(job, kind, format, filters)
+    return job
+
+
+def status(job):
+    """Returns the state of a job, or None when it is unknown or expired.
+    """
+    return cache.get(_job_key(job))
+
+
+def run(job, kind, format, filters):
+    """Runs an export job and records its progress and outcome, and returns
+    the name of its file.
+    """
+    state = status(job) or {'kind': kind, 'format': format, 'user': None}
+
+    def update(**values):
+        state.update(values)
+        cache.set(_job_key(job), state, timeout=JOB_TIMEOUT)
+
+    rows = queryset(kind, filters)
+    update(status=RUNNING, rows=0, total=rows.count())
+    try:
+        with tempfile.TemporaryFile() as file:
+            for chunk in stream(
+                    kind, format, filters,
+                    progress=lambda count: update(rows=count)):
+                file.write(chunk)
+            file.seek(0)
+            name = default_storage.save(
+                f'exports/{job}/{filename(kind, format)}', File(file))
+    except Exception:
+        update(status=FAILED, detail="The export could not be written.")
+        raise
+    update(status=DONE, file=name, url=default_storage.url(name))
+    return name
@@ -19,13 +19,16 @@ class ListingForm(forms.ModelForm):
 class BidForm(forms.ModelForm):
     class Meta:
         model = models.Bid
-        fields = ['value']
+        fields = ['value', 'max_value']
         
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields.get('value').widget.attrs['class'] = "form-control"
         self.fields.get('value').widget.attrs['placeholder'] = "Post a bid"
         self.fields.get('value').widget.attrs['aria-describedby'] = "bid-btn"
+        self.fields.get('max_value').widget.attrs['class'] = "form-control"
+        self.fields.get('max_value').widget.attrs['placeholder'] = "Maximum (optional)"
+        self.fields.get('max_value').widget.attrs['aria-describedby'] = "bid-btn"
             
                  
 class QuestionForm(forms.ModelForm):
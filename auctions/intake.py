@@ -0,0 +1,84 @@
+"""
+Asynchronous bid intake, for the bursts of bids on hot listings.
+
+When `BID_INTAKE_PARTITIONS` is set, the API does not place bids itself:
+it hands them to a Celery queue picked by listing id (`bids.<listing_id %
+partitions>`) and answers with a ticket. Each queue is consumed by a single
+worker process, so the bids of a listing are applied one at a time in the
+order they arrived, and the web workers never wait on the listing row lock.
+The outcome of a ticket is kept in the cache and published on the live
+channel of the listing.
+"""
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from authentication import models as auth_models
+from . import bidding, live, models, tasks
+
+
+PENDING = 'pending'
+ACCEPTED = 'accepted'
+REJECTED = 'rejected'
+FAILED = 'failed'
+
+TICKET_TIMEOUT = 60 * 60
+
+
+def enabled():
+    return settings.BID_INTAKE_PARTITIONS > 0
+
+
+def queue_name(listing_id):
+    return f'bids.{int(listing_id) % settings.BID_INTAKE_PARTITIONS}'
+
+
+def _ticket_key(ticket):
+    return f'bid-ticket:{ticket}'
+
+
+def submit(listing_id, user, value, max_value=None):
+    """Queues a bid and returns its ticket.
+    """
+    ticket = str(uuid.uuid4())
+    cache.set(_ticket_key(ticket), {
+        'status': PENDING,
+        'listing': int(listing_id),
+        'user': user.id,
+    }, timeout=TICKET_TIMEOUT)
+    tasks.apply_bid_task.apply_async(
+        (ticket, int(listing_id), user.id, str(value),
+         None if max_value is None else str(max_value)),
+        queue=queue_name(listing_id),
+    )
+    return ticket
+
+
+def status(ticket):
+    """Returns the state of a ticket, or None when it is unknown or expired.
+    """
+    return cache.get(_ticket_key(ticket))
+
+
+def apply(ticket, listing_id, user_id, value, max_value=None):
+    """Places a queued bid and records the outcome of its ticket.
+    """
+    state = {'listing': listing_id, 'user': user_id}
+    user = auth_models.User.objects.get(pk=user_id)
+    try:
+        bid = bidding.place_bid(listing_id, user, value, max_value)
+    except models.Listing.DoesNotExist:
+        state.update(status=REJECTED, detail="No listing found.")
+    except bidding.BidRejected as error:
+        state.update(status=REJECTED, detail=str(error))
+    except Exception:
+        state.update(status=FAILED, detail="The bid could not be placed.")
+        raise
+    else:
+        state.update(status=ACCEPTED, bid=bid.id)
+    finally:
+        cache.set(_ticket_key(ticket), state, timeout=TICKET_TIMEOUT)
+        live.publish(listing_id, 'ticket', {
+            'ticket': ticket,
+            'status': state['status'],
+        })
+    return state
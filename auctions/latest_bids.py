@@ -0,0 +1,81 @@
+"""
+Ring buffer of the latest bids summaries, shown in the listings sidebar.
+
+The buffer lives in the cache as `SIZE` slots and a head counter. A new bid
+increments the head, which is atomic on every cache backend, and writes its
+summary in the slot the head points to, so the buffer never grows. Reading
+it is a single `get_many` round trip, and a missing head (cold or evicted
+cache) rebuilds the buffer from the database.
+"""
+from django.core.cache import cache
+from . import models
+
+
+SIZE = 5
+HEAD_KEY = 'latest-bids:head'
+
+
+def _slot_key(slot):
+    return f'latest-bids:{slot}'
+
+
+SLOT_KEYS = [_slot_key(slot) for slot in range(SIZE)]
+
+
+def summarize(bid, listing_title, username, sequence):
+    return {
+        'sequence': sequence,
+        'listing_id': bid.listing_id,
+        'listing_title': listing_title,
+        'username': username,
+        'value': bid.value,
+        'creation_time': bid.creation_time,
+    }
+
+
+def push(bid, username, listing_title=None):
+    """Writes the summary of a new bid over the oldest one. The title of
+    the listing is read when not given.
+    """
+    try:
+        sequence = cache.incr(HEAD_KEY)
+    except ValueError:
+        # The buffer is cold, the next read rebuilds it with this bid.
+        return
+    if listing_title is None:
+        listing_title = models.Listing.objects.filter(
+            pk=bid.listing_id).values_list('title', flat=True).first()
+    cache.set(
+        _slot_key(sequence % SIZE),
+        summarize(bid, listing_title, username, sequence),
+        timeout=None
+    )
+
+
+def invalidate():
+    cache.delete(HEAD_KEY)
+
+
+def get():
+    """Returns the summaries of the latest bids, newest first.
+    """
+    values = cache.get_many([HEAD_KEY] + SLOT_KEYS)
+    if HEAD_KEY not in values:
+        return rebuild()
+    summaries = [values[key] for key in SLOT_KEYS if key in values]
+    return sorted(
+        summaries, key=lambda summary: summary['sequence'], reverse=True)
+
+
+def rebuild():
+    bids = models.Bid.objects.select_related('listing', 'user').order_by(
+        '-creation_time', '-id')[:SIZE]
+    summaries = [
+        summarize(bid, bid.listing.title, bid.user.username, sequence)
+        for sequence, bid in zip(range(SIZE, 0, -1), bids)
+    ]
+    values = {_slot_key(summary['sequence'] % SIZE): summary
+              for summary in summaries}
+    cache.delete_many(SLOT_KEYS)
+    cache.set_many({**values, HEAD_KEY: SIZE}, timeout=None)
+    return summaries
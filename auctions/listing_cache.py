@@ -0,0 +1,47 @@
+"""
+Versions of the cached fragments of the listing details page.
+
+Each listing has a version key in the cache, used as a `{% cache %}` vary
+argument by `auctions/listing.html`. Bumping the version makes the page
+render fresh fragments, and the stale ones expire on their own. A missing
+version (cold or evicted cache) starts from the current time, so it never
+repeats a version that may still have fragments cached.
+"""
+import time
+from django.core.cache import cache
+from django.db import transaction
+
+
+FRAGMENT_TIMEOUT = 24 * 60 * 60
+
+
+def _version_key(listing_id):
+    return f'listing:{listing_id}:version'
+
+
+def _initial_version():
+    return time.time_ns()
+
+
+def version(listing_id):
+    key = _version_key(listing_id)
+    value = cache.get(key)
+    if value is None:
+        value = _initial_version()
+        if not cache.add(key, value, timeout=None):
+            value = cache.get(key, value)
+    return value
+
+
+def bump(listing_id):
+    """Invalidates the cached fragments of a listing, once the current
+    transaction commits, so no request caches the data it is replacing.
+    """
+    transaction.on_commit(lambda: _bump(listing_id))
+
+
+def _bump(listing_id):
+    try:
+        cache.incr(_version_key(listing_id))
+    except ValueError:
+        cache.set(_version_key(listing_id), _initial_version(), timeout=None)
@@ -0,0 +1,291 @@
+"""
+Live events of the listings, streamed to the browsers and API clients as
+server-sent events by the ASGI application (see `commerce.asgi`).
+
+Events are published once the transaction that caused them commits, on a
+channel per listing of the broker configured by `LIVE_EVENTS`. The Redis
+broker fans them out through pub/sub, so any number of ASGI workers can
+serve the subscribers of a listing, over one connection per worker, and
+the local broker keeps them in process, which is enough for the tests and
+a single development server.
+"""
+import asyncio
+import json
+import logging
+import re
+import threading
+import redis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import module_loading
+from redis import asyncio as aioredis
+
+
+logger = logging.getLogger(__name__)
+
+EVENTS_PATH = re.compile(r'^/auctions/listing/(?P<pk>\d+)/events$')
+
+# Sent as a comment when no event is, so proxies keep the stream open.
+HEARTBEAT_INTERVAL = 15
+
+
+def channel_name(listing_id):
+    return f'listing:{listing_id}:events'
+
+
+class LocalBroker:
+    """Fans the events out to the subscribers of this process."""
+
+    def __init__(self, **options):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscriber in subscribers:
+            subscriber.loop.call_soon_threadsafe(
+                subscriber.queue.put_nowait, message)
+
+    async def subscribe(self, channel):
+        subscription = LocalSubscription(self, channel)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers[subscription.channel].discard(subscription)
+
+
+class LocalSubscription:
+
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+
+    async def get(self):
+        return await self.queue.get()
+
+    async def close(self):
+        self.broker.unsubscribe(self)
+
+
+class RedisBroker:
+    """
+    Fans the events out through Redis pub/sub.
+
+    The subscribers of a process share one pub/sub connection, read by a
+    single task handing each message to the queues of the subscribers of
+    its channel, so the connections to Redis do not grow with the browsers.
+    """
+
+    def __init__(self, location, **options):
+        self.location = location
+        self._client = None
+        self._listener = None
+
+    def publish(self, channel, message):
+        if self._client is None:
+            self._client = redis.Redis.from_url(self.location)
+        self._client.publish(channel, message)
+
+    async def subscribe(self, channel):
+        # The connections of asyncio belong to the event loop they were
+        # opened in.
+        if self._listener is None or \
+                self._listener.loop is not asyncio.get_running_loop():
+            self._listener = RedisListener(self.location)
+        return await self._listener.subscribe(channel)
+
+
+class RedisListener:
+    """The pub/sub connection of the subscribers of an event loop."""
+
+    # Seconds before reading again after a connection error.
+    RETRY_DELAY = 1
+
+    def __init__(self, location):
+        self.loop = asyncio.get_running_loop()
+        self.client = aioredis.Redis.from_url(location)
+        self.pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self.subscribers = {}
+        self.lock = asyncio.Lock()
+        self.task = None
+
+    async def subscribe(self, channel):
+        subscription = RedisSubscription(self, channel)
+        async with self.lock:
+            subscribers = self.subscribers.setdefault(channel, set())
+            if not subscribers:
+                await self.pubsub.subscribe(channel)
+            subscribers.add(subscription)
+            if self.task is None or self.task.done():
+                self.task = asyncio.ensure_future(self.listen())
+        return subscription
+
+    async def unsubscribe(self, subscription):
+        channel = subscription.channel
+        async with self.lock:
+            subscribers = self.subscribers.get(channel, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self.subscribers.pop(channel, None)
+                await self.pubsub.unsubscribe(channel)
+
+    async def listen(self):
+        while True:
+            try:
+                message = await self.pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=None)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # The pub/sub connection subscribes again when it reconnects.
+                logger.exception("Could not read the live events")
+                await asyncio.sleep(self.RETRY_DELAY)
+                continue
+            if message is None:
+                continue
+            channel = message['channel'].decode()
+            data = message['data'].decode()
+            for subscription in list(self.subscribers.get(channel, ())):
+                subscription.queue.put_nowait(data)
+
+
+class RedisSubscription:
+
+    def __init__(self, listener, channel):
+        self.listener = listener
+        self.channel = channel
+        self.queue = asyncio.Queue()
+
+    async def get(self):
+        return await self.queue.get()
+
+    async def close(self):
+        await self.listener.unsubscribe(self)
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        config = dict(settings.LIVE_EVENTS)
+        broker_class = module_loading.import_string(config.pop('BACKEND'))
+        _broker = broker_class(**{
+            key.lower(): value for key, value in config.items()})
+    return _broker
+
+
+def publish(listing_id, event, data):
+    """Publishes an event of a listing once the current transaction commits.
+    """
+    message = json.dumps(
+        {'event': event, 'data': data}, cls=DjangoJSONEncoder)
+
+    def send():
+        try:
+            get_broker().publish(channel_name(listing_id), message)
+        except Exception:
+            # A lost event only delays the subscribers until their next one.
+            logger.exception("Could not publish %s event", event)
+
+    transaction.on_commit(send)
+
+
+def publish_bid(bid, username):
+    publish(bid.listing_id, 'bid', {
+        'value': bid.value,
+        'username': username,
+        'on': bid.creation_time,
+    })
+
+
+def publish_close(listing_id, winner_id):
+    publish(listing_id, 'close', {'winner': winner_id})
+
+
+def publish_answer(question):
+    publish(question.listing_id, 'answer', {
+        'question': question.id,
+        'body': question.answer.body,
+    })
+
+
+def _encode(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'.encode()
+
+
+def _listing_exists(pk):
+    from . import models
+
+    return models.Listing.objects.filter(pk=pk).exists()
+
+
+async def listing_events(scope, receive, send, pk):
+    """ASGI application streaming the events of a listing until the client
+    disconnects.
+    """
+    if not await sync_to_async(_listing_exists)(pk):
+        await send({
+            'type': 'http.response.start',
+            'status': 404,
+            'headers': [(b'content-type', b'text/plain')],
+        })
+        await send({'type': 'http.response.body', 'body': b'Not Found'})
+        return
+
+    subscription = await get_broker().subscribe(channel_name(pk))
+    next_message = asyncio.ensure_future(subscription.get())
+    disconnect = asyncio.ensure_future(_wait_disconnect(receive))
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': b'retry: 3000\n\n',
+            'more_body': True,
+        })
+        while True:
+            done, _ = await asyncio.wait(
+                {next_message, disconnect},
+                timeout=HEARTBEAT_INTERVAL,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if disconnect in done:
+                break
+            if next_message in done:
+                message = json.loads(next_message.result())
+                body = _encode(message['event'], message['data'])
+                next_message = asyncio.ensure_future(subscription.get())
+            else:
+                body = b': heartbeat\n\n'
+            await send({
+                'type': 'http.response.body',
+                'body': body,
+                'more_body': True,
+            })
+    finally:
+        next_message.cancel()
+        disconnect.cancel()
+        await asyncio.gather(next_message, disconnect, return_exceptions=True)
+        await subscription.close()
+
+
+async def _wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
@@ -0,0 +1,290 @@
+import json
+import os
+import random
+import subprocess
+import tempfile
+import time
+from django import test
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.management import base
+from django.db import OperationalError, connection
+from django.db.models import Max
+from django.utils import timezone
+from auctions import benchmark, bidding, models, seeding
+from authentication import models as auth_models
+from commerce import metrics
+
+
+SCENARIOS = ('bid_view', 'bid_api', 'listing_list', 'listing_detail')
+
+SWEEP_ATTEMPTS = 20
+
+
+class Command(base.BaseCommand):
+    help = (
+        "Drives the bid, listings and listing views with concurrent clients "
+        "against a throwaway test database, and reports their latency, "
+        "throughput and queries per request, and the lost updates and "
+        "duplicate winners of the contended listings, as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clients', type=int, default=8,
+            help="Number of concurrent clients, each in its own thread.")
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help="Number of requests per client and scenario.")
+        parser.add_argument(
+            '--hot-listings', type=int, default=3,
+            help="Number of listings all the clients bid on.")
+        parser.add_argument(
+            '--scenario', action='append', dest='scenarios',
+            choices=SCENARIOS,
+            help="Scenario to run, may be given several times (all by "
+                 "default).")
+        parser.add_argument(
+            '--users', type=int, default=200,
+            help="Number of synthetic users.")
+        parser.add_argument(
+            '--listings', type=int, default=2000,
+            help="Number of synthetic listings.")
+        parser.add_argument(
+            '--bids', type=int, default=20_000,
+            help="Number of synthetic bids.")
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help="Seed of the synthetic data and of the clients.")
+        parser.add_argument(
+            '--output',
+            help="File the JSON report is written to, instead of stdout.")
+        parser.add_argument(
+            '--compare',
+            help="JSON report of a previous run to check for regressions.")
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help="Relative change tolerated before a regression is reported.")
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help="Keep the test database between runs.")
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            # The in-memory test database raises instead of waiting for its
+            # locks, a file waits like a database server would.
+            connection.settings_dict['TEST']['NAME'] = os.path.join(
+                tempfile.gettempdir(), 'benchmark_bids.sqlite3')
+        # Self-contained: no Redis, no throttling and bids placed inline.
+        overrides = test.override_settings(
+            ALLOWED_HOSTS=['testserver'],
+            DEBUG=False,
+            CACHES={'default': {
+                'BACKEND': 'commerce.cache.LocMemCache'}},
+            LIVE_EVENTS={'BACKEND': 'auctions.live.LocalBroker'},
+            THROTTLE_RATES={},
+            BID_INTAKE_PARTITIONS=0,
+        )
+        with benchmark.test_database(keepdb=options['keepdb']), overrides:
+            self.populate(options)
+            report = self.run_benchmark(options)
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+        else:
+            self.stdout.write(output)
+        self.print_summary(report)
+
+        if options['compare']:
+            with open(options['compare']) as file:
+                previous = json.load(file)
+            regressions = benchmark.compare(
+                previous, report, options['tolerance'])
+            if regressions:
+                raise base.CommandError(
+                    "Regressions from " + options['compare'] + ":\n" +
+                    "\n".join(regressions))
+            self.stderr.write(self.style.SUCCESS(
+                f"No regression from {options['compare']}."))
+
+    def populate(self, options):
+        if models.Listing.objects.exists():
+            return
+        seeding.Seeder(seeding.Options(
+            users=options['users'],
+            listings=options['listings'],
+            bids=options['bids'],
+            watches=options['bids'] // 4,
+            questions=options['listings'] // 2,
+            seed=options['seed'],
+        )).run()
+
+    def run_benchmark(self, options):
+        hot = list(models.Listing.objects.active().filter(
+            closed=False).order_by('pk')[:options['hot_listings']])
+        authors = {listing.author_id for listing in hot}
+        users = list(auth_models.User.objects.exclude(
+            pk__in=authors).order_by('pk')[:options['clients']])
+        bids_before = models.Bid.objects.filter(listing__in=hot).count()
+
+        scenarios = {}
+        accepted = 0
+        for name in options['scenarios'] or SCENARIOS:
+            stats, scenario_accepted = self.run_scenario(
+                name, hot, users, options)
+            scenarios[name] = stats
+            accepted += scenario_accepted
+            self.stderr.write(
+                f"{name:<16} {stats['throughput']:8.1f} requests/s "
+                f"p50={stats['p50']:8.2f}ms p99={stats['p99']:8.2f}ms "
+                f"queries={stats['queries']:.1f} errors={stats['errors']}")
+
+        bids_after = models.Bid.objects.filter(listing__in=hot).count()
+        integrity = {
+            # Bids reported as accepted but never written, and listings whose
+            # current bid columns disagree with their bids.
+            'lost_updates': max(0, accepted - (bids_after - bids_before)) +
+            bidding.reconcile_listings(
+                models.Listing.objects.filter(
+                    pk__in=[listing.pk for listing in hot]), dry_run=True),
+        }
+        integrity.update(self.close_concurrently(hot, options['clients']))
+        return {
+            'commit': self.commit(),
+            'time': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'options': {
+                key: options[key] for key in (
+                    'clients', 'requests', 'hot_listings', 'users',
+                    'listings', 'bids', 'seed')
+            },
+            'scenarios': scenarios,
+            'integrity': integrity,
+        }
+
+    def run_scenario(self, name, hot, users, options):
+        request = getattr(self, f'request_{name}')
+
+        def client(index):
+            rng = random.Random(f"{options['seed']}-{name}-{index}")
+            http = test.Client(raise_request_exception=False)
+            http.force_login(users[index % len(users)])
+            samples = []
+            for _ in range(options['requests']):
+                listing = rng.choice(hot)
+                value = self.next_value(listing, rng)
+                queries = metrics.QueryCounter()
+                with connection.execute_wrapper(queries):
+                    start = time.perf_counter()
+                    outcome = request(http, listing, value)
+                    elapsed = time.perf_counter() - start
+                samples.append((elapsed, queries.count, outcome))
+            return samples
+
+        results, elapsed = benchmark.run_concurrently(
+            options['clients'], client)
+        samples = [sample for samples in results for sample in samples]
+        stats = benchmark.summarize([latency for latency, _, _ in samples])
+        outcomes = [outcome for _, _, outcome in samples]
+        stats.update({
+            'throughput': len(samples) / elapsed,
+            'queries': sum(count for _, count, _ in samples) / len(samples),
+            'accepted': outcomes.count('accepted'),
+            'rejected': outcomes.count('rejected'),
+            'errors': outcomes.count('error'),
+        })
+        return stats, stats['accepted']
+
+    def next_value(self, listing, rng):
+        # Read outside of the timed request, like a client reading the page.
+        current = models.Listing.objects.filter(pk=listing.pk).values_list(
+            'current_price', 'initial_price').get()
+        price = current[0] or current[1]
+        return price + settings.BID_INCREMENT * rng.randint(1, 3)
+
+    def request_bid_view(self, http, listing, value):
+        # The view redirects without reading its messages, drop those of the
+        # previous bids so only this one is left.
+        http.cookies.pop(CookieStorage.cookie_name, None)
+        response = http.post(
+            f'/auctions/bid/{listing.pk}', {'value': value})
+        if response.status_code >= 400:
+            return 'error'
+        levels = {
+            message.level for message in
+            messages.get_messages(response.wsgi_request)
+        }
+        return 'accepted' if messages.SUCCESS in levels else 'rejected'
+
+    def request_bid_api(self, http, listing, value):
+        response = http.post(
+            f'/auctions/api/listings/{listing.pk}/bids/', {'value': value})
+        if response.status_code == 201:
+            return 'accepted'
+        return 'rejected' if response.status_code == 400 else 'error'
+
+    def request_listing_list(self, http, listing, value):
+        response = http.get('/auctions/')
+        return 'error' if response.status_code >= 400 else 'ok'
+
+    def request_listing_detail(self, http, listing, value):
+        response = http.get(f'/auctions/listing/{listing.pk}')
+        return 'error' if response.status_code >= 400 else 'ok'
+
+    def close_concurrently(self, hot, clients):
+        """Ends the contended listings and sweeps them from every client at
+        once, like racing Celery workers, and counts the listings closed more
+        than once, each time announcing a winner, and the wrong winners.
+        """
+        pks = [listing.pk for listing in hot]
+        models.Listing.objects.filter(pk__in=pks).update(
+            end_time=timezone.now())
+
+        def sweep(index):
+            closed = failures = 0
+            while failures < SWEEP_ATTEMPTS:
+                try:
+                    batch = models.Listing.objects.filter(
+                        pk__in=pks).close_finished(batch_size=1, max_batches=1)
+                except OperationalError:
+                    # SQLite fails the concurrent writers instead of queuing
+                    # them, retry like the task would.
+                    failures += 1
+                    time.sleep(0.01)
+                    continue
+                if not batch:
+                    break
+                closed += batch
+            return closed
+
+        closed, _ = benchmark.run_concurrently(clients, sweep)
+        top_bids = models.Listing.objects.filter(pk__in=pks).annotate(
+            top=Max('bids__value')).values_list('pk', 'winner_id', 'top')
+        wrong = 0
+        for pk, winner_id, top in top_bids:
+            if top is None:
+                wrong += winner_id is not None
+                continue
+            leaders = set(models.Bid.objects.filter(
+                listing_id=pk, value=top).values_list('user_id', flat=True))
+            wrong += winner_id not in leaders or len(leaders) > 1
+        return {
+            'duplicate_winners': sum(closed) - len(pks),
+            'wrong_winners': wrong,
+        }
+
+    def commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                cwd=settings.BASE_DIR, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def print_summary(self, report):
+        for key, count in report['integrity'].items():
+            style = self.style.SUCCESS if not count else self.style.ERROR
+            self.stderr.write(style(f"{key}: {count}"))
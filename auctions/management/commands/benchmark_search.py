@@ -0,0 +1,94 @@
+import random
+import time
+from django.core.management import base
+from django.db import connection
+from django.utils import timezone
+from auctions import benchmark, models, search, seeding
+from authentication import models as auth_models
+
+
+class Command(base.BaseCommand):
+    help = (
+        "Compares the listing search backends on a synthetic listings table "
+        "created in a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--listings', type=int, default=1_000_000,
+            help="Number of synthetic listings.")
+        parser.add_argument(
+            '--batch-size', type=int, default=10_000,
+            help="Number of listings inserted per query.")
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help="Number of timed runs per query.")
+        parser.add_argument(
+            '--query', action='append', dest='queries',
+            help="Search query to time, may be given several times.")
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help="Seed of the synthetic data.")
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help="Keep the test database, and its listings, between runs.")
+
+    def handle(self, *args, **options):
+        queries = options['queries'] or [
+            'guitar', 'vintage camera', 'signed comic', 'zeppelin']
+        with benchmark.test_database(keepdb=options['keepdb']):
+            self.populate(options)
+            backends = [search.SimpleSearchBackend()]
+            if connection.vendor == 'postgresql':
+                backends.append(search.PostgresSearchBackend())
+            for backend in backends:
+                for query in queries:
+                    queryset = backend.search(
+                        models.Listing.objects.filter(public=True), query)
+                    stats = benchmark.measure(
+                        lambda: list(queryset.values_list('pk')[:10]),
+                        repeat=options['repeat'],
+                    )
+                    self.stdout.write(
+                        f"{type(backend).__name__:<24} {query!r:<18} "
+                        f"p50={stats['p50']:9.2f}ms "
+                        f"p99={stats['p99']:9.2f}ms"
+                    )
+
+    def populate(self, options):
+        missing = options['listings'] - models.Listing.objects.count()
+        if missing <= 0:
+            return
+        rng = random.Random(options['seed'])
+        # Zipf-like word popularity, so some queries match far more rows.
+        weights = [1 / rank for rank in range(1, len(seeding.WORDS) + 1)]
+        author = auth_models.User.objects.create(username='benchmark')
+        category, _ = models.Category.objects.get_or_create(name='benchmark')
+        now = timezone.now()
+
+        start = time.perf_counter()
+        for offset in range(0, missing, options['batch_size']):
+            size = min(options['batch_size'], missing - offset)
+            # bulk_create skips Listing.save() and its signals.
+            models.Listing.objects.bulk_create([
+                models.Listing(
+                    author=author,
+                    category=category,
+                    title=" ".join(rng.choices(seeding.WORDS, weights, k=3)),
+                    description=" ".join(
+                        rng.choices(seeding.WORDS, weights, k=15)),
+                    initial_price=rng.randint(1, 10_000),
+                    duration=7,
+                    creation_time=now,
+                    end_time=now + timezone.timedelta(
+                        minutes=rng.randint(1, 30 * 24 * 60)),
+                )
+                for _ in range(size)
+            ])
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE auctions_listing")
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"Inserted {missing} listings in {elapsed:.1f}s "
+            f"({missing / elapsed:.0f} rows/s).")
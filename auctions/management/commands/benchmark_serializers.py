@@ -0,0 +1,93 @@
+from django import test
+from django.core.management import base
+from rest_framework import renderers
+from api import serializers
+from auctions import benchmark, models, seeding
+
+
+class Command(base.BaseCommand):
+    help = (
+        "Compares the listing serializers of the listings list with their "
+        "values() serializers, at several page sizes, on synthetic listings "
+        "created in a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--page-size', type=int, action='append', dest='page_sizes',
+            help="Number of listings serialized, may be given several times "
+                 "(10, 100 and 1000 by default).")
+        parser.add_argument(
+            '--listings', type=int, default=5000,
+            help="Number of synthetic listings.")
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help="Number of timed runs per page size.")
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help="Seed of the synthetic data.")
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help="Keep the test database, and its listings, between runs.")
+
+    def handle(self, *args, **options):
+        page_sizes = options['page_sizes'] or [10, 100, 1000]
+        overrides = test.override_settings(
+            ALLOWED_HOSTS=['testserver'],
+            CACHES={'default': {
+                'BACKEND': 'commerce.cache.LocMemCache'}},
+        )
+        with benchmark.test_database(keepdb=options['keepdb']), overrides:
+            self.populate(options)
+            context = {'request': test.RequestFactory().get(
+                '/auctions/api/listings/')}
+            for serializer_class, values_serializer_class in (
+                    (serializers.ListingAbstractSerializer,
+                     serializers.ListingValuesSerializer),
+                    (serializers.ListingSerializer,
+                     serializers.DashboardListingValuesSerializer)):
+                for page_size in page_sizes:
+                    self.compare(
+                        serializer_class, values_serializer_class, context,
+                        page_size, options['repeat'])
+
+    def populate(self, options):
+        if models.Listing.objects.exists():
+            return
+        seeding.Seeder(seeding.Options(
+            users=max(10, options['listings'] // 20),
+            listings=options['listings'],
+            bids=options['listings'] * 5,
+            watches=0,
+            questions=0,
+            ended_fraction=0,
+            seed=options['seed'],
+        )).run()
+
+    def compare(self, serializer_class, values_serializer_class, context,
+                page_size, repeat):
+        queryset = models.Listing.objects.order_by('end_time', 'id')
+        renderer = renderers.JSONRenderer()
+
+        def serialize():
+            page = list(queryset.select_related('current_bidder')[:page_size])
+            return renderer.render(
+                serializer_class(page, many=True, context=context).data)
+
+        def serialize_values():
+            serializer = values_serializer_class(context=context)
+            page = list(serializer.select(queryset)[:page_size])
+            return renderer.render(serializer.serialize(page))
+
+        if serialize() != serialize_values():
+            raise base.CommandError(
+                f"{values_serializer_class.__name__} does not represent the "
+                f"listings like {serializer_class.__name__}.")
+        before = benchmark.measure(serialize, repeat=repeat)
+        after = benchmark.measure(serialize_values, repeat=repeat)
+        self.stdout.write(
+            f"{serializer_class.__name__:<26} {page_size:>5} listings "
+            f"p50={before['p50']:9.2f}ms -> {after['p50']:9.2f}ms "
+            f"p99={before['p99']:9.2f}ms -> {after['p99']:9.2f}ms "
+            f"({before['p50'] / after['p50']:.1f}x)"
+        )
@@ -0,0 +1,91 @@
+from django.core.management import base
+from auctions import exports
+
+
+class Command(base.BaseCommand):
+    help = (
+        "Exports bids or listings as NDJSON or CSV, streamed from a "
+        "server-side cursor, or queues the export as a Celery job written "
+        "to a media file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'kind', nargs='?', choices=list(exports.COLUMNS),
+            help="Rows to export.")
+        parser.add_argument(
+            '--format', choices=list(exports.FORMATS), default='ndjson',
+            help="Format of the export.")
+        parser.add_argument(
+            '--since',
+            help="Export the rows created from this date or date and time.")
+        parser.add_argument(
+            '--until',
+            help="Export the rows created before this date or date and time.")
+        parser.add_argument(
+            '--listing', type=int, action='append', dest='listings',
+            help="Export the listing, or its bids, may be given several "
+                 "times.")
+        parser.add_argument(
+            '--author', type=int,
+            help="Export the listings of this user, or the bids on them.")
+        parser.add_argument(
+            '--bidder', type=int,
+            help="Export the bids of this user.")
+        parser.add_argument(
+            '--output',
+            help="File the export is written to, instead of stdout.")
+        parser.add_argument(
+            '--chunk-size', type=int, default=exports.CHUNK_SIZE,
+            help="Number of rows read and written at a time.")
+        parser.add_argument(
+            '--async', action='store_true', dest='queue',
+            help="Queue the export as a Celery job and print its id.")
+        parser.add_argument(
+            '--job',
+            help="Print the progress of a queued export job.")
+
+    def handle(self, *args, **options):
+        if options['job']:
+            return self.print_job(options['job'])
+        if not options['kind']:
+            raise base.CommandError("Give the kind of rows to export.")
+        try:
+            filters = exports.parse_filters(
+                since=options['since'],
+                until=options['until'],
+                listings=options['listings'],
+                author=options['author'],
+                bidder=options['bidder'],
+            )
+        except ValueError as error:
+            raise base.CommandError(error)
+
+        if options['queue']:
+            job = exports.start(options['kind'], options['format'], filters)
+            self.stdout.write(job)
+            return
+
+        chunks = exports.stream(
+            options['kind'], options['format'], filters,
+            chunk_size=options['chunk_size'],
+            progress=lambda count: self.stderr.write(
+                f"{count} rows exported", ending='\r'))
+        if options['output']:
+            with open(options['output'], 'wb') as file:
+                file.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk.decode(), ending='')
+        self.stderr.write('')
+
+    def print_job(self, job):
+        state = exports.status(job)
+        if state is None:
+            raise base.CommandError(f"No export job {job}.")
+        progress = f"{state['status']}"
+        if 'total' in state:
+            progress += f" {state['rows']}/{state['total']} rows"
+        if 'file' in state:
+            progress += f" {state['file']}"
+        self.stdout.write(progress)
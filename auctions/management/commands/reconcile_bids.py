@@ -0,0 +1,28 @@
+from django.core.management import base
+from auctions import bidding
+
+
+class Command(base.BaseCommand):
+    help = (
+        "Backfills and reconciles the denormalized current bid columns of "
+        "the listings (current price, current bidder and bid count)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help="Number of listings checked per query.")
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Only report the listings out of sync.")
+
+    def handle(self, *args, **options):
+        drifted = bidding.reconcile_listings(
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+        )
+        if options['dry_run']:
+            self.stdout.write(f"{drifted} listing(s) out of sync.")
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"{drifted} listing(s) reconciled."))
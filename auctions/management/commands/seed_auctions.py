@@ -0,0 +1,72 @@
+import dataclasses
+from django.core.management import base
+from django.db import connection
+from auctions import seeding
+
+
+class Command(base.BaseCommand):
+    help = (
+        "Loads a synthetic dataset of users, categories, listings, bids, "
+        "watchers and questions, with a skewed popularity, for benchmarks."
+    )
+
+    option_help = {
+        'users': "Number of users.",
+        'categories': "Number of categories.",
+        'listings': "Number of listings.",
+        'bids': "Number of bids, on average.",
+        'watches': "Number of watchlist entries, on average.",
+        'questions': "Number of questions, on average.",
+        'popularity_alpha': (
+            "Shape of the Pareto distribution of the listings popularity, "
+            "lower is more skewed."),
+        'user_skew': "Exponent of the Zipf distribution of the users activity.",
+        'category_skew': "Exponent of the Zipf distribution of the categories.",
+        'history_days': "Listings are created over this many past days.",
+        'answered_fraction': "Fraction of the questions answered.",
+        'proxy_fraction': "Fraction of the leading bids with a maximum.",
+        'ended_fraction': "Fraction of the listings ended by their author.",
+        'private_fraction': "Fraction of the listings not public.",
+        'batch_size': "Number of listings generated, and rows inserted, at once.",
+        'seed': "Seed of the synthetic data.",
+    }
+
+    def add_arguments(self, parser):
+        defaults = seeding.Options()
+        for field in dataclasses.fields(seeding.Options):
+            if field.name == 'password':
+                continue
+            parser.add_argument(
+                f'--{field.name.replace("_", "-")}',
+                type=field.type, default=getattr(defaults, field.name),
+                help=self.option_help.get(field.name))
+        parser.add_argument(
+            '--password',
+            help="Password of the users, who can not log in without one.")
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help="Insert with bulk_create instead of COPY on PostgreSQL.")
+
+    def handle(self, *args, **options):
+        seed_options = seeding.Options(**{
+            field.name: options[field.name]
+            for field in dataclasses.fields(seeding.Options)
+        })
+        loader = None
+        if options['no_copy'] or connection.vendor != 'postgresql':
+            loader = seeding.BulkCreateLoader(seed_options.batch_size)
+        seeder = seeding.Seeder(seed_options, loader)
+        counts, elapsed = seeder.run(progress=self.report_progress)
+
+        rows = sum(counts.values())
+        for name, count in counts.items():
+            self.stdout.write(f"{name:<12} {count:>12,}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Inserted {rows:,} rows with {type(seeder.loader).__name__} in "
+            f"{elapsed:.1f}s ({rows / elapsed:,.0f} rows/s)."))
+
+    def report_progress(self, counts, elapsed):
+        rows = sum(counts.values())
+        self.stdout.write(
+            f"{counts['listings']:,} listings, {rows:,} rows, "
+            f"{rows / elapsed:,.0f} rows/s")
@@ -1,6 +1,8 @@
-from django.db import models
-from django.db.models import Q
-from datetime import datetime
+from django.db import connections, models, transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import FirstValue
+from django.utils import timezone
+from . import live, search as search_backends
 
 
 class ListingQuerySet(models.QuerySet):
@@ -8,20 +10,89 @@ class ListingQuerySet(models.QuerySet):
         return self.filter(public=True)
 
     def search(self, query, user=None):
-        lookup = (
-            Q(title__icontains=query) |
-            Q(description__icontains=query)
-        )
-        queryset = self.is_public().filter(lookup)
+        """Searches the public listings, and the listings of `user` if
+        given, with the search backend of the queryset database.
+        """
+        visible = Q(public=True)
         if user is not None:
-            user_qs = self.filter(user=user)
-            queryset = (queryset | user_qs).distinct()
-        return queryset
+            visible |= Q(author=user)
+        backend = search_backends.get_backend(self.db)
+        return backend.search(self.filter(visible), query)
 
     def active(self):
         queryset = self.is_public().filter(
-            ended_manually=False, end_time__gte=datetime.now())
+            ended_manually=False, end_time__gte=timezone.now())
         return queryset
 
     def from_category(self, category):
         return self.active().filter(category__name=category)
+
+    def resolve_winners(self, batch_size=None):
+        """Declares the author of the highest bid of each listing in the
+        queryset as its winner and returns how many winners were written.
+
+        The top bids of all the listings are found by a single DISTINCT ON
+        query (or a window function on backends without it), and the
+        winners are written with one bulk update per batch.
+        """
+        bids = self.model._meta.get_field('bids').related_model.objects
+        bids = bids.filter(listing__in=self.values('pk'))
+        if connections[self.db].features.can_distinct_on_fields:
+            top_bids = bids.order_by(
+                'listing_id', '-value', 'creation_time', 'id'
+            ).distinct('listing_id').values_list('listing', 'user')
+        else:
+            top_bids = bids.annotate(
+                top_bidder=Window(
+                    FirstValue('user'),
+                    partition_by=[F('listing')],
+                    order_by=[
+                        F('value').desc(),
+                        F('creation_time').asc(),
+                        F('id').asc(),
+                    ],
+                )
+            ).order_by().values_list('listing', 'top_bidder').distinct()
+        winners = [
+            self.model(pk=listing, winner_id=user) for listing, user in top_bids
+        ]
+        return self.model.objects.bulk_update(
+            winners, ['winner'], batch_size=batch_size)
+
+    def close(self):
+        """Closes the open listings of the queryset, declaring the author
+        of the highest bid of each one as its winner, and returns how many
+        were closed.
+        """
+        with transaction.atomic():
+            pks = list(self.filter(closed=False).values_list('pk', flat=True))
+            if not pks:
+                return 0
+            closing = self.model.objects.filter(pk__in=pks)
+            closing.resolve_winners()
+            for pk, winner_id in closing.values_list('pk', 'winner_id'):
+                live.publish_close(pk, winner_id)
+            return closing.update(closed=True)
+
+    def close_finished(self, batch_size=500, max_batches=None):
+        """Closes the listings past their end time in batches of
+        `batch_size` and returns how many were closed.
+
+        Each batch locks its rows with SKIP LOCKED, so several workers can
+        sweep at the same time without closing the same listing twice.
+        """
+        closed = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            with transaction.atomic():
+                pks = list(
+                    self.filter(closed=False, end_time__lte=timezone.now())
+                    .order_by('end_time')
+                    .select_for_update(skip_locked=True)
+                    .values_list('pk', flat=True)[:batch_size]
+                )
+                if not pks:
+                    break
+                closed += self.model.objects.filter(pk__in=pks).close()
+            batches += 1
+        return closed
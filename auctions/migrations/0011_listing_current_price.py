@@ -0,0 +1,29 @@
+# Generated by Django 4.0.2 on 2026-10-18 19:09
+
+from django.db import migrations, models
+
+
+def backfill_current_price(apps, schema_editor):
+    Listing = apps.get_model('auctions', 'Listing')
+    Bid = apps.get_model('auctions', 'Bid')
+    highest_bid = Bid.objects.filter(
+        listing=models.OuterRef('pk')
+    ).order_by('-value').values('value')[:1]
+    Listing.objects.update(current_price=models.Subquery(highest_bid))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0010_alter_listing_creation_time'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='current_price',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=9, null=True),
+        ),
+        migrations.RunPython(
+            backfill_current_price, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.0.2 on 2026-10-18 19:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0012_listing_current_bid'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='closed',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('closed', False)), fields=['end_time'], name='listing_open_end_time_idx'),
+        ),
+    ]
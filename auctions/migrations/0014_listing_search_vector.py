@@ -0,0 +1,67 @@
+# Generated by Django 4.0.2 on 2026-10-18 19:21
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# The search vector weights the title above the description. It is only
+# maintained on PostgreSQL, other databases fall back to substring search.
+SEARCH_VECTOR = """
+    setweight(to_tsvector('pg_catalog.english', coalesce({table}title, '')), 'A') ||
+    setweight(to_tsvector('pg_catalog.english', coalesce({table}description, '')), 'B')
+"""
+
+CREATE_SEARCH_VECTOR = [
+    f"""
+    CREATE FUNCTION auctions_listing_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := {SEARCH_VECTOR.format(table='NEW.')};
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+    """,
+    """
+    CREATE TRIGGER auctions_listing_search_vector_update
+    BEFORE INSERT OR UPDATE OF title, description ON auctions_listing
+    FOR EACH ROW EXECUTE PROCEDURE auctions_listing_search_vector_update();
+    """,
+    f"UPDATE auctions_listing SET search_vector = {SEARCH_VECTOR.format(table='')};",
+    """
+    CREATE INDEX auctions_listing_search_vector_idx
+    ON auctions_listing USING gin (search_vector);
+    """,
+]
+
+DROP_SEARCH_VECTOR = [
+    "DROP INDEX IF EXISTS auctions_listing_search_vector_idx;",
+    "DROP TRIGGER IF EXISTS auctions_listing_search_vector_update ON auctions_listing;",
+    "DROP FUNCTION IF EXISTS auctions_listing_search_vector_update();",
+]
+
+
+def run_on_postgresql(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0013_listing_closed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(
+            run_on_postgresql(CREATE_SEARCH_VECTOR),
+            run_on_postgresql(DROP_SEARCH_VECTOR),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.0.2 on 2026-10-18 19:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0014_listing_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bid',
+            index=models.Index(fields=['listing', '-value'], name='bid_listing_value_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bid',
+            index=models.Index(fields=['creation_time', 'id'], name='bid_creation_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bid',
+            index=models.Index(fields=['user', 'creation_time', 'id'], name='bid_user_creation_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('ended_manually', False), ('public', True)), fields=['end_time', 'id'], name='listing_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('ended_manually', False), ('public', True)), fields=['category', 'end_time', 'id'], name='listing_active_category_idx'),
+        ),
+    ]
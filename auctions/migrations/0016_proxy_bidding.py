@@ -0,0 +1,30 @@
+# Generated by Django 4.0.2 on 2026-10-18 19:30
+
+from django.db import migrations, models
+
+
+def backfill_proxy_max(apps, schema_editor):
+    # Bids placed so far had no maximum above their value.
+    Listing = apps.get_model('auctions', 'Listing')
+    Listing.objects.update(proxy_max=models.F('current_price'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0015_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bid',
+            name='max_value',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=9, null=True),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='proxy_max',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=9, null=True),
+        ),
+        migrations.RunPython(backfill_proxy_max, migrations.RunPython.noop),
+    ]
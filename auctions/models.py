@@ -1,4 +1,5 @@
 from django.db import models
+from django.contrib.postgres import search as postgres_search
 from django.core import validators
 from django.utils import timezone
 from imagekit import (
@@ -6,12 +7,9 @@ from imagekit import (
     models as ImagekitModels,
 )
 from authentication import models as auth_models
-from . import managers
-from . import tasks
+from . import listing_cache, live, managers
 from django import urls, dispatch
 
-import sys
-
 
 class Category(models.Model):
     class Meta:
@@ -68,6 +66,7 @@ class Listing(models.Model):
     end_time = models.DateTimeField()
     duration = models.IntegerField(choices=DURATIONS)
     ended_manually = models.BooleanField(default=False)
+    closed = models.BooleanField(default=False, editable=False)
     public = models.BooleanField(default=True)
     winner = models.ForeignKey(
         auth_models.User,
@@ -76,18 +75,91 @@ class Listing(models.Model):
         on_delete=models.SET_NULL,
         null=True
     )
+    current_price = models.DecimalField(
+        max_digits=9, decimal_places=2, null=True, blank=True,
+        editable=False)
+    current_bidder = models.ForeignKey(
+        auth_models.User,
+        blank=True,
+        related_name="leading",
+        on_delete=models.SET_NULL,
+        null=True,
+        editable=False
+    )
+    current_bid_time = models.DateTimeField(
+        null=True, blank=True, editable=False)
+    bid_count = models.PositiveIntegerField(default=0, editable=False)
+    # Maximum of the current bidder, never shown to the other bidders.
+    proxy_max = models.DecimalField(
+        max_digits=9, decimal_places=2, null=True, blank=True,
+        editable=False)
+    # Maintained by a trigger on PostgreSQL, see the 0014 migration.
+    search_vector = postgres_search.SearchVectorField(
+        null=True, editable=False)
 
     class Meta:
         ordering = ('creation_time',)
+        indexes = [
+            # Serves the closing sweeper, which only looks at open listings.
+            models.Index(
+                fields=['end_time'],
+                condition=models.Q(closed=False),
+                name='listing_open_end_time_idx'
+            ),
+            # Serve `ListingQuerySet.active()` and `from_category()`, which
+            # are paginated on (end_time, id).
+            models.Index(
+                fields=['end_time', 'id'],
+                condition=models.Q(public=True, ended_manually=False),
+                name='listing_active_idx'
+            ),
+            models.Index(
+                fields=['category', 'end_time', 'id'],
+                condition=models.Q(public=True, ended_manually=False),
+                name='listing_active_category_idx'
+            ),
+        ]
+
+    # Written by the bids, the closing and the search trigger, with their
+    # own UPDATEs, so saving an instance loaded before them does not write
+    # their old values back. Saved only when named by `update_fields`.
+    MANAGED_FIELDS = (
+        'current_price',
+        'current_bidder',
+        'current_bid_time',
+        'bid_count',
+        'proxy_max',
+        'end_time',
+        'closed',
+        'winner',
+        'search_vector',
+    )
 
     def save(self, *args, **kwargs):
-        self.creation_time = timezone.now()
-        self.end_time = self.creation_time + \
-            timezone.timedelta(days=self.duration)
+        # The end time is only set on creation, as bids may extend it later,
+        # or corrected when it does not follow the creation time.
+        adding = self._state.adding
+        if adding:
+            self.creation_time = timezone.now()
+        corrected = adding or self.end_time <= self.creation_time
+        if corrected:
+            self.end_time = self.creation_time + \
+                timezone.timedelta(days=self.duration)
+        if not adding and not args and kwargs.get('update_fields') is None:
+            managed = set(self.MANAGED_FIELDS) - ({'end_time'} if corrected
+                                                  else set())
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in managed
+            ]
         super().save(*args, **kwargs)
 
     def is_finished(self):
-        return self.ended_manually or self.end_time < timezone.now()
+        return bool(
+            self.closed or
+            self.ended_manually or
+            self.end_time < timezone.now()
+        )
 
     def is_valid_listing(self):
         return bool(
@@ -105,16 +177,11 @@ class Listing(models.Model):
 
 @dispatch.receiver(models.signals.post_save, sender=Listing)
 def compute_listing_winner(sender, **kwargs):
+    # Listings that reach their end time are closed by the periodic
+    # `close_finished_listings` task, only manual endings are handled here.
     listing = kwargs.get('instance')
-    if bool(listing.ended_manually and
-            (current_bid := listing.bids.all().first()) and
-            not listing.winner):
-        listing.winner = current_bid.user
-    elif kwargs.get('created') and not 'test' in sys.argv:
-        tasks.set_listing_winner_task.apply_async(
-            (listing.pk,),
-            eta=listing.end_time
-        )
+    if listing.ended_manually and not listing.closed:
+        Listing.objects.filter(pk=listing.pk).close()
 
 
 class Bid(models.Model):
@@ -122,11 +189,31 @@ class Bid(models.Model):
         Listing, on_delete=models.CASCADE, related_name="bids")
     user = models.ForeignKey(
         auth_models.User, on_delete=models.CASCADE, related_name="bids")
-    creation_time = models.DateTimeField(auto_now_add=True)
+    creation_time = models.DateTimeField(
+        default=timezone.now, editable=False)
     value = models.DecimalField(max_digits=9, decimal_places=2)
+    # Up to where the bid is raised automatically, when outbid.
+    max_value = models.DecimalField(
+        max_digits=9, decimal_places=2, null=True, blank=True)
 
     class Meta:
         ordering = ('-value',)
+        indexes = [
+            # Top bid of a listing, and its bids list.
+            models.Index(
+                fields=['listing', '-value'],
+                name='bid_listing_value_idx'
+            ),
+            # Bids lists, paginated on (creation_time, id).
+            models.Index(
+                fields=['creation_time', 'id'],
+                name='bid_creation_time_idx'
+            ),
+            models.Index(
+                fields=['user', 'creation_time', 'id'],
+                name='bid_user_creation_time_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"Bid #{self.id} on {self.listing.title} by {self.user.username}"
@@ -162,3 +249,32 @@ class Question(models.Model):
         return f"{self.user} "\
             f"{((timezone.now() - self.time).total_seconds()//3600):.0f} "\
             f"hours ago: {self.body}"
+
+
+@dispatch.receiver(models.signals.post_save, sender=Listing)
+def invalidate_listing_cache(sender, instance, **kwargs):
+    listing_cache.bump(instance.pk)
+
+
+@dispatch.receiver(models.signals.post_save, sender=Bid)
+@dispatch.receiver(models.signals.post_delete, sender=Bid)
+@dispatch.receiver(models.signals.post_save, sender=Question)
+def invalidate_listing_cache_from_child(sender, instance, **kwargs):
+    listing_cache.bump(instance.listing_id)
+
+
+@dispatch.receiver(models.signals.post_save, sender=Answer)
+def invalidate_listing_cache_from_answer(sender, instance, **kwargs):
+    try:
+        question = instance.question
+    except Question.DoesNotExist:
+        # Not attached yet, saving the question invalidates the listing.
+        return
+    listing_cache.bump(question.listing_id)
+    live.publish_answer(question)
+
+
+@dispatch.receiver(models.signals.post_save, sender=Question)
+def publish_answer(sender, instance, **kwargs):
+    if instance.answer_id is not None:
+        live.publish_answer(instance)
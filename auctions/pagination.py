@@ -0,0 +1,164 @@
+import base64
+import binascii
+import datetime
+import functools
+import json
+from collections import abc
+from django.core import exceptions
+from django.db.models import Q
+
+
+class InvalidCursor(Exception):
+    """Raised when a pagination cursor can not be decoded.
+    """
+
+
+class KeysetPage(abc.Sequence):
+    """A page of a `KeysetPaginator`. Only knows whether there are pages
+    before and after it, never how many.
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """Paginates a queryset by seeking past the ordering key of the last row
+    of the previous page, e.g. `('end_time', 'id')`, instead of counting and
+    offsetting, so every page costs a single indexed query.
+
+    The last key must be unique, and none of the keys can be null.
+    """
+
+    def __init__(self, ordering, page_size):
+        self.ordering = tuple(ordering)
+        self.page_size = page_size
+
+    def paginate(self, queryset, cursor=None):
+        position, reverse = (None, False)
+        if cursor:
+            position, reverse = self.decode_cursor(queryset.model, cursor)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(_flip(key) for key in ordering)
+        queryset = queryset.order_by(*ordering)
+        selected = queryset.query.values_select
+        if selected:
+            # Rows from values() need the ordering keys of their cursors.
+            missing = [
+                _name(key) for key in ordering
+                if _name(key) not in selected and
+                _name(key) not in queryset.query.annotation_select
+            ]
+            if missing:
+                queryset = queryset.values(
+                    *selected, *queryset.query.annotation_select, *missing)
+        if position is not None:
+            queryset = queryset.filter(_seek(ordering, position))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            has_next, has_previous = bool(rows), has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+
+        return KeysetPage(
+            rows,
+            next_cursor=self.encode_cursor(rows[-1]) if has_next else None,
+            previous_cursor=(
+                self.encode_cursor(rows[0], reverse=True)
+                if has_previous and rows else None
+            ),
+        )
+
+    def encode_cursor(self, row, reverse=False):
+        # Rows are model instances, or dictionaries from `values()`.
+        get = row.get if isinstance(row, dict) else functools.partial(
+            getattr, row)
+        position = [_encode_value(get(_name(key))) for key in self.ordering]
+        data = json.dumps({'p': position, 'r': reverse}).encode()
+        return base64.urlsafe_b64encode(data).decode()
+
+    def decode_cursor(self, model, cursor):
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            position, reverse = data['p'], bool(data['r'])
+            if len(position) != len(self.ordering):
+                raise InvalidCursor(cursor)
+            return [
+                _decode_value(model, _name(key), value)
+                for key, value in zip(self.ordering, position)
+            ], reverse
+        except (TypeError, ValueError, KeyError, binascii.Error,
+                exceptions.ValidationError):
+            raise InvalidCursor(cursor)
+
+
+def _name(key):
+    return key.lstrip('-')
+
+
+def _flip(key):
+    return key[1:] if key.startswith('-') else f'-{key}'
+
+
+def _seek(ordering, position):
+    """Builds the lookup of the rows after `position` in `ordering`, i.e.
+    `a > x OR (a = x AND b > y)` for `('a', 'b')`.
+    """
+    lookup = None
+    for key, value in reversed(list(zip(ordering, position))):
+        name = _name(key)
+        after = Q(**{f"{name}__{'lt' if key.startswith('-') else 'gt'}": value})
+        if lookup is not None:
+            after |= Q(**{name: value}) & lookup
+        lookup = after
+    return lookup
+
+
+def _encode_value(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+def _decode_value(model, name, value):
+    if name == 'pk':
+        field = model._meta.pk
+    else:
+        try:
+            field = model._meta.get_field(name)
+        except exceptions.FieldDoesNotExist:
+            # Annotations, such as the search rank, are plain numbers.
+            return float(value)
+    return field.to_python(value)
+
+
+def listing_ordering(queryset):
+    """Returns the keyset ordering of a listings queryset. Ranked search
+    results keep their relevance order.
+    """
+    if 'rank' in queryset.query.annotations:
+        return ('-rank', 'id')
+    return ('end_time', 'id')
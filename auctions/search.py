@@ -0,0 +1,43 @@
+from django.contrib.postgres import search as postgres_search
+from django.db import connections
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast
+
+
+class SimpleSearchBackend:
+    """Matches the query as a substring of the title or the description.
+    Used on databases without full text search, such as the sqlite3
+    database of the test settings.
+    """
+
+    def search(self, queryset, query):
+        return queryset.filter(
+            Q(title__icontains=query) |
+            Q(description__icontains=query)
+        )
+
+
+class PostgresSearchBackend:
+    """Matches the query against `Listing.search_vector`, which is kept up
+    to date by a trigger and covered by a GIN index, and orders the results
+    by relevance (title matches weigh more than description matches).
+    """
+    config = 'english'
+
+    def search(self, queryset, query):
+        search_query = postgres_search.SearchQuery(
+            query, config=self.config, search_type='websearch')
+        # The rank is cast to double precision so that it round trips
+        # exactly through the keyset pagination cursors.
+        rank = Cast(
+            postgres_search.SearchRank(F('search_vector'), search_query),
+            FloatField()
+        )
+        return queryset.filter(search_vector=search_query).annotate(
+            rank=rank).order_by('-rank', 'id')
+
+
+def get_backend(using='default'):
+    if connections[using].vendor == 'postgresql':
+        return PostgresSearchBackend()
+    return SimpleSearchBackend()
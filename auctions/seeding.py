@@ -0,0 +1,372 @@
+"""
+Synthetic auctions data, loaded at database speed for the benchmarks.
+
+Rows are built in memory with their primary keys, and their denormalized
+columns already consistent (the current bid of the listings, their winner
+once closed), then inserted by `bulk_create` or, on PostgreSQL, by COPY.
+Neither calls `Listing.save()` nor sends the model signals, so no cache
+invalidation, live event or Celery task is triggered per row.
+
+The popularity of the listings follows a Pareto distribution, which gives
+their bids, watchers and questions, and the activity of the users and the
+size of the categories follow Zipf distributions, so a few listings, users
+and categories get most of the traffic, as they do in real auctions.
+"""
+import dataclasses
+import decimal
+import io
+import itertools
+import random
+import time
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.management.color import no_style
+from django.db import (
+    DEFAULT_DB_ALIAS, connection, connections, models as db_models, transaction
+)
+from django.utils import timezone
+from authentication import models as auth_models
+from . import latest_bids, models
+
+
+WORDS = (
+    "guitar piano violin drum amplifier vinyl record camera lens tripod "
+    "bicycle helmet skateboard scooter car truck motorcycle tire engine "
+    "watch ring necklace bracelet earring painting poster frame lamp chair "
+    "table sofa desk shelf mirror rug vase clock phone laptop tablet monitor "
+    "keyboard mouse console controller game book comic novel map stamp coin "
+    "card doll robot puzzle kite tent backpack boots jacket scarf hat glove "
+    "vintage antique rare signed limited edition classic modern handmade "
+    "wooden leather silver golden electric acoustic portable digital"
+).split()
+
+CENT = decimal.Decimal('0.01')
+MAX_INITIAL_PRICE = 50_000
+
+
+@dataclasses.dataclass
+class Options:
+    users: int = 10_000
+    categories: int = 20
+    listings: int = 100_000
+    bids: int = 1_000_000
+    watches: int = 500_000
+    questions: int = 50_000
+    # Shape of the Pareto distribution of the popularity, lower is more
+    # skewed.
+    popularity_alpha: float = 1.2
+    # Exponents of the Zipf distributions of the users and categories.
+    user_skew: float = 1.0
+    category_skew: float = 1.0
+    # Listings are created over this many past days.
+    history_days: int = 60
+    answered_fraction: float = 0.6
+    proxy_fraction: float = 0.1
+    ended_fraction: float = 0.02
+    private_fraction: float = 0.03
+    batch_size: int = 10_000
+    seed: int = 0
+    password: str = None
+
+
+def zipf_cum_weights(count, skew):
+    return list(itertools.accumulate(
+        1 / rank ** skew for rank in range(1, count + 1)))
+
+
+def apportion(rng, total, weights, weights_sum):
+    """Splits `total` in proportion to `weights`, rounding each part up or
+    down at random so the parts add up to `total` on average.
+    """
+    return [int(total * weight / weights_sum + rng.random())
+            for weight in weights]
+
+
+class BulkCreateLoader:
+    """Inserts the rows with `bulk_create`, on any database."""
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+
+    def load(self, model, objects):
+        model.objects.bulk_create(objects, batch_size=self.batch_size)
+
+
+class CopyLoader:
+    """Streams the rows to PostgreSQL with COPY, in its text format."""
+
+    ESCAPES = str.maketrans({
+        '\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+    def encode(self, value):
+        if value is None:
+            return '\\N'
+        if isinstance(value, bool):
+            return 't' if value else 'f'
+        return str(value).translate(self.ESCAPES)
+
+    def load(self, model, objects):
+        if not objects:
+            return
+        # The connection proxy costs a lookup per use, too many per field.
+        db = connections[DEFAULT_DB_ALIAS]
+        fields = [
+            field for field in model._meta.concrete_fields
+            if not (field.primary_key and objects[0].pk is None)
+        ]
+        prepare = [(field.attname, field.get_db_prep_save) for field in fields]
+        encode = self.encode
+        buffer = io.StringIO()
+        for obj in objects:
+            buffer.write('\t'.join([
+                encode(prep(getattr(obj, attname), db))
+                for attname, prep in prepare
+            ]))
+            buffer.write('\n')
+        buffer.seek(0)
+        columns = ', '.join(
+            db.ops.quote_name(field.column) for field in fields)
+        with db.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {db.ops.quote_name(model._meta.db_table)} '
+                f'({columns}) FROM STDIN',
+                buffer
+            )
+
+
+def next_id(model):
+    return (model.objects.aggregate(
+        last=db_models.Max('pk'))['last'] or 0) + 1
+
+
+class Seeder:
+    """Generates and loads a synthetic dataset, reporting the number of rows
+    inserted per model.
+    """
+
+    def __init__(self, options, loader=None):
+        self.options = options
+        self.rng = random.Random(options.seed)
+        if loader is None:
+            loader = CopyLoader() if connection.vendor == 'postgresql' \
+                else BulkCreateLoader(options.batch_size)
+        self.loader = loader
+        self.counts = dict.fromkeys(
+            ('users', 'categories', 'listings', 'bids', 'watches',
+             'questions', 'answers'), 0)
+        self.now = timezone.now()
+
+    def load(self, model, objects, name):
+        self.loader.load(model, objects)
+        self.counts[name] += len(objects)
+
+    def run(self, progress=None):
+        start = time.perf_counter()
+        with transaction.atomic():
+            self.seed_users()
+            self.seed_categories()
+        for chunk in range(0, self.options.listings, self.options.batch_size):
+            size = min(self.options.batch_size, self.options.listings - chunk)
+            with transaction.atomic():
+                self.seed_listings(size)
+            if progress is not None:
+                progress(self.counts, time.perf_counter() - start)
+        self.finish()
+        return self.counts, time.perf_counter() - start
+
+    def seed_users(self):
+        first = next_id(auth_models.User)
+        password = hashers.make_password(self.options.password)
+        self.user_ids = list(range(first, first + self.options.users))
+        self.user_weights = zipf_cum_weights(
+            self.options.users, self.options.user_skew)
+        for batch in self.batches(self.user_ids):
+            self.load(auth_models.User, [
+                auth_models.User(
+                    id=pk,
+                    username=f'seed-user-{pk}',
+                    email=f'seed-user-{pk}@example.com',
+                    first_name="Seed",
+                    last_name=f"User {pk}",
+                    password=password,
+                    date_joined=self.now,
+                )
+                for pk in batch
+            ], 'users')
+
+    def seed_categories(self):
+        first = next_id(models.Category)
+        self.category_ids = list(
+            range(first, first + self.options.categories))
+        self.category_weights = zipf_cum_weights(
+            self.options.categories, self.options.category_skew)
+        self.load(models.Category, [
+            models.Category(id=pk, name=f'seed-category-{pk}')
+            for pk in self.category_ids
+        ], 'categories')
+
+    def seed_listings(self, size):
+        rng = self.rng
+        options = self.options
+        popularity = [
+            rng.paretovariate(options.popularity_alpha) for _ in range(size)]
+        # Each chunk gets its share of the bids, watches and questions.
+        share = size / options.listings
+        total = sum(popularity)
+        bid_counts = apportion(rng, options.bids * share, popularity, total)
+        watch_counts = apportion(
+            rng, options.watches * share, popularity, total)
+        question_counts = apportion(
+            rng, options.questions * share, popularity, total)
+
+        listing_id = next_id(models.Listing)
+        bid_id = next_id(models.Bid)
+        listings, bids, watches = [], [], []
+        for offset in range(size):
+            listing = self.make_listing(listing_id + offset)
+            listing_bids = self.make_bids(listing, bid_id, bid_counts[offset])
+            bid_id += len(listing_bids)
+            bids += listing_bids
+            listings.append(listing)
+            watchers = rng.sample(
+                self.user_ids, min(watch_counts[offset], len(self.user_ids)))
+            watches += [
+                models.Listing.watchers.through(
+                    listing_id=listing.pk, user_id=user_id)
+                for user_id in watchers
+            ]
+        self.load(models.Listing, listings, 'listings')
+        for batch in self.batches(bids):
+            self.load(models.Bid, batch, 'bids')
+        for batch in self.batches(watches):
+            self.load(models.Listing.watchers.through, batch, 'watches')
+        self.seed_questions(listings, question_counts)
+
+    def make_listing(self, pk):
+        rng = self.rng
+        options = self.options
+        creation_time = self.now - timezone.timedelta(
+            seconds=rng.uniform(0, options.history_days * 24 * 60 * 60))
+        duration = rng.choice(models.Listing.DURATIONS)[0]
+        end_time = creation_time + timezone.timedelta(days=duration)
+        ended_manually = rng.random() < options.ended_fraction
+        initial_price = decimal.Decimal(
+            min(rng.lognormvariate(3.5, 1.2), MAX_INITIAL_PRICE)
+        ).quantize(CENT) + CENT
+        return models.Listing(
+            id=pk,
+            author_id=self.user(),
+            category_id=rng.choices(
+                self.category_ids, cum_weights=self.category_weights)[0],
+            title=" ".join(rng.choices(WORDS, k=3)).capitalize(),
+            description=" ".join(rng.choices(WORDS, k=15)).capitalize(),
+            initial_price=initial_price,
+            creation_time=creation_time,
+            end_time=end_time,
+            duration=duration,
+            ended_manually=ended_manually,
+            closed=ended_manually or end_time <= self.now,
+            public=rng.random() >= options.private_fraction,
+            bid_count=0,
+        )
+
+    def make_bids(self, listing, first_id, count):
+        """Returns the increasing bids of a listing, and sets its current bid
+        and its winner from the last one.
+        """
+        rng = self.rng
+        last_time = min(listing.end_time, self.now)
+        span = (last_time - listing.creation_time).total_seconds()
+        times = sorted(
+            listing.creation_time + timezone.timedelta(
+                seconds=rng.uniform(0, span))
+            for _ in range(count)
+        )
+        value = listing.initial_price
+        bids = []
+        for pk, creation_time in zip(itertools.count(first_id), times):
+            # Raises in proportion to the initial price, so the thousands of
+            # bids of the most popular listings stay within the price digits.
+            value += max(
+                settings.BID_INCREMENT,
+                (listing.initial_price * decimal.Decimal(
+                    rng.uniform(0.001, 0.01))).quantize(CENT))
+            user_id = self.user()
+            if user_id == listing.author_id:
+                # The ids are consecutive, this is the next user.
+                first = self.user_ids[0]
+                user_id = first + (user_id - first + 1) % len(self.user_ids)
+            bids.append(models.Bid(
+                id=pk,
+                listing_id=listing.pk,
+                user_id=user_id,
+                value=value,
+                creation_time=creation_time,
+            ))
+        listing.proxy_max = listing.initial_price
+        if bids:
+            top = bids[-1]
+            if rng.random() < self.options.proxy_fraction:
+                top.max_value = (top.value * decimal.Decimal(
+                    rng.uniform(1.05, 1.5))).quantize(CENT)
+            listing.current_price = top.value
+            listing.current_bidder_id = top.user_id
+            listing.current_bid_time = top.creation_time
+            listing.bid_count = len(bids)
+            listing.proxy_max = top.max_value or top.value
+            if listing.closed:
+                listing.winner_id = top.user_id
+        return bids
+
+    def seed_questions(self, listings, counts):
+        rng = self.rng
+        answer_id = next_id(models.Answer)
+        question_id = next_id(models.Question)
+        answers, questions = [], []
+        for listing, count in zip(listings, counts):
+            for _ in range(count):
+                answer = None
+                if rng.random() < self.options.answered_fraction:
+                    answer = models.Answer(
+                        id=answer_id,
+                        author_id=listing.author_id,
+                        time=self.now,
+                        body=" ".join(rng.choices(WORDS, k=8)).capitalize(),
+                    )
+                    answers.append(answer)
+                    answer_id += 1
+                questions.append(models.Question(
+                    id=question_id,
+                    listing_id=listing.pk,
+                    user_id=self.user(),
+                    time=self.now,
+                    body=" ".join(rng.choices(WORDS, k=8)).capitalize() + "?",
+                    answer_id=answer.pk if answer else None,
+                ))
+                question_id += 1
+        for batch in self.batches(answers):
+            self.load(models.Answer, batch, 'answers')
+        for batch in self.batches(questions):
+            self.load(models.Question, batch, 'questions')
+
+    def finish(self):
+        """Moves the sequences past the explicit primary keys, and refreshes
+        what the signals would have.
+        """
+        tables = [auth_models.User, models.Category, models.Listing,
+                  models.Bid, models.Answer, models.Question]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), tables):
+                cursor.execute(sql)
+            if connection.vendor == 'postgresql':
+                cursor.execute("ANALYZE")
+        latest_bids.invalidate()
+
+    def user(self):
+        return self.rng.choices(
+            self.user_ids, cum_weights=self.user_weights)[0]
+
+    def batches(self, objects):
+        size = self.options.batch_size
+        for start in range(0, len(objects), size):
+            yield objects[start:start + size]
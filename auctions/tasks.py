@@ -4,17 +4,38 @@ from celery.utils import log
 
 logger = log.get_task_logger(__name__)
 
+
+@shared_task(name="close_finished_listings")
+def close_finished_listings_task(batch_size=500, max_batches=20):
+    from .models import Listing
+
+    closed = Listing.objects.close_finished(
+        batch_size=batch_size, max_batches=max_batches)
+    if closed:
+        logger.info(f"{closed} auction(s) have been closed.")
+    return closed
+
+
+@shared_task(name="apply_bid")
+def apply_bid_task(ticket, listing_id, user_id, value, max_value=None):
+    # Routed to the `bids.*` queue of the listing by `intake.submit`.
+    from . import intake
+
+    return intake.apply(ticket, listing_id, user_id, value, max_value)
+
+
 @shared_task(name="set_winner")
 def set_listing_winner_task(pk):
+    # Kept so that the ETA tasks queued before the closing sweeper existed
+    # can still be consumed. Listings are closed by the sweeper now.
     from .models import Listing
-    from django.shortcuts import get_object_or_404
-    
-    listing = get_object_or_404(Listing, pk=pk)
-    
-    if not listing.bids.all().exists() or listing.winner.exists():
-        return
-    
-    listing.winner = listing.bids.first().user
-    listing.save()
-    
-    logger.info(f"Auction {listing} completion has been scheduled.")
\ No newline at end of file
+    from django.utils import timezone
+
+    Listing.objects.filter(pk=pk, end_time__lte=timezone.now()).close()
+
+
+@shared_task(name="export")
+def export_task(job, kind, format, filters):
+    from . import exports
+
+    return exports.run(job, kind, format, filters)
@@ -0,0 +1,163 @@
+"""
+Token bucket rate limiting of the bid, watch and search endpoints.
+
+Each scope of `THROTTLE_RATES` has a bucket per user and a bucket per IP
+address, with rates like "30/min": a bucket holds up to 30 tokens and gains
+them back at 30 per minute, so short bursts pass and floods do not. A
+request takes one token from each of its buckets, or none when one of them
+is empty, in which case it is told how long to wait for one.
+
+With the Redis cache, all the buckets of a request are checked and updated
+by one Lua script, so the limiter costs a single round trip. Other caches
+fall back to a lock held by the process.
+"""
+import functools
+import math
+import threading
+import time
+from django import http
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.redis import RedisCache
+
+
+DURATIONS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+TOKEN_BUCKET_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local wait = 0
+local tokens = {}
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i])
+    local bucket = redis.call('HMGET', key, 'tokens', 'time')
+    local available = tonumber(bucket[1]) or capacity
+    local elapsed = math.max(0, now - (tonumber(bucket[2]) or now))
+    available = math.min(capacity, available + elapsed * rate)
+    if available < 1 then
+        wait = math.max(wait, (1 - available) / rate)
+    end
+    tokens[i] = available
+end
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[2 * i - 1])
+    local rate = tonumber(ARGV[2 * i])
+    if wait == 0 then
+        tokens[i] = tokens[i] - 1
+    end
+    redis.call('HSET', key, 'tokens', tostring(tokens[i]), 'time', tostring(now))
+    redis.call('EXPIRE', key, math.ceil(capacity / rate) + 1)
+end
+return tostring(wait)
+"""
+
+
+def parse_rate(rate):
+    """Returns the capacity and the refill period in seconds of a rate like
+    "30/min".
+    """
+    count, period = rate.split('/')
+    return int(count), DURATIONS[period[0]]
+
+
+class Bucket:
+
+    def __init__(self, key, rate):
+        self.key = key
+        self.capacity, period = parse_rate(rate)
+        self.rate = self.capacity / period
+
+
+def buckets(scope, user_id=None, ip=None):
+    """Returns the buckets of a request in a scope, among the configured
+    ones.
+    """
+    rates = settings.THROTTLE_RATES
+    idents = {'user': user_id, 'ip': ip}
+    return [
+        Bucket(f'throttle:{scope}:{kind}:{ident}', rates[f'{scope}.{kind}'])
+        for kind, ident in idents.items()
+        if ident is not None and f'{scope}.{kind}' in rates
+    ]
+
+
+def consume(request_buckets):
+    """Takes a token from each bucket, and returns 0 when it did or the
+    seconds to wait for one otherwise.
+    """
+    if not request_buckets:
+        return 0
+    # `cache` is a proxy, the backend itself tells which cache is used.
+    backend = caches['default']
+    if isinstance(backend, RedisCache):
+        return _consume_redis(backend, request_buckets)
+    return _consume_local(request_buckets)
+
+
+_scripts = {}
+
+
+def _consume_redis(backend, request_buckets):
+    client = backend._cache.get_client(write=True)
+    script = _scripts.get(id(client))
+    if script is None:
+        script = _scripts[id(client)] = client.register_script(
+            TOKEN_BUCKET_SCRIPT)
+    args = []
+    for bucket in request_buckets:
+        args += [bucket.capacity, bucket.rate]
+    return float(script(
+        keys=[backend.make_key(bucket.key) for bucket in request_buckets],
+        args=args))
+
+
+_lock = threading.Lock()
+
+
+def _consume_local(request_buckets):
+    with _lock:
+        now = time.time()
+        states = cache.get_many([bucket.key for bucket in request_buckets])
+        wait = 0
+        tokens = {}
+        for bucket in request_buckets:
+            available, updated = states.get(bucket.key, (bucket.capacity, now))
+            available = min(
+                bucket.capacity,
+                available + max(0, now - updated) * bucket.rate)
+            if available < 1:
+                wait = max(wait, (1 - available) / bucket.rate)
+            tokens[bucket.key] = available
+        for bucket in request_buckets:
+            if not wait:
+                tokens[bucket.key] -= 1
+            cache.set(
+                bucket.key, (tokens[bucket.key], now),
+                timeout=math.ceil(bucket.capacity / bucket.rate) + 1)
+        return wait
+
+
+def client_ip(request):
+    return request.META.get('REMOTE_ADDR')
+
+
+def throttle(scope, condition=None):
+    """Decorates a view to throttle its requests in a scope, when the
+    `condition` on the request holds.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if condition is None or condition(request):
+                user_id = request.user.id if request.user.is_authenticated \
+                    else None
+                wait = consume(buckets(scope, user_id, client_ip(request)))
+                if wait:
+                    response = http.HttpResponse(
+                        "Too many requests, try again later.", status=429)
+                    response['Retry-After'] = str(math.ceil(wait))
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -4,20 +4,27 @@ from django.contrib.auth import (
     mixins as auth_mixins
 )
 from django import http, urls
-from django.utils import timezone
-from . import forms, models
+from django.db.models import Count, Q
+from django.utils import decorators, timezone
+from . import (
+    bidding, forms, latest_bids, listing_cache, models, pagination,
+    throttling
+)
 from django.views import generic
 
 
+@decorators.method_decorator(
+    throttling.throttle('search', condition=lambda request: 'q' in request.GET),
+    name='dispatch'
+)
 class ListingListView(generic.ListView):
     template_name = 'auctions/index.html'
-    queryset = models.Listing.objects.active()
-    ordering = ('end_time',)
+    model = models.Listing
     paginate_by = 10
     watchlist = False
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().active()
         if category := self.kwargs.get('category'):
             queryset = queryset.from_category(category=category)
         elif self.watchlist:
@@ -26,6 +33,15 @@ class ListingListView(generic.ListView):
             queryset = queryset.search(query=q)
         return queryset
 
+    def paginate_queryset(self, queryset, page_size):
+        paginator = pagination.KeysetPaginator(
+            pagination.listing_ordering(queryset), page_size)
+        try:
+            page = paginator.paginate(queryset, self.request.GET.get('cursor'))
+        except pagination.InvalidCursor:
+            raise http.Http404("Invalid cursor")
+        return (paginator, page, page.object_list, page.has_other_pages())
+
     def get_context_data(self):
         context = super().get_context_data()
         context['title'] = "Active Listings"
@@ -35,7 +51,7 @@ class ListingListView(generic.ListView):
             context['title'] = f"Watchlist"
         elif q := self.request.GET.get('q'):
             context['title'] = f"Search results for {q}"
-        context['latest_bids'] = models.Bid.objects.all()[:5]
+        context['latest_bids'] = latest_bids.get()
         return context
 
 
@@ -58,6 +74,10 @@ class ListingDetailsView(generic.DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         listing = context['listing']
+        context['listing_version'] = listing_cache.version(listing.pk)
+        context['fragment_timeout'] = listing_cache.FRAGMENT_TIMEOUT
+        # Only evaluated when the questions fragment is not cached.
+        context['questions'] = listing.questions.select_related('user')
         context['finished'] = listing.is_finished()
         if context['finished']:
             return context
@@ -69,21 +89,22 @@ class ListingDetailsView(generic.DetailView):
             time_remaining.seconds/60 - (context['hours'] * 60)
         )
 
-        context['is_author'] = self.request.user == listing.author
+        context['is_author'] = self.request.user.id == listing.author_id
 
         context['watching'] = False
-        if self.request.user.watchlist.all().exists():
-            context['watching'] = listing in self.request.user.watchlist.all()
-
-        context['highest_bid'] = False
-        if listing.bids.exists():
-            context['highest_bid'] = listing.bids.all().first()
-
-        context['is_usr_curr_bid'] = False
-        if self.request.user.bids.filter(listing=listing).exists():
-            usr_curr_bid = self.request.user.bids.filter(
-                listing=listing).first()
-            context['is_usr_curr_bid'] = usr_curr_bid == listing.bids.first()
+        if self.request.user.is_authenticated:
+            # The watchlist badge and the watch button in one query.
+            watchlist = self.request.user.watchlist.aggregate(
+                count=Count('pk'),
+                watching=Count('pk', filter=Q(pk=listing.pk))
+            )
+            context['watchlist_count'] = watchlist['count']
+            context['watching'] = bool(watchlist['watching'])
+
+        context['is_usr_curr_bid'] = bool(
+            listing.current_bidder_id and
+            listing.current_bidder_id == self.request.user.id
+        )
 
         context["bid_form"] = forms.BidForm()
         context["question_form"] = forms.QuestionForm()
@@ -92,32 +113,37 @@ class ListingDetailsView(generic.DetailView):
 
 
 @auth_decorators.login_required
+@throttling.throttle('bids')
 def bid(request, pk):
     bid_form = forms.BidForm(request.POST)
 
     if bid_form.is_valid():
-        listing = models.Listing.objects.get(pk=pk)
-        new_bid = bid_form.save(commit=False)
-        current_bids = models.Bid.objects.filter(listing=listing)
-        is_highest = all(new_bid.value > n.value for n in current_bids)
-        is_valid = new_bid.value > listing.initial_price
-        if not is_valid:
-            messages.error(
-                request, "Bid denied. A bid must exceed the intial price.")
-        elif is_valid and is_highest:
-            new_bid.listing = listing
-            new_bid.user = request.user
-            new_bid.save()
-            messages.success(request, "Bid posted!")
+        try:
+            bid = bidding.place_bid(
+                pk, request.user,
+                bid_form.cleaned_data['value'],
+                bid_form.cleaned_data['max_value'],
+            )
+        except models.Listing.DoesNotExist:
+            raise http.Http404("No listing found matching the query")
+        except bidding.BidRejected as error:
+            messages.error(request, str(error))
+        else:
+            if bid.max_only:
+                messages.success(request, "Maximum bid raised!")
+            elif not bid.leading:
+                messages.warning(request, "You were outbid by a proxy bid.")
+            else:
+                messages.success(request, "Bid posted!")
 
     return http.HttpResponseRedirect(
-        urls.reverse('listing', kwargs={'pk': listing.id}))
+        urls.reverse('listing', kwargs={'pk': pk}))
 
 
 @auth_decorators.login_required
 def close_listing(request, pk):
     listing = models.Listing.objects.get(pk=pk)
-    if request.user == models.listing.user:
+    if request.user.id == listing.author_id:
         listing.ended_manually = True
         listing.save(update_fields=['ended_manually'])
         messages.success(
@@ -128,7 +154,7 @@ def close_listing(request, pk):
 
 @auth_decorators.login_required
 def add_question(request, pk):
-    question_form = models.Question(request.POST)
+    question_form = forms.QuestionForm(request.POST)
     if question_form.is_valid():
         new_question = question_form.save(commit=False)
         new_question.listing = models.Listing.objects.get(pk=pk)
@@ -139,6 +165,7 @@ def add_question(request, pk):
 
 
 @auth_decorators.login_required
+@throttling.throttle('watch')
 def watch(request, pk):
     listing = models.Listing.objects.get(pk=pk)
     watchings = request.user.watchlist
@@ -2,6 +2,7 @@ from django import shortcuts, db, http, urls
 from django.contrib import auth, messages
 from . import models as auth_models, serializers as auth_serializers
 from rest_framework import generics, views, permissions, response, exceptions
+from api import mixins as api_mixins
 
 
 # App views
@@ -62,7 +63,8 @@ def register(request):
     
 # API endpoints
 
-class RegisterAPIView(generics.CreateAPIView):
+class RegisterAPIView(api_mixins.IdempotentCreateMixin,
+                      generics.CreateAPIView):
     queryset = auth_models.User.objects.all()
     permission_classes = (permissions.AllowAny,)
     serializer_class = auth_serializers.RegistrationSerializer
@@ -2,6 +2,8 @@
 ASGI config for commerce project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The live events of the listings are streamed by `auctions.live`, every other
+request is handled by Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.0/howto/deployment/asgi/
@@ -13,4 +15,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'commerce.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from auctions import live  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http':
+        if match := live.EVENTS_PATH.match(scope['path']):
+            return await live.listing_events(
+                scope, receive, send, int(match['pk']))
+    return await django_application(scope, receive, send)
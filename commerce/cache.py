@@ -0,0 +1,31 @@
+"""
+Cache backends counting their hits and misses for `commerce.metrics`.
+"""
+from django.core.cache.backends import locmem, redis
+from . import metrics
+
+
+_missing = object()
+
+
+class LocMemCache(locmem.LocMemCache):
+
+    # `get_many` of the local memory cache calls `get` for each key.
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _missing, version)
+        metrics.record_cache_lookups([key], () if value is _missing else [key])
+        return default if value is _missing else value
+
+
+class RedisCache(redis.RedisCache):
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _missing, version)
+        metrics.record_cache_lookups([key], () if value is _missing else [key])
+        return default if value is _missing else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        values = super().get_many(keys, version)
+        metrics.record_cache_lookups(keys, values)
+        return values
@@ -9,6 +9,9 @@ app = Celery('commerce')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks(lambda: settings.INSTALLED_APPS)
 
+# Connects the task runtime signal handlers.
+from . import metrics  # noqa: E402
+
 @app.task(bind=True)
 def debug_task(self):
     print('Request: {0!r}'.format(self.request))
\ No newline at end of file
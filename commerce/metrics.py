@@ -0,0 +1,309 @@
+"""
+Request, SQL, cache and Celery task metrics, exposed in the Prometheus text
+format on `/metrics`.
+
+`MetricsMiddleware` records the latency, the number of SQL queries and the
+SQL time of each request, labelled by view name, and the cache backends of
+`commerce.cache` count their hits and misses. These are kept by each web
+process, which is scraped on its own.
+
+The Celery signal hooks below record the runtime of every task. Tasks run
+in the worker pool processes, so their histogram is kept in the cache
+instead, and served by any web process.
+
+The endpoint is served to staff users, and to scrapers sending the
+`METRICS_TOKEN` setting as a bearer token.
+"""
+import bisect
+import contextlib
+import hmac
+import threading
+import time
+from celery import signals
+from django import http
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+TASK_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+TASK_STATES = ('SUCCESS', 'FAILURE', 'RETRY')
+
+# The cache backends do not count the lookups of these keys.
+CACHE_PREFIX = 'metrics:'
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key, **extra):
+        pairs = list(zip(self.labelnames, key)) + list(extra.items())
+        if not pairs:
+            return ''
+        escaped = (
+            (name, value.replace('\\', r'\\').replace('"', r'\"'))
+            for name, value in pairs
+        )
+        return '{' + ','.join(f'{n}="{v}"' for n, v in escaped) + '}'
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def _items(self):
+        with self._lock:
+            return sorted(self._values.items())
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}',
+        ]
+        for key, value in self._items():
+            lines += self._samples(key, value)
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return dict(self._items()).get(self._key(labels), 0)
+
+    def _samples(self, key, value):
+        return [f'{self.name}_total{self._labels(key)} {value}']
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, amount, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(
+                key, ([0] * (len(self.buckets) + 1), 0))
+            counts[bisect.bisect_left(self.buckets, amount)] += 1
+            self._values[key] = (counts, total + amount)
+
+    def count(self, **labels):
+        counts, _ = dict(self._items()).get(self._key(labels), ([], 0))
+        return sum(counts)
+
+    def _samples(self, key, value):
+        counts, total = value
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), counts):
+            cumulative += count
+            samples.append(
+                f'{self.name}_bucket{self._labels(key, le=str(bound))} '
+                f'{cumulative}')
+        samples.append(f'{self.name}_sum{self._labels(key)} {total}')
+        samples.append(f'{self.name}_count{self._labels(key)} {cumulative}')
+        return samples
+
+
+class SharedHistogram(Histogram):
+    """Histogram kept in the cache, for the metrics recorded by other
+    processes. Its label sets are known in advance, given by `labelsets`.
+    """
+
+    def __init__(self, name, documentation, labelnames, labelsets,
+                 buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames, buckets)
+        self.labelsets = labelsets
+
+    def _cache_key(self, key, field):
+        return ':'.join((CACHE_PREFIX + self.name, *key, field))
+
+    def _fields(self):
+        # The sum is kept in microseconds, as the cache only increments
+        # integers.
+        return [str(index) for index in range(len(self.buckets) + 1)] + \
+            ['sum']
+
+    def observe(self, amount, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, amount)
+        for field, delta in ((str(index), 1), ('sum', round(amount * 1e6))):
+            cache_key = self._cache_key(key, field)
+            cache.add(cache_key, 0, timeout=None)
+            try:
+                cache.incr(cache_key, delta)
+            except ValueError:
+                # Evicted since added, the observation is lost.
+                pass
+
+    def _all_keys(self):
+        return {
+            (key, field): self._cache_key(key, field)
+            for key in self.labelsets() for field in self._fields()
+        }
+
+    def _items(self):
+        keys = self._all_keys()
+        values = cache.get_many(keys.values())
+        items = {}
+        for (key, field), cache_key in keys.items():
+            value = values.get(cache_key, 0)
+            counts, total = items.setdefault(
+                key, ([0] * (len(self.buckets) + 1), 0))
+            if field == 'sum':
+                items[key] = (counts, value / 1e6)
+            else:
+                counts[int(field)] = value
+        return sorted(
+            (key, value) for key, value in items.items() if sum(value[0]))
+
+    def clear(self):
+        cache.delete_many(self._all_keys().values())
+
+
+REGISTRY = []
+
+
+def _task_labelsets():
+    from .celeryapp import app
+
+    # Outside of the workers the tasks modules are only found on demand.
+    app.loader.import_default_modules()
+    return [
+        (name, state) for name in sorted(app.tasks)
+        if not name.startswith('celery.') for state in TASK_STATES
+    ]
+
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', "Latency of the requests by view.",
+    ('view', 'method', 'status'))
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries', "SQL queries run by the requests by view.",
+    ('view',), buckets=QUERY_COUNT_BUCKETS)
+REQUEST_QUERY_TIME = Histogram(
+    'http_request_db_duration_seconds',
+    "Time spent in SQL queries by the requests by view.", ('view',))
+CACHE_REQUESTS = Counter(
+    'cache_requests', "Cache lookups by result.", ('result',))
+TASK_RUNTIME = SharedHistogram(
+    'celery_task_duration_seconds', "Runtime of the Celery tasks.",
+    ('task', 'state'), _task_labelsets, buckets=TASK_BUCKETS)
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    return '\n'.join(lines) + '\n'
+
+
+def _authorized(request):
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+    token = settings.METRICS_TOKEN
+    header = request.headers.get('Authorization', '')
+    return bool(token) and hmac.compare_digest(
+        header.encode(), f'Bearer {token}'.encode())
+
+
+def metrics_view(request):
+    if not _authorized(request):
+        return http.HttpResponseForbidden("Access to the metrics is denied.")
+    return http.HttpResponse(
+        render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class QueryCounter:
+    """Execute wrapper counting the queries run and their time."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+class MetricsMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueryCounter()
+        start = time.perf_counter()
+        with contextlib.ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(queries))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        REQUEST_LATENCY.observe(
+            duration, view=view, method=request.method,
+            status=response.status_code)
+        REQUEST_QUERIES.observe(queries.count, view=view)
+        REQUEST_QUERY_TIME.observe(queries.duration, view=view)
+        return response
+
+
+def record_cache_lookups(keys, found):
+    """Counts the hits and misses of a lookup of `keys`, of which `found`
+    were in the cache.
+    """
+    hits = misses = 0
+    for key in keys:
+        if not key.startswith(CACHE_PREFIX):
+            if key in found:
+                hits += 1
+            else:
+                misses += 1
+    if hits:
+        CACHE_REQUESTS.inc(hits, result='hit')
+    if misses:
+        CACHE_REQUESTS.inc(misses, result='miss')
+
+
+_task_starts = {}
+
+
+@signals.task_prerun.connect
+def start_task_timer(task_id=None, **kwargs):
+    _task_starts[task_id] = time.perf_counter()
+
+
+@signals.task_postrun.connect
+def record_task_runtime(task_id=None, task=None, state=None, **kwargs):
+    start = _task_starts.pop(task_id, None)
+    if start is not None:
+        TASK_RUNTIME.observe(
+            time.perf_counter() - start, task=task.name, state=state)
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.0/ref/settings/
 """
 
+from datetime import timedelta
+from decimal import Decimal
 from pathlib import Path
 from django.contrib.messages import constants as message_constants
 from os import environ
@@ -46,6 +48,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'authentication',
     'auctions',
     'api',
@@ -54,6 +57,7 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    'commerce.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,7 +80,8 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
-                'auctions.context_processors.default_listing_img'
+                'auctions.context_processors.default_listing_img',
+                'auctions.context_processors.watchlist_count'
             ],
         },
     },
@@ -97,11 +102,41 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSIONS_CLASSES": [
         "rest_framework.permissions.IsAuthenticatedOrReadOnly", # Everyone can GET
     ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "api.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.LimitOffsetPagination",
     "PAGE_SIZE": 10
 }
 
 
+# Throttling, see `auctions.throttling`
+
+THROTTLE_RATES = {
+    'bids.user': '30/min',
+    'bids.ip': '120/min',
+    'watch.user': '30/min',
+    'watch.ip': '120/min',
+    'search.user': '60/min',
+    'search.ip': '240/min',
+}
+
+if 'test' in sys.argv:
+    THROTTLE_RATES = {}
+
+
+# Idempotency keys, see `api.mixins.IdempotentCreateMixin`
+
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+
+
+# Metrics, see `commerce.metrics`, served to staff users and to the
+# scrapers sending this bearer token
+
+METRICS_TOKEN = environ.get('METRICS_TOKEN')
+
+
 # Messages
 MESSAGE_TAGS = {
     message_constants.ERROR: 'danger'
@@ -137,6 +172,36 @@ if 'test' in sys.argv:
     }
 
 
+# Cache
+
+CACHES = {
+    'default': {
+        'BACKEND': 'commerce.cache.RedisCache',
+        'LOCATION': environ.get('REDIS_URL', 'redis://redis:6379/1'),
+    }
+}
+
+# Use a local memory cache during tests
+
+if 'test' in sys.argv:
+    CACHES = {
+        'default': {
+            'BACKEND': 'commerce.cache.LocMemCache',
+        }
+    }
+
+
+# Live events
+
+LIVE_EVENTS = {
+    'BACKEND': 'auctions.live.RedisBroker',
+    'LOCATION': environ.get('REDIS_URL', 'redis://redis:6379/1'),
+}
+
+if 'test' in sys.argv:
+    LIVE_EVENTS = {'BACKEND': 'auctions.live.LocalBroker'}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
 
@@ -180,6 +245,28 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_TASK_TRACK_STARTED = True
+CELERY_BEAT_SCHEDULE = {
+    'close-finished-listings': {
+        'task': 'close_finished_listings',
+        'schedule': 60.0,
+        'kwargs': {'batch_size': 500, 'max_batches': 20},
+        'options': {'expires': 55.0},
+    },
+}
+
+
+# Auctions
+
+# Step of the proxy bids over the bids they answer.
+BID_INCREMENT = Decimal(environ.get('BID_INCREMENT', '1.00'))
+
+# Bids placed this close to the end of an auction extend it by as much.
+SOFT_CLOSE_WINDOW = timedelta(
+    seconds=int(environ.get('SOFT_CLOSE_WINDOW', 120)))
+
+# Bids are queued on this many `bids.*` queues instead of being placed by the
+# API (see `auctions.intake`), 0 places them synchronously.
+BID_INTAKE_PARTITIONS = int(environ.get('BID_INTAKE_PARTITIONS', 0))
 
 
 # Static files (CSS, JavaScript, Images)
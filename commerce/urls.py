@@ -17,10 +17,16 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from django.contrib.staticfiles.urls import staticfiles_urlpatterns
+from . import metrics
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('auctions/', include('auctions.urls')),
     path('auth/', include('authentication.urls')),
+    path('metrics', metrics.metrics_view, name='metrics'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+
+# Served by runserver, but not by the ASGI server.
+urlpatterns += staticfiles_urlpatterns()
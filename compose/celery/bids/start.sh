@@ -0,0 +1,18 @@
+#!/bin/bash
+
+set -o errexit
+set -o nounset
+
+partitions="${BID_INTAKE_PARTITIONS:-0}"
+if [ "${partitions}" -eq 0 ]; then
+    # Bids are placed synchronously by the API.
+    exec sleep infinity
+fi
+
+# One single process worker per `bids.*` queue, so the bids of a listing are
+# applied in the order they arrived.
+for partition in $(seq 0 $((partitions - 1))); do
+    celery -A commerce worker -l INFO -Q "bids.${partition}" \
+        -n "bids${partition}@%h" --concurrency 1 --prefetch-multiplier 1 &
+done
+wait
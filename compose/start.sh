@@ -5,4 +5,4 @@ set -o pipefail
 set -o nounset
 
 python manage.py migrate
-python manage.py runserver 0.0.0.0:8000
\ No newline at end of file
+uvicorn commerce.asgi:application --host 0.0.0.0 --port 8000 --reload
\ No newline at end of file
@@ -1,5 +1,12 @@
-from rest_framework import test, reverse as uri
-from auctions import models
+import datetime
+import decimal
+import json
+from unittest import mock
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework import renderers, test, reverse as uri
+from api import renderers as api_renderers, serializers, viewsets
+from auctions import bidding, models
 from authentication import models as auth_models
 
 
@@ -112,15 +119,13 @@ class SetUp(test.APITestCase):
         )
 
         # Bids
-        models.Bid.objects.create(user=user1, listing=listing2, value=12000)
-        models.Bid.objects.create(user=user2, listing=listing1, value=2500)
-        models.Bid.objects.create(user=user1, listing=listing3, value=600)
-        models.Bid.objects.create(user=user2, listing=listing3, value=700)
-        models.Bid.objects.create(user=user3, listing=listing2, value=14000)
-        models.Bid.objects.create(user=user3, listing=listing4, value=10000.00)
-        models.Bid.objects.create(user=self.user,
-                                  listing=listing1,
-                                  value=3000.00)
+        bidding.place_bid(listing2.id, user1, 12000)
+        bidding.place_bid(listing1.id, user2, 2500)
+        bidding.place_bid(listing3.id, user1, 600)
+        bidding.place_bid(listing3.id, user2, 700)
+        bidding.place_bid(listing2.id, user3, 14000)
+        bidding.place_bid(listing4.id, user3, 10000.00)
+        bidding.place_bid(listing1.id, self.user, 3000.00)
 
         # Answers
         question1.answer = models.Answer.objects.create(
@@ -145,7 +150,8 @@ class AuctionsAPITestCase(SetUp):
         response = self.client.get(API_BASE_URL + '/listings/')
         self.assertEqual(response.status_code, 200)
         data = response.data
-        self.assertEqual(data.get('count'), 4)
+        self.assertNotIn('count', data)
+        self.assertEqual(len(data.get('results')), 4)
         self.assertIsNone(data.get('next'))
         self.assertIsNone(data.get('previous'))
 
@@ -170,7 +176,7 @@ class AuctionsAPITestCase(SetUp):
             {'q': '2', 'category': 'vehicles'}
         )
         data = response.data
-        self.assertEqual(data.get('count'), 1)
+        self.assertEqual(len(data.get('results')), 1)
         result = data.get('results')[0]
         title = result.get('title')
         current_bid = result.get('current_bid')
@@ -193,6 +199,103 @@ class AuctionsAPITestCase(SetUp):
         self.assertEqual(listing_data.get('category'), 'music')
 
 
+class ValuesSerializersTestCase(SetUp):
+
+    def assertSameRepresentation(self, url, serializer_class, queryset):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        expected = serializer_class(
+            queryset.order_by('end_time', 'id'), many=True,
+            context={'request': response.wsgi_request}).data
+        self.assertEqual(
+            response.json()['results'],
+            json.loads(renderers.JSONRenderer().render(expected)))
+
+    def test_listings(self):
+        """Check the listings list is represented like its serializer"""
+        models.Listing.objects.create(
+            author=self.user, title="No bids", description="",
+            initial_price=1, duration=7,
+            category=models.Category.objects.first())
+        self.assertSameRepresentation(
+            API_BASE_URL + '/listings/',
+            serializers.ListingAbstractSerializer,
+            models.Listing.objects.active())
+
+    def test_dashboard_listings(self):
+        """Check the dashboard listings are represented like their serializer"""
+        self.client.force_login(self.user)
+        self.assertSameRepresentation(
+            API_BASE_URL + f'/dashboard/{self.user.id}/watchlist/',
+            serializers.ListingSerializer,
+            self.user.watchlist.all())
+        self.assertSameRepresentation(
+            API_BASE_URL + f'/dashboard/{self.user.id}/listings/',
+            serializers.ListingSerializer,
+            self.user.listings.all())
+
+    def test_unsupported_field(self):
+        """Test fields without an accessor are refused"""
+        class BidValuesSerializer(serializers.ValuesSerializer):
+            serializer_class = serializers.BidSerializer
+
+        with self.assertRaisesMessage(TypeError, "get_listing_accessor"):
+            BidValuesSerializer()
+
+
+class RenderingTestCase(SetUp):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def test_orjson_renderer(self):
+        """Check the orjson renderer renders like the JSON renderer"""
+        data = {
+            'time': timezone.now(),
+            'date': datetime.date(2022, 4, 1),
+            'price': decimal.Decimal('10.50'),
+            'message': gettext_lazy("Not found."),
+            'text': "line\u2028separator",
+            1: [None, True, 1.5],
+        }
+        self.assertEqual(
+            api_renderers.ORJSONRenderer().render(data),
+            renderers.JSONRenderer().render(data))
+        self.assertEqual(
+            api_renderers.ORJSONRenderer().render(
+                data, 'application/json; indent=2'),
+            renderers.JSONRenderer().render(
+                data, 'application/json; indent=2'))
+
+    def test_streamed_collection(self):
+        """Test unpaginated collections are streamed in chunks"""
+        listing = models.Listing.objects.get(title='listing3')
+        url = API_BASE_URL + f'/listings/{listing.id}/bids/'
+        expected = serializers.ListingBidSerializer(
+            listing.bids.all(), many=True).data
+        with mock.patch.object(
+                viewsets.ListingBidsViewSet, 'stream_chunk_size', 1):
+            response = self.client.get(url)
+            chunks = list(response.streaming_content)
+        self.assertTrue(response.streaming)
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(
+            json.loads(b''.join(chunks)),
+            json.loads(renderers.JSONRenderer().render(expected)))
+
+        response = self.client.get(
+            API_BASE_URL + '/listings/4/questions/')
+        self.assertEqual(b''.join(response.streaming_content), b'[]')
+
+    def test_browsable_collection(self):
+        """Test the browsable API is not streamed"""
+        response = self.client.get(
+            API_BASE_URL + '/listings/3/bids/', HTTP_ACCEPT='text/html')
+        self.assertFalse(response.streaming)
+        self.assertContains(response, '700.00')
+
+
 class UnauthorizedRequestsTestCase(SetUp):
 
     def test_unauthenticated_bids_list_request(self):
@@ -305,16 +408,17 @@ class AutheticatedRequestsTestCase(SetUp):
 
         self.assertEqual(response.status_code, 200)
         data = response.data
-        self.assertEqual(data.get('count'), 7)
+        self.assertEqual(len(data.get('results')), 7)
 
+        # The latest bids come first
         result = data.get('results')[0]
-        self.assertEqual(result.get('value'), '14000.00')
+        self.assertEqual(result.get('value'), '3000.00')
 
         user = result.get('user')
-        self.assertEqual(user.get('name'), 'User Three')
+        self.assertEqual(user.get('name'), 'Tester User')
 
         listing_data = result.get('listing')
-        self.assertEqual(listing_data.get('title'), 'listing2')
+        self.assertEqual(listing_data.get('title'), 'listing1')
 
     def test_listing_bids_list_view(self):
         """Test bid data from the listing bids list view
@@ -324,7 +428,7 @@ class AutheticatedRequestsTestCase(SetUp):
             API_BASE_URL + '/listings/2/bids/')
         self.assertEqual(response.status_code, 200)
 
-        data = response.data
+        data = json.loads(b''.join(response.streaming_content))
         self.assertEqual(len(data), 2)
         self.assertEqual(data[0].get('value'), '14000.00')
 
@@ -401,7 +505,7 @@ class AutheticatedRequestsTestCase(SetUp):
             API_BASE_URL + '/listings/3/questions/')
         self.assertEqual(response.status_code, 200)
 
-        data = response.data
+        data = json.loads(b''.join(response.streaming_content))
         self.assertEqual(len(data), 1)
 
         question = data[0]
@@ -481,7 +585,7 @@ class AutheticatedRequestsTestCase(SetUp):
         response = self.client.get(
             API_BASE_URL + f'/dashboard/{self.user.id}/bids/')
         data = response.data
-        self.assertEqual(data.get('count'), 1)
+        self.assertEqual(len(data.get('results')), 1)
 
         results = data.get('results')
         self.assertEqual(results[0].get('value'), '3000.00')
@@ -540,9 +644,8 @@ class AutheticatedRequestsTestCase(SetUp):
         self.assertEqual(response.status_code, 200)
 
         data = response.data
-        self.assertEqual(data.get('count'), 2)
-
         results = data.get('results')
+        self.assertEqual(len(results), 2)
         self.assertEqual(results[0].get('id'), 1)
         self.assertEqual(results[1].get('id'), 2)
 
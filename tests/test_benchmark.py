@@ -0,0 +1,38 @@
+from django import test
+from auctions import benchmark
+
+
+REPORT = {
+    'scenarios': {
+        'bid_api': {'throughput': 100.0, 'p50': 10.0, 'p99': 40.0,
+                    'queries': 5.0},
+    },
+    'integrity': {'lost_updates': 0, 'duplicate_winners': 0},
+}
+
+
+class BenchmarkTestCase(test.SimpleTestCase):
+
+    def test_run_concurrently(self):
+        """Check every worker runs and its result is kept in order"""
+        results, elapsed = benchmark.run_concurrently(4, lambda index: index * 2)
+        self.assertEqual(results, [0, 2, 4, 6])
+        self.assertGreaterEqual(elapsed, 0)
+
+    def test_compare(self):
+        """Check slower scenarios and integrity violations are regressions"""
+        self.assertEqual(benchmark.compare(REPORT, REPORT), [])
+        current = {
+            'scenarios': {
+                'bid_api': {'throughput': 70.0, 'p50': 11.0, 'p99': 60.0,
+                            'queries': 5.0},
+                'listing_list': {'throughput': 1.0, 'p50': 1.0, 'p99': 1.0,
+                                 'queries': 1.0},
+            },
+            'integrity': {'lost_updates': 2, 'duplicate_winners': 0},
+        }
+        self.assertEqual(benchmark.compare(REPORT, current), [
+            "bid_api: throughput 100.0 -> 70.0 requests/s",
+            "bid_api: p99 40.00 -> 60.00",
+            "lost_updates: 2",
+        ])
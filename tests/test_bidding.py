@@ -0,0 +1,407 @@
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django import test
+from django.core import management
+from django.db.models import F
+from django.utils import timezone
+from auctions import bidding, models
+from authentication import models as auth_models
+
+
+API_BASE_URL = "/auctions/api"
+
+
+class SetUp(test.TestCase):
+    """Setup for bidding testcase
+    """
+
+    def setUp(self):
+        self.seller = auth_models.User.objects.create(
+            username='seller', email='seller@example.com', first_name="The", last_name="Seller")
+        self.bidder1 = auth_models.User.objects.create(
+            username='bidder1', email='bidder1@example.com', first_name="Bidder", last_name="One")
+        self.bidder2 = auth_models.User.objects.create(
+            username='bidder2', email='bidder2@example.com', first_name="Bidder", last_name="Two")
+
+        category = models.Category.objects.create(name='music')
+        self.listing = models.Listing.objects.create(
+            author=self.seller,
+            description="guitar",
+            title="Guitar",
+            initial_price=100.00,
+            category=category,
+            duration=7
+        )
+
+
+class PlaceBidTestCase(SetUp):
+
+    def test_first_bid_must_exceed_initial_price(self):
+        """Check rejection of a first bid that does not exceed the initial price"""
+        with self.assertRaises(bidding.BidRejected):
+            bidding.place_bid(self.listing.id, self.bidder1, Decimal('100.00'))
+        self.assertFalse(self.listing.bids.exists())
+
+    def test_higher_bid_updates_current_price(self):
+        """Check the current price is updated along with an accepted bid"""
+        bidding.place_bid(self.listing.id, self.bidder1, Decimal('150.00'))
+        bid = bidding.place_bid(
+            self.listing.id, self.bidder2, Decimal('151.00'))
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.current_price, Decimal('151.00'))
+        self.assertEqual(self.listing.bids.first(), bid)
+
+    def test_bid_must_exceed_current_price(self):
+        """Check rejection of bids that do not exceed the current price"""
+        bidding.place_bid(self.listing.id, self.bidder1, Decimal('150.00'))
+        with self.assertRaises(bidding.BidRejected):
+            bidding.place_bid(
+                self.listing.id, self.bidder2, Decimal('150.00'))
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.current_price, Decimal('150.00'))
+        self.assertEqual(self.listing.bids.count(), 1)
+
+    def test_bid_on_finished_listing(self):
+        """Check rejection of bids on finished auctions"""
+        models.Listing.objects.filter(pk=self.listing.pk).update(
+            end_time=timezone.now() - timezone.timedelta(minutes=1))
+        with self.assertRaisesMessage(bidding.BidRejected, 'finished'):
+            bidding.place_bid(
+                self.listing.id, self.bidder1, Decimal('150.00'))
+
+    def test_bid_on_closed_listing(self):
+        """Check rejection of bids on listings closed before their end time,
+        such as those closed by the sweeper while the bid waited
+        """
+        bidding.place_bid(self.listing.id, self.bidder1, Decimal('150.00'))
+        models.Listing.objects.filter(pk=self.listing.pk).close()
+        for value, max_value in (('200.00', None), ('160.00', '300.00')):
+            with self.assertRaisesMessage(bidding.BidRejected, 'finished'):
+                bidding.place_bid(
+                    self.listing.id, self.bidder2, Decimal(value),
+                    max_value and Decimal(max_value))
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.current_price, Decimal('150.00'))
+        self.assertEqual(self.listing.winner, self.bidder1)
+        self.assertEqual(self.listing.bids.count(), 1)
+
+    def test_bid_on_missing_listing(self):
+        """Check bids on unknown listings raise DoesNotExist"""
+        with self.assertRaises(models.Listing.DoesNotExist):
+            bidding.place_bid(
+                self.listing.id + 1, self.bidder1, Decimal('150.00'))
+
+    def test_constant_queries(self):
+        """Check an accepted bid costs the same queries regardless of bid count"""
+        for value in range(101, 151):
+            bidding.place_bid(self.listing.id, self.bidder1, value)
+        # Savepoint, conditional update, insert and release
+        with self.assertNumQueries(4):
+            bidding.place_bid(self.listing.id, self.bidder2, 200)
+
+
+class ProxyBidTestCase(SetUp):
+
+    def bid(self, user, value, max_value=None):
+        return bidding.place_bid(
+            self.listing.id, user, Decimal(value),
+            max_value and Decimal(max_value))
+
+    def assertCurrentBid(self, user, price):
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.current_bidder, user)
+        self.assertEqual(self.listing.current_price, Decimal(price))
+
+    def test_proxy_answers_lower_bid(self):
+        """Check a proxy bid is raised by one increment over a lower bid"""
+        self.bid(self.bidder1, '110.00', '200.00')
+        bid = self.bid(self.bidder2, '150.00')
+        self.assertEqual(bid.user, self.bidder2)
+        self.assertCurrentBid(self.bidder1, '151.00')
+        self.assertEqual(self.listing.bid_count, 3)
+
+    def test_proxy_caps_at_maximum(self):
+        """Check a proxy bid is not raised over its maximum"""
+        self.bid(self.bidder1, '110.00', '200.00')
+        self.bid(self.bidder2, '199.50')
+        self.assertCurrentBid(self.bidder1, '200.00')
+
+    def test_higher_proxy_wins(self):
+        """Check a higher proxy bid leads by one increment over the other"""
+        self.bid(self.bidder1, '110.00', '200.00')
+        bid = self.bid(self.bidder2, '150.00', '300.00')
+        self.assertEqual(bid.value, Decimal('201.00'))
+        self.assertCurrentBid(self.bidder2, '201.00')
+        self.assertEqual(
+            list(self.listing.bids.values_list('user', 'value')),
+            [(self.bidder2.id, Decimal('201.00')),
+             (self.bidder1.id, Decimal('200.00')),
+             (self.bidder1.id, Decimal('110.00'))])
+
+    def test_tie_goes_to_earlier_proxy(self):
+        """Check the earlier proxy bid wins a tie"""
+        self.bid(self.bidder1, '110.00', '200.00')
+        self.bid(self.bidder2, '150.00', '200.00')
+        self.assertCurrentBid(self.bidder1, '200.00')
+        self.assertEqual(bidding.reconcile_listings(dry_run=True), 0)
+
+    def test_writes_two_bids_at_most(self):
+        """Check a proxy battle is resolved without a bid per increment"""
+        self.bid(self.bidder1, '101.00', '10000.00')
+        # Savepoint, UPDATE, locking SELECT, two INSERTs, UPDATE and the
+        # release.
+        with self.assertNumQueries(7):
+            self.bid(self.bidder2, '150.00', '9000.00')
+        self.assertCurrentBid(self.bidder1, '9001.00')
+        self.assertEqual(self.listing.bids.count(), 3)
+
+    def test_raise_own_maximum(self):
+        """Check the current bidder can raise the maximum without bidding"""
+        self.bid(self.bidder1, '110.00', '200.00')
+        self.bid(self.bidder1, '150.00', '300.00')
+        self.assertCurrentBid(self.bidder1, '110.00')
+        self.assertEqual(self.listing.proxy_max, Decimal('300.00'))
+        self.bid(self.bidder2, '250.00')
+        self.assertCurrentBid(self.bidder1, '251.00')
+
+    def test_raise_own_maximum_not_a_new_bid(self):
+        """Check raising one's own maximum is not announced as a new bid"""
+        self.bid(self.bidder1, '110.00', '200.00')
+        with mock.patch.object(bidding.latest_bids, 'push') as push, \
+                mock.patch.object(bidding.live, 'publish_bid') as publish, \
+                self.captureOnCommitCallbacks(execute=True):
+            bid = self.bid(self.bidder1, '150.00', '300.00')
+        self.assertTrue(bid.max_only)
+        push.assert_not_called()
+        publish.assert_not_called()
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.bid_count, 1)
+        self.assertFalse(self.bid(self.bidder2, '250.00').max_only)
+
+        self.client.force_login(self.bidder1)
+        response = self.client.post(
+            f'/auctions/bid/{self.listing.id}',
+            {'value': '260.00', 'max_value': '400.00'}, follow=True)
+        self.assertContains(response, "Maximum bid raised!")
+
+    def test_maximum_lower_than_bid(self):
+        """Check rejection of a maximum lower than the bid"""
+        with self.assertRaises(bidding.BidRejected):
+            self.bid(self.bidder1, '150.00', '120.00')
+
+    def test_reconcile_after_proxy_bids(self):
+        """Check proxy bids leave the current bid columns in sync"""
+        self.bid(self.bidder1, '110.00', '200.00')
+        self.bid(self.bidder2, '150.00')
+        self.bid(self.bidder2, '180.00', '400.00')
+        self.assertEqual(bidding.reconcile_listings(dry_run=True), 0)
+
+    def test_api_proxy_bid(self):
+        """Test the listing bids endpoint does not reveal the maximum"""
+        self.client.force_login(self.bidder1)
+        response = self.client.post(
+            API_BASE_URL + f'/listings/{self.listing.id}/bids/',
+            {'value': '110.00', 'max_value': '200.00'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('max_value', response.data)
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.proxy_max, Decimal('200.00'))
+
+
+@test.override_settings(SOFT_CLOSE_WINDOW=timezone.timedelta(minutes=2))
+class SoftCloseTestCase(SetUp):
+
+    def end_in(self, delta):
+        end_time = timezone.now() + delta
+        models.Listing.objects.filter(pk=self.listing.pk).update(
+            end_time=end_time)
+        return end_time
+
+    def test_late_bid_extends_auction(self):
+        """Check a bid in the soft close window extends the auction"""
+        self.end_in(timezone.timedelta(seconds=30))
+        bid = bidding.place_bid(self.listing.id, self.bidder1, 150)
+        self.listing.refresh_from_db()
+        self.assertEqual(
+            self.listing.end_time,
+            bid.creation_time + timezone.timedelta(minutes=2))
+
+    def test_late_proxy_bid_extends_auction(self):
+        """Check a bid answered by a proxy bid extends the auction"""
+        bidding.place_bid(self.listing.id, self.bidder1, 110, 200)
+        self.end_in(timezone.timedelta(seconds=30))
+        bid = bidding.place_bid(self.listing.id, self.bidder2, 150)
+        self.listing.refresh_from_db()
+        self.assertEqual(
+            self.listing.end_time,
+            bid.creation_time + timezone.timedelta(minutes=2))
+
+    def test_early_bid_keeps_end_time(self):
+        """Check a bid before the soft close window keeps the end time"""
+        end_time = self.end_in(timezone.timedelta(hours=1))
+        bidding.place_bid(self.listing.id, self.bidder1, 150)
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.end_time, end_time)
+
+    def test_save_keeps_extension(self):
+        """Check saving a listing keeps its extended end time"""
+        self.end_in(timezone.timedelta(seconds=30))
+        bidding.place_bid(self.listing.id, self.bidder1, 150)
+        self.listing.refresh_from_db()
+        end_time = self.listing.end_time
+        self.listing.title = "Bass guitar"
+        self.listing.save()
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.end_time, end_time)
+
+    def test_stale_save_keeps_extension(self):
+        """Check saving a listing loaded before a late bid keeps the
+        extension, and saving it after its closing keeps the winner
+        """
+        self.end_in(timezone.timedelta(seconds=30))
+        stale = models.Listing.objects.get(pk=self.listing.pk)
+        bidding.place_bid(self.listing.id, self.bidder1, 150)
+        end_time = models.Listing.objects.get(pk=self.listing.pk).end_time
+        self.assertGreater(end_time, stale.end_time)
+        stale.title = "Bass guitar"
+        stale.save()
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.end_time, end_time)
+
+        models.Listing.objects.filter(pk=self.listing.pk).close()
+        stale.save()
+        self.listing.refresh_from_db()
+        self.assertTrue(self.listing.closed)
+        self.assertEqual(self.listing.winner, self.bidder1)
+
+    def test_extended_auction_not_closed(self):
+        """Check the closing sweeper leaves extended auctions open"""
+        self.end_in(timezone.timedelta(seconds=30))
+        bidding.place_bid(self.listing.id, self.bidder1, 150)
+        models.Listing.objects.filter(pk=self.listing.pk).update(
+            end_time=F('end_time') - timezone.timedelta(seconds=60))
+        self.assertEqual(models.Listing.objects.close_finished(), 0)
+
+
+class BidViewsTestCase(SetUp):
+
+    def test_bid_view_rejects_lower_bid(self):
+        """Test the bid view does not post a bid lower than the current bid"""
+        bidding.place_bid(self.listing.id, self.bidder1, Decimal('150.00'))
+        self.client.force_login(self.bidder2)
+        response = self.client.post(
+            f'/auctions/bid/{self.listing.id}', {'value': '120.00'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.listing.bids.count(), 1)
+
+    def test_bid_view_outbid_by_proxy(self):
+        """Test the bid view reports a bid outbid at once by a proxy bid"""
+        bidding.place_bid(
+            self.listing.id, self.bidder1, Decimal('110.00'), Decimal('200.00'))
+        self.client.force_login(self.bidder2)
+        response = self.client.post(
+            f'/auctions/bid/{self.listing.id}', {'value': '150.00'},
+            follow=True)
+        self.assertContains(response, "You were outbid by a proxy bid.")
+        self.assertNotContains(response, "Bid posted!")
+        response = self.client.post(
+            f'/auctions/bid/{self.listing.id}', {'value': '250.00'},
+            follow=True)
+        self.assertContains(response, "Bid posted!")
+
+    def test_bid_view_posts_higher_bid(self):
+        """Test the bid view posts a bid higher than the current bid"""
+        self.client.force_login(self.bidder2)
+        response = self.client.post(
+            f'/auctions/bid/{self.listing.id}', {'value': '120.00'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.listing.bids.first().user, self.bidder2)
+
+    def test_api_rejects_lower_bid(self):
+        """Test the listing bids endpoint rejects a bid lower than the current bid"""
+        bidding.place_bid(self.listing.id, self.bidder1, Decimal('150.00'))
+        self.client.force_login(self.bidder2)
+        response = self.client.post(
+            API_BASE_URL + f'/listings/{self.listing.id}/bids/',
+            {'value': '149.00'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.listing.bids.count(), 1)
+
+    def test_api_bid_on_missing_listing(self):
+        """Test the listing bids endpoint with an unknown listing"""
+        self.client.force_login(self.bidder2)
+        response = self.client.post(
+            API_BASE_URL + f'/listings/{self.listing.id + 1}/bids/',
+            {'value': '149.00'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class CurrentBidColumnsTestCase(SetUp):
+
+    def test_current_bid_columns(self):
+        """Check the current bid columns follow the accepted bids"""
+        bidding.place_bid(self.listing.id, self.bidder1, Decimal('150.00'))
+        bid = bidding.place_bid(
+            self.listing.id, self.bidder2, Decimal('160.00'))
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.current_bidder, self.bidder2)
+        self.assertEqual(self.listing.current_bid_time, bid.creation_time)
+        self.assertEqual(self.listing.bid_count, 2)
+
+    def test_stale_save_keeps_bid_columns(self):
+        """Check saving a listing loaded before a bid keeps the bid"""
+        stale = models.Listing.objects.get(pk=self.listing.pk)
+        bidding.place_bid(self.listing.id, self.bidder1, '150.00', '200.00')
+        stale.title = "Electric guitar"
+        stale.save()
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.title, "Electric guitar")
+        self.assertEqual(self.listing.current_price, Decimal('150.00'))
+        self.assertEqual(self.listing.current_bidder, self.bidder1)
+        self.assertEqual(self.listing.proxy_max, Decimal('200.00'))
+        self.assertEqual(self.listing.bid_count, 1)
+        with self.assertRaises(bidding.BidRejected):
+            bidding.place_bid(self.listing.id, self.bidder2, '120.00')
+
+    def test_withdraw_bid(self):
+        """Check withdrawing the highest bid restores the previous one"""
+        bidding.place_bid(self.listing.id, self.bidder1, Decimal('150.00'))
+        bid = bidding.place_bid(
+            self.listing.id, self.bidder2, Decimal('160.00'))
+        bidding.withdraw_bid(bid)
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.current_price, Decimal('150.00'))
+        self.assertEqual(self.listing.current_bidder, self.bidder1)
+        self.assertEqual(self.listing.bid_count, 1)
+
+    def test_reconcile_command(self):
+        """Test the reconcile_bids command backfills drifted listings"""
+        models.Bid.objects.create(
+            listing=self.listing, user=self.bidder1, value=Decimal('150.00'))
+        out = StringIO()
+        management.call_command('reconcile_bids', stdout=out)
+        self.assertIn('1 listing(s) reconciled', out.getvalue())
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.current_price, Decimal('150.00'))
+        self.assertEqual(self.listing.current_bidder, self.bidder1)
+        self.assertEqual(self.listing.bid_count, 1)
+
+        out = StringIO()
+        management.call_command('reconcile_bids', '--dry-run', stdout=out)
+        self.assertIn('0 listing(s) out of sync', out.getvalue())
+
+    def test_listing_list_current_bid_queries(self):
+        """Test the listings endpoint does not query the bids of each listing"""
+        bidding.place_bid(self.listing.id, self.bidder1, Decimal('150.00'))
+        with self.assertNumQueries(1):
+            response = self.client.get(API_BASE_URL + '/listings/')
+        current_bid = response.data.get('results')[0].get('current_bid')
+        self.assertEqual(current_bid.get('value'), '150.00')
+        self.assertEqual(current_bid.get('user').get('name'), 'Bidder One')
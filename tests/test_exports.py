@@ -0,0 +1,175 @@
+import csv
+import io
+import json
+import shutil
+import tempfile
+from unittest import mock
+from django import test
+from django.core import management
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from auctions import bidding, exports, models, tasks
+from authentication import models as auth_models
+
+
+API_BASE_URL = "/auctions/api"
+
+
+class SetUp(test.TestCase):
+    """Setup for exports testcase
+    """
+
+    def setUp(self):
+        cache.clear()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        overrides = test.override_settings(MEDIA_ROOT=media)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.seller = auth_models.User.objects.create(
+            username='seller', email='seller@example.com', first_name="The", last_name="Seller")
+        self.bidder = auth_models.User.objects.create(
+            username='bidder', email='bidder@example.com', first_name="The", last_name="Bidder")
+        category = models.Category.objects.create(name='music')
+        self.listings = [
+            models.Listing.objects.create(
+                author=self.seller,
+                title=f"Piano {i}",
+                description="",
+                initial_price=100.00,
+                category=category,
+                duration=7
+            )
+            for i in range(3)
+        ]
+        models.Listing.objects.create(
+            author=self.bidder,
+            title="Guitar",
+            description="",
+            initial_price=10.00,
+            category=category,
+            duration=7
+        )
+        for listing in self.listings:
+            bidding.place_bid(listing.id, self.bidder, 150)
+            bidding.place_bid(listing.id, self.bidder, 200)
+        self.client.force_login(self.seller)
+
+        patcher = mock.patch.object(tasks.export_task, 'delay')
+        self.delay = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def read(self, response):
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def run_jobs(self):
+        """Runs the queued exports as a worker would"""
+        for call in self.delay.call_args_list:
+            tasks.export_task(*call.args)
+        self.delay.reset_mock()
+
+
+class ExportsTestCase(SetUp):
+
+    def test_listings_ndjson(self):
+        """Test the listings of a seller are exported as NDJSON"""
+        response = self.client.get(
+            API_BASE_URL + f'/dashboard/{self.seller.id}/listings/export/')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertIn('listings.ndjson', response['Content-Disposition'])
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual(
+            [row['id'] for row in rows],
+            [listing.id for listing in self.listings])
+        self.assertEqual(list(rows[0]), list(exports.COLUMNS['listings']))
+        self.assertEqual(rows[0]['current_price'], '200.00')
+        self.assertEqual(rows[0]['category'], 'music')
+
+    def test_bids_csv(self):
+        """Test the bids of a user are exported as CSV, by listing"""
+        self.client.force_login(self.bidder)
+        url = API_BASE_URL + f'/dashboard/{self.bidder.id}/bids/export/'
+        response = self.client.get(url, {
+            'format': 'csv',
+            'listing': f'{self.listings[0].id},{self.listings[2].id}',
+        })
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.DictReader(io.StringIO(self.read(response))))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(
+            {int(row['listing']) for row in rows},
+            {self.listings[0].id, self.listings[2].id})
+        self.assertEqual(rows[0]['user_email'], 'bidder@example.com')
+        self.assertEqual(
+            self.read(self.client.get(url.replace('/export/', '/export.csv'))),
+            self.read(self.client.get(url, {'format': 'csv'})))
+
+    def test_time_range(self):
+        """Test the exports are filtered by creation time"""
+        models.Bid.objects.filter(listing=self.listings[0]).update(
+            creation_time=timezone.now() - timezone.timedelta(days=10))
+        self.client.force_login(self.bidder)
+        url = API_BASE_URL + f'/dashboard/{self.bidder.id}/bids/export/'
+        since = (timezone.now() - timezone.timedelta(days=1)).date()
+        lines = self.read(self.client.get(url, {'since': since.isoformat()}))
+        self.assertEqual(len(lines.splitlines()), 4)
+        lines = self.read(self.client.get(url, {'until': since.isoformat()}))
+        self.assertEqual(len(lines.splitlines()), 2)
+
+        response = self.client.get(url, {'since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_other_dashboard(self):
+        """Test the exports of another user are forbidden"""
+        response = self.client.get(
+            API_BASE_URL + f'/dashboard/{self.bidder.id}/bids/export/')
+        self.assertEqual(response.status_code, 403)
+
+    def test_job(self):
+        """Test an export job is written to a media file"""
+        url = API_BASE_URL + f'/dashboard/{self.seller.id}/listings/export/'
+        response = self.client.post(url, {'format': 'csv'})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], exports.PENDING)
+        self.assertEqual(response['Location'], response.data['url'])
+        self.delay.assert_called_once()
+
+        self.run_jobs()
+        state = self.client.get(response.data['url']).data
+        self.assertEqual(state['status'], exports.DONE)
+        self.assertEqual((state['rows'], state['total']), (3, 3))
+        name = exports.status(state['job'])['file']
+        with default_storage.open(name) as file:
+            self.assertEqual(
+                file.read().decode(),
+                self.read(self.client.get(url, {'format': 'csv'})))
+
+        self.client.force_login(self.bidder)
+        self.assertEqual(self.client.get(response.data['url']).status_code, 403)
+        response = self.client.post(
+            API_BASE_URL + f'/dashboard/{self.bidder.id}/listings/export/',
+            {'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_command(self):
+        """Test the export_auctions command streams or queues exports"""
+        out = io.StringIO()
+        management.call_command(
+            'export_auctions', 'bids', '--format=csv',
+            f'--author={self.seller.id}', f'--listing={self.listings[1].id}',
+            stdout=out, stderr=io.StringIO())
+        rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+        self.assertEqual(
+            [row['value'] for row in rows], ['150.00', '200.00'])
+
+        out = io.StringIO()
+        management.call_command(
+            'export_auctions', 'listings', '--async', stdout=out)
+        job = out.getvalue().strip()
+        self.run_jobs()
+        out = io.StringIO()
+        management.call_command('export_auctions', f'--job={job}', stdout=out)
+        self.assertIn('done 4/4 rows', out.getvalue())
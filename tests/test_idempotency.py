@@ -0,0 +1,134 @@
+import hashlib
+import json
+from django import test
+from django.core.cache import cache
+from auctions import models
+from authentication import models as auth_models
+
+
+API_BASE_URL = "/auctions/api"
+AUTH_API_BASE_URL = "/auth/api"
+
+
+class SetUp(test.TestCase):
+    """Setup for idempotency keys testcase
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = auth_models.User.objects.create(
+            username='bidder1', email='bidder1@example.com', first_name="Bidder", last_name="One")
+        self.other = auth_models.User.objects.create(
+            username='bidder2', email='bidder2@example.com', first_name="Bidder", last_name="Two")
+        self.category = models.Category.objects.create(name='music')
+        self.listing = models.Listing.objects.create(
+            author=self.other,
+            title="Piano",
+            description="",
+            initial_price=100.00,
+            category=self.category,
+            duration=7
+        )
+        self.client.force_login(self.user)
+
+    def post(self, path, data, key):
+        return self.client.post(
+            path, data, content_type='application/json',
+            HTTP_IDEMPOTENCY_KEY=key)
+
+    def post_bid(self, value, key='bid-1'):
+        return self.post(
+            API_BASE_URL + f'/listings/{self.listing.id}/bids/',
+            {'value': value}, key)
+
+
+class IdempotencyTestCase(SetUp):
+
+    def test_bid_retry_replayed(self):
+        """Test a retried bid is replayed from the cache"""
+        response = self.post_bid('150.00')
+        self.assertEqual(response.status_code, 201)
+        # The session and the user only
+        with self.assertNumQueries(2):
+            retry = self.post_bid('150.00')
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.data, response.data)
+        self.assertEqual(self.listing.bids.count(), 1)
+
+    def test_rejected_bid_replayed(self):
+        """Test a retried rejected bid is replayed as rejected"""
+        self.assertEqual(self.post_bid('90.00').status_code, 400)
+        retry = self.post_bid('90.00')
+        self.assertEqual(retry.status_code, 400)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+
+    def test_key_reused_for_other_request(self):
+        """Test a key can not be reused for another request"""
+        self.post_bid('150.00')
+        response = self.post_bid('160.00')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.listing.bids.count(), 1)
+
+    def test_keys_scoped_by_user(self):
+        """Test the same key of another user is another request"""
+        self.post_bid('150.00')
+        self.client.force_login(self.other)
+        response = self.post_bid('150.00')
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+    def test_request_in_progress(self):
+        """Test a retry while the first request runs is a conflict"""
+        body = json.dumps({'value': '150.00'}).encode()
+        path = API_BASE_URL + f'/listings/{self.listing.id}/bids/'
+        cache.set(
+            f'idempotency:{path}:{self.user.pk}:bid-1',
+            {'digest': hashlib.sha256(body).hexdigest()})
+        self.assertEqual(self.post_bid('150.00').status_code, 409)
+
+    def test_without_key(self):
+        """Test requests without a key are not replayed"""
+        self.client.post(
+            API_BASE_URL + f'/listings/{self.listing.id}/bids/',
+            {'value': '150.00'}, content_type='application/json')
+        response = self.client.post(
+            API_BASE_URL + f'/listings/{self.listing.id}/bids/',
+            {'value': '160.00'}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.listing.bids.count(), 2)
+
+    def test_listing_create_retry(self):
+        """Test a retried listing creation creates one listing"""
+        data = {
+            'title': "Drums",
+            'description': "Five pieces",
+            'category': self.category.id,
+            'initial_price': '50.00',
+            'duration': 7,
+        }
+        response = self.post(API_BASE_URL + '/listings/', data, 'listing-1')
+        retry = self.post(API_BASE_URL + '/listings/', data, 'listing-1')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(
+            models.Listing.objects.filter(title="Drums").count(), 1)
+
+    def test_register_retry(self):
+        """Test a retried registration registers one user"""
+        self.client.logout()
+        data = {
+            'first_name': 'William',
+            'last_name': 'Fernandes',
+            'email': 'william.fernandes@email.com',
+            'username': 'william',
+            'password': 'QWERTY!@#',
+            'password2': 'QWERTY!@#',
+        }
+        response = self.post(AUTH_API_BASE_URL + '/register/', data, 'user-1')
+        retry = self.post(AUTH_API_BASE_URL + '/register/', data, 'user-1')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(
+            auth_models.User.objects.filter(username='william').count(), 1)
@@ -0,0 +1,127 @@
+from decimal import Decimal
+from unittest import mock
+from django import test
+from django.core.cache import cache
+from auctions import intake, models, tasks
+from authentication import models as auth_models
+
+
+API_BASE_URL = "/auctions/api"
+
+
+@test.override_settings(BID_INTAKE_PARTITIONS=4)
+class SetUp(test.TestCase):
+    """Setup for bid intake testcase
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.seller = auth_models.User.objects.create(
+            username='seller', email='seller@example.com', first_name="The", last_name="Seller")
+        self.bidder = auth_models.User.objects.create(
+            username='bidder', email='bidder@example.com', first_name="The", last_name="Bidder")
+        category = models.Category.objects.create(name='music')
+        self.listing = models.Listing.objects.create(
+            author=self.seller,
+            title="Piano",
+            description="",
+            initial_price=100.00,
+            category=category,
+            duration=7
+        )
+        self.client.force_login(self.bidder)
+        patcher = mock.patch.object(tasks.apply_bid_task, 'apply_async')
+        self.apply_async = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post_bid(self, value, listing_id=None):
+        return self.client.post(
+            API_BASE_URL + f'/listings/{listing_id or self.listing.id}/bids/',
+            {'value': value},
+            content_type='application/json',
+        )
+
+    def consume(self):
+        """Runs the queued bids as the intake workers would"""
+        for call in self.apply_async.call_args_list:
+            with self.captureOnCommitCallbacks(execute=True):
+                tasks.apply_bid_task(*call.args[0])
+        self.apply_async.reset_mock()
+
+
+class BidIntakeTestCase(SetUp):
+
+    def test_bid_is_queued(self):
+        """Test a bid is accepted with a ticket and queued by listing"""
+        response = self.post_bid('150.00')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], intake.PENDING)
+        self.assertEqual(response['Location'], response.data['url'])
+        self.assertFalse(self.listing.bids.exists())
+        self.apply_async.assert_called_once()
+        self.assertEqual(
+            self.apply_async.call_args.kwargs['queue'],
+            f'bids.{self.listing.id % 4}')
+
+    def test_ticket_outcomes(self):
+        """Test the tickets report the outcome of the queued bids"""
+        accepted = self.post_bid('150.00').data['url']
+        rejected = self.post_bid('120.00').data['url']
+        self.assertEqual(
+            self.client.get(accepted).data['status'], intake.PENDING)
+        self.consume()
+
+        response = self.client.get(accepted)
+        self.assertEqual(response.data['status'], intake.ACCEPTED)
+        self.assertEqual(response.data['bid']['value'], '150.00')
+        response = self.client.get(rejected)
+        self.assertEqual(response.data['status'], intake.REJECTED)
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.current_price, Decimal('150.00'))
+
+    def test_bids_applied_in_order(self):
+        """Check the queued bids of a listing are applied in arrival order"""
+        for value in ('150.00', '160.00', '155.00'):
+            self.post_bid(value)
+        self.consume()
+        self.assertEqual(
+            list(self.listing.bids.order_by('creation_time', 'id')
+                 .values_list('value', flat=True)),
+            [Decimal('150.00'), Decimal('160.00')])
+
+    def test_ticket_of_other_user(self):
+        """Test a ticket is not found by other users"""
+        url = self.post_bid('150.00').data['url']
+        self.client.force_login(self.seller)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_retry_keeps_ticket(self):
+        """Test a bid retried with the same idempotency key is queued once"""
+        responses = [
+            self.client.post(
+                API_BASE_URL + f'/listings/{self.listing.id}/bids/',
+                {'value': '150.00'}, content_type='application/json',
+                HTTP_IDEMPOTENCY_KEY='bid-1')
+            for _ in range(3)
+        ]
+        self.assertEqual({response.status_code for response in responses},
+                         {202})
+        self.assertEqual(
+            {response.data['ticket'] for response in responses},
+            {responses[0].data['ticket']})
+        self.assertEqual(responses[-1]['Idempotent-Replayed'], 'true')
+        self.assertEqual(responses[-1]['Location'], responses[0]['Location'])
+        self.apply_async.assert_called_once()
+
+    def test_invalid_bid_not_queued(self):
+        """Test invalid bids and unknown listings are refused upfront"""
+        self.assertEqual(self.post_bid('abc').status_code, 400)
+        self.assertEqual(
+            self.post_bid('150.00', self.listing.id + 1).status_code, 404)
+        self.apply_async.assert_not_called()
+
+    @test.override_settings(BID_INTAKE_PARTITIONS=0)
+    def test_synchronous_bids(self):
+        """Test bids are placed by the API when the intake is disabled"""
+        self.assertEqual(self.post_bid('150.00').status_code, 201)
+        self.apply_async.assert_not_called()
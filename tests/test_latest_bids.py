@@ -0,0 +1,96 @@
+from decimal import Decimal
+from django import test
+from django.core.cache import cache
+from auctions import bidding, latest_bids, models
+from authentication import models as auth_models
+
+
+class SetUp(test.TestCase):
+    """Setup for latest bids testcase
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = auth_models.User.objects.create(
+            username='bidder', email='bidder@example.com', first_name="The", last_name="Bidder")
+        seller = auth_models.User.objects.create(
+            username='seller', email='seller@example.com', first_name="The", last_name="Seller")
+        category = models.Category.objects.create(name='music')
+        self.listing = models.Listing.objects.create(
+            author=seller,
+            title="Piano",
+            description="",
+            initial_price=100.00,
+            category=category,
+            duration=7
+        )
+
+    def bid(self, value):
+        with self.captureOnCommitCallbacks(execute=True):
+            return bidding.place_bid(self.listing.id, self.user, value)
+
+
+class LatestBidsTestCase(SetUp):
+
+    def test_rebuild_on_cold_cache(self):
+        """Check the buffer is rebuilt from the database when cold"""
+        for value in range(101, 104):
+            self.bid(value)
+        cache.clear()
+        summaries = latest_bids.get()
+        self.assertEqual(
+            [summary['value'] for summary in summaries],
+            [Decimal('103.00'), Decimal('102.00'), Decimal('101.00')])
+        self.assertEqual(summaries[0]['listing_title'], "Piano")
+        self.assertEqual(summaries[0]['username'], "bidder")
+
+    def test_push_keeps_latest_bids(self):
+        """Check new bids overwrite the oldest ones in the buffer"""
+        latest_bids.get()
+        for value in range(101, 110):
+            self.bid(value)
+        with self.assertNumQueries(0):
+            summaries = latest_bids.get()
+        self.assertEqual(
+            [summary['value'] for summary in summaries],
+            [Decimal(value) for value in range(109, 104, -1)])
+
+    def test_proxy_bids_pushed_without_queries(self):
+        """Check the bids answered by a proxy are pushed without a query
+        per bid
+        """
+        other = auth_models.User.objects.create(
+            username='other', email='other@example.com')
+        bidding.place_bid(self.listing.id, other, 110, 200)
+        latest_bids.get()
+        # Savepoint, UPDATE, locking SELECT, two INSERTs, UPDATE and the
+        # release.
+        with self.assertNumQueries(7), \
+                self.captureOnCommitCallbacks(execute=True):
+            bidding.place_bid(self.listing.id, self.user, 150)
+        summaries = latest_bids.get()
+        self.assertEqual(
+            [(summary['username'], summary['value'], summary['listing_title'])
+             for summary in summaries[:2]],
+            [('other', Decimal('151.00'), "Piano"),
+             ('bidder', Decimal('150.00'), "Piano")])
+
+    def test_withdrawn_bid(self):
+        """Check a withdrawn bid leaves the buffer"""
+        self.bid(101)
+        bid = self.bid(102)
+        latest_bids.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            bidding.withdraw_bid(bid)
+        self.assertEqual(
+            [summary['value'] for summary in latest_bids.get()],
+            [Decimal('101.00')])
+
+    def test_index_sidebar_queries(self):
+        """Test the index page sidebar costs no queries once cached"""
+        self.bid(101)
+        self.client.get('/auctions/')
+        # The listings page only
+        with self.assertNumQueries(1):
+            response = self.client.get('/auctions/')
+        self.assertContains(response, "$101.00 by bidder")
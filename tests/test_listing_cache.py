@@ -0,0 +1,93 @@
+from django import test
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from auctions import bidding, listing_cache, models
+from authentication import models as auth_models
+
+
+class SetUp(test.TestCase):
+    """Setup for listing cache testcase
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = auth_models.User.objects.create(
+            username='bidder', email='bidder@example.com', first_name="The", last_name="Bidder")
+        self.seller = auth_models.User.objects.create(
+            username='seller', email='seller@example.com', first_name="The", last_name="Seller")
+        category = models.Category.objects.create(name='music')
+        self.listing = models.Listing.objects.create(
+            author=self.seller,
+            title="Piano",
+            description="",
+            initial_price=100.00,
+            category=category,
+            duration=7
+        )
+        for i in range(5):
+            models.Question.objects.create(
+                listing=self.listing, user=self.user, body=f"Question {i}")
+        self.url = f'/auctions/listing/{self.listing.id}'
+        self.client.force_login(self.user)
+
+    def get(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.get(self.url)
+
+
+class ListingCacheTestCase(SetUp):
+
+    def test_cached_fragments_queries(self):
+        """Test the details page renders its fragments from the cache"""
+        with CaptureQueriesContext(connection) as cold:
+            self.get()
+        # Session, user, listing and watchlist membership
+        with self.assertNumQueries(4):
+            response = self.get()
+        self.assertLess(4, len(cold.captured_queries))
+        self.assertContains(response, "Question 4")
+        self.assertContains(response, "The Seller")
+
+    def test_bid_invalidates(self):
+        """Check a new bid bumps the listing version"""
+        version = listing_cache.version(self.listing.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            bidding.place_bid(self.listing.id, self.user, 150)
+        self.assertNotEqual(listing_cache.version(self.listing.id), version)
+
+    def test_question_invalidates(self):
+        """Check a new question shows on the cached details page"""
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            models.Question.objects.create(
+                listing=self.listing, user=self.user, body="Is it tuned?")
+        self.assertContains(self.get(), "Is it tuned?")
+
+    def test_answer_invalidates(self):
+        """Check answering a question bumps the listing version"""
+        question = models.Question.objects.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            question.answer = models.Answer.objects.create(
+                author=self.seller, body="Yes")
+            question.save()
+        version = listing_cache.version(self.listing.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            question.answer.body = "It is"
+            question.answer.save()
+        self.assertNotEqual(listing_cache.version(self.listing.id), version)
+
+    def test_listing_update_invalidates(self):
+        """Check saving a listing shows on the cached details page"""
+        self.get()
+        category = models.Category.objects.create(name='keyboards')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.listing.category = category
+            self.listing.save()
+        self.assertContains(self.get(), "Keyboards")
+
+    def test_watching(self):
+        """Test the watching state is not cached"""
+        self.get()
+        self.user.watchlist.add(self.listing)
+        self.assertContains(self.get(), "Unwatch")
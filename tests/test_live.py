@@ -0,0 +1,186 @@
+import asyncio
+import json
+from unittest import mock
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django import test
+from auctions import bidding, live, models
+from authentication import models as auth_models
+from commerce.asgi import application
+
+
+class SetUp(test.TransactionTestCase):
+    """Setup for live events testcase
+
+    The events are streamed from another thread, which needs to see the
+    data of the test, so it is committed.
+    """
+
+    def setUp(self):
+        self.user = auth_models.User.objects.create(
+            username='bidder', email='bidder@example.com', first_name="The", last_name="Bidder")
+        self.seller = auth_models.User.objects.create(
+            username='seller', email='seller@example.com', first_name="The", last_name="Seller")
+        category = models.Category.objects.create(name='music')
+        self.listing = models.Listing.objects.create(
+            author=self.seller,
+            title="Piano",
+            description="",
+            initial_price=100.00,
+            category=category,
+            duration=7
+        )
+
+    async def connect(self, pk):
+        communicator = ApplicationCommunicator(application, {
+            'type': 'http',
+            'method': 'GET',
+            'path': f'/auctions/listing/{pk}/events',
+            'headers': [],
+        })
+        await communicator.send_input({'type': 'http.request'})
+        return communicator
+
+    async def receive_event(self, communicator):
+        message = await communicator.receive_output(1)
+        event, data = message['body'].decode().strip().split('\n')
+        return event.removeprefix('event: '), json.loads(
+            data.removeprefix('data: '))
+
+    async def disconnect(self, communicator):
+        await communicator.send_input({'type': 'http.disconnect'})
+        await communicator.wait(1)
+
+    def bid(self, value):
+        bidding.place_bid(self.listing.id, self.user, value)
+
+    def close(self):
+        models.Listing.objects.filter(pk=self.listing.pk).close()
+
+    def answer(self):
+        question = models.Question.objects.create(
+            listing=self.listing, user=self.user, body="Is it tuned?")
+        question.answer = models.Answer.objects.create(
+            author=self.seller, body="Yes")
+        question.save()
+
+
+class LiveEventsTestCase(SetUp):
+
+    async def test_stream_headers(self):
+        """Test the events of a listing are streamed"""
+        communicator = await self.connect(self.listing.id)
+        start = await communicator.receive_output(1)
+        self.assertEqual(start['status'], 200)
+        self.assertIn(
+            (b'content-type', b'text/event-stream'), start['headers'])
+        retry = await communicator.receive_output(1)
+        self.assertEqual(retry['body'], b'retry: 3000\n\n')
+        await self.disconnect(communicator)
+
+    async def test_unknown_listing(self):
+        """Test the events of an unknown listing are not found"""
+        communicator = await self.connect(self.listing.id + 1)
+        start = await communicator.receive_output(1)
+        self.assertEqual(start['status'], 404)
+
+    async def test_bid_event(self):
+        """Check subscribers receive the new bids"""
+        communicator = await self.connect(self.listing.id)
+        await communicator.receive_output(1)
+        await communicator.receive_output(1)
+        await sync_to_async(self.bid)(150)
+        event, data = await self.receive_event(communicator)
+        self.assertEqual(event, 'bid')
+        self.assertEqual(data['value'], '150.00')
+        self.assertEqual(data['username'], 'bidder')
+        await self.disconnect(communicator)
+
+    async def test_close_event(self):
+        """Check subscribers receive the closing with its winner"""
+        await sync_to_async(self.bid)(150)
+        communicator = await self.connect(self.listing.id)
+        await communicator.receive_output(1)
+        await communicator.receive_output(1)
+        await sync_to_async(self.close)()
+        event, data = await self.receive_event(communicator)
+        self.assertEqual(event, 'close')
+        self.assertEqual(data['winner'], self.user.id)
+        await self.disconnect(communicator)
+
+    async def test_answer_event(self):
+        """Check subscribers receive the answers"""
+        communicator = await self.connect(self.listing.id)
+        await communicator.receive_output(1)
+        await communicator.receive_output(1)
+        await sync_to_async(self.answer)()
+        event, data = await self.receive_event(communicator)
+        self.assertEqual(event, 'answer')
+        self.assertEqual(data['body'], "Yes")
+        await self.disconnect(communicator)
+
+    async def test_other_listing_events(self):
+        """Check subscribers only receive the events of their listing"""
+        other = await sync_to_async(models.Listing.objects.create)(
+            author=self.seller, title="Drums", description="",
+            initial_price=10.00, category=self.listing.category, duration=7)
+        communicator = await self.connect(other.id)
+        await communicator.receive_output(1)
+        await communicator.receive_output(1)
+        await sync_to_async(self.bid)(150)
+        self.assertTrue(await communicator.receive_nothing(0.2))
+        await self.disconnect(communicator)
+
+
+class FakePubSub:
+    """Redis pub/sub connection of the broker testcase"""
+
+    def __init__(self):
+        self.channels = set()
+        self.messages = asyncio.Queue()
+
+    async def subscribe(self, channel):
+        self.channels.add(channel)
+
+    async def unsubscribe(self, channel):
+        self.channels.discard(channel)
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=0):
+        return await self.messages.get()
+
+    def publish(self, channel, data):
+        if channel in self.channels:
+            self.messages.put_nowait(
+                {'channel': channel.encode(), 'data': data.encode()})
+
+
+class RedisBrokerTestCase(test.SimpleTestCase):
+
+    async def test_shared_connection(self):
+        """Test the subscribers of a process share one pub/sub connection"""
+        pubsub = FakePubSub()
+        client = mock.Mock()
+        client.pubsub.return_value = pubsub
+        broker = live.RedisBroker('redis://localhost:6379/1')
+        with mock.patch.object(
+                live.aioredis.Redis, 'from_url',
+                return_value=client) as from_url:
+            first = await broker.subscribe('listing:1:events')
+            second = await broker.subscribe('listing:1:events')
+            other = await broker.subscribe('listing:2:events')
+        from_url.assert_called_once()
+        self.assertEqual(
+            pubsub.channels, {'listing:1:events', 'listing:2:events'})
+
+        pubsub.publish('listing:1:events', 'bid')
+        self.assertEqual(await asyncio.wait_for(first.get(), 1), 'bid')
+        self.assertEqual(await asyncio.wait_for(second.get(), 1), 'bid')
+        self.assertTrue(other.queue.empty())
+
+        await first.close()
+        self.assertIn('listing:1:events', pubsub.channels)
+        await second.close()
+        await other.close()
+        self.assertEqual(pubsub.channels, set())
+        broker._listener.task.cancel()
+        await asyncio.gather(broker._listener.task, return_exceptions=True)
@@ -0,0 +1,101 @@
+from django import test
+from django.core.cache import cache
+from auctions import models, tasks
+from authentication import models as auth_models
+from commerce import metrics
+
+
+class SetUp(test.TestCase):
+    """Setup for metrics testcase
+    """
+
+    def setUp(self):
+        cache.clear()
+        for metric in metrics.REGISTRY:
+            metric.clear()
+        self.staff = auth_models.User.objects.create(
+            username='staff', email='staff@example.com', is_staff=True)
+        seller = auth_models.User.objects.create(
+            username='seller', email='seller@example.com', first_name="The", last_name="Seller")
+        category = models.Category.objects.create(name='music')
+        self.listing = models.Listing.objects.create(
+            author=seller,
+            title="Piano",
+            description="",
+            initial_price=100.00,
+            category=category,
+            duration=7
+        )
+
+
+class MetricsTestCase(SetUp):
+
+    def test_request_metrics(self):
+        """Check the latency and queries of the requests are recorded by view"""
+        self.client.get(f'/auctions/listing/{self.listing.id}')
+        self.assertEqual(metrics.REQUEST_LATENCY.count(
+            view='listing', method='GET', status=200), 1)
+        self.assertEqual(metrics.REQUEST_QUERIES.count(view='listing'), 1)
+        _, queries = dict(metrics.REQUEST_QUERIES._items())[('listing',)]
+        self.assertGreater(queries, 0)
+
+    def test_unresolved_request(self):
+        """Check the requests matching no view are recorded"""
+        self.client.get('/nowhere')
+        self.assertEqual(metrics.REQUEST_LATENCY.count(
+            view='unresolved', method='GET', status=404), 1)
+
+    def test_cache_lookups(self):
+        """Check the cache hits and misses are counted"""
+        cache.set('present', 1)
+        cache.get('present')
+        cache.get('absent')
+        cache.get_many(['present', 'absent', 'missing'])
+        self.assertEqual(metrics.CACHE_REQUESTS.value(result='hit'), 2)
+        self.assertEqual(metrics.CACHE_REQUESTS.value(result='miss'), 3)
+
+    def test_task_runtime(self):
+        """Check the runtime of the tasks is recorded"""
+        tasks.set_listing_winner_task.apply(args=(self.listing.id,))
+        self.assertEqual(metrics.TASK_RUNTIME.count(
+            task='set_winner', state='SUCCESS'), 1)
+
+    def test_metrics_endpoint(self):
+        """Test the metrics are served in the Prometheus text format"""
+        self.client.get(f'/auctions/listing/{self.listing.id}')
+        tasks.set_listing_winner_task.apply(args=(self.listing.id,))
+        self.client.force_login(self.staff)
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith(
+            'text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn(
+            'http_request_duration_seconds_count'
+            '{view="listing",method="GET",status="200"} 1', body)
+        self.assertIn(
+            'http_request_db_queries_bucket{view="listing",le="+Inf"} 1', body)
+        self.assertIn(
+            'celery_task_duration_seconds_count'
+            '{task="set_winner",state="SUCCESS"} 1', body)
+        self.assertIn('cache_requests_total{result="miss"}', body)
+
+    @test.override_settings(METRICS_TOKEN='scraper-token')
+    def test_metrics_access(self):
+        """Test the metrics are denied to anonymous and non staff users"""
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.client.force_login(self.listing.author)
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.client.logout()
+        response = self.client.get(
+            '/metrics', HTTP_AUTHORIZATION='Bearer other-token')
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(
+            '/metrics', HTTP_AUTHORIZATION='Bearer scraper-token')
+        self.assertEqual(response.status_code, 200)
+
+    def test_metrics_without_token(self):
+        """Test an empty bearer token is refused when none is configured"""
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer ')
+        self.assertEqual(response.status_code, 403)
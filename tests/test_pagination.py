@@ -0,0 +1,120 @@
+from django import test
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from auctions import bidding, models
+from authentication import models as auth_models
+
+
+API_BASE_URL = "/auctions/api"
+
+
+class SetUp(test.TestCase):
+    """Setup for pagination testcase
+    """
+
+    def setUp(self):
+        self.user = auth_models.User.objects.create(
+            username='user1', email='user1@example.com', first_name="User", last_name="One")
+        category = models.Category.objects.create(name='music')
+
+        self.listings = []
+        for i in range(25):
+            listing = models.Listing.objects.create(
+                author=self.user,
+                title=f"Listing {i}",
+                description="",
+                initial_price=10.00,
+                category=category,
+                duration=7
+            )
+            self.listings.append(listing)
+            self.user.watchlist.add(listing)
+        # Share end times between listings, so the id breaks the ties.
+        end_time = timezone.now() + timezone.timedelta(days=1)
+        for i, listing in enumerate(self.listings):
+            listing.end_time = end_time + timezone.timedelta(hours=i // 3)
+        models.Listing.objects.bulk_update(self.listings, ['end_time'])
+
+        for i, listing in enumerate(self.listings[:12]):
+            bidding.place_bid(listing.id, self.user, 20 + i)
+
+    def walk(self, url, key='next'):
+        """Follows the pagination links and returns the pages"""
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.data.get('results'))
+            url = response.data.get(key)
+        return pages
+
+
+class APIPaginationTestCase(SetUp):
+
+    def test_listing_pages(self):
+        """Test walking the listing pages forward and backward"""
+        pages = self.walk(API_BASE_URL + '/listings/?page_size=4')
+        self.assertEqual([len(page) for page in pages], [4] * 6 + [1])
+        titles = [row.get('title') for page in pages for row in page]
+        self.assertEqual(
+            titles, [listing.title for listing in self.listings])
+
+        response = self.client.get(API_BASE_URL + '/listings/?page_size=4')
+        for _ in range(3):
+            response = self.client.get(response.data.get('next'))
+        previous = self.walk(response.data.get('previous'), key='previous')
+        titles = [row.get('title') for page in previous for row in page]
+        self.assertEqual(
+            sorted(titles), sorted(l.title for l in self.listings[:12]))
+
+    def test_bid_pages(self):
+        """Test the bids are paginated from the latest"""
+        self.client.force_login(self.user)
+        pages = self.walk(API_BASE_URL + '/bids/?page_size=5')
+        values = [row.get('value') for page in pages for row in page]
+        self.assertEqual(values, [f'{20 + i}.00' for i in range(11, -1, -1)])
+
+    def test_watchlist_pages(self):
+        """Test the watchlist is paginated"""
+        self.client.force_login(self.user)
+        pages = self.walk(
+            API_BASE_URL + f'/dashboard/{self.user.id}/watchlist/')
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+
+    def test_invalid_cursor(self):
+        """Test an invalid cursor is not found"""
+        response = self.client.get(API_BASE_URL + '/listings/?cursor=abc')
+        self.assertEqual(response.status_code, 404)
+
+
+class IndexPaginationTestCase(SetUp):
+
+    def test_index_pages(self):
+        """Test the index pages are navigated without counting"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/auctions/')
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries.captured_queries))
+
+        page = response.context['page_obj']
+        self.assertEqual(len(page), 10)
+        self.assertFalse(page.has_previous())
+        self.assertTrue(page.has_next())
+
+        response = self.client.get(
+            '/auctions/', {'cursor': page.next_cursor})
+        page = response.context['page_obj']
+        self.assertEqual(
+            list(page), self.listings[10:20])
+        self.assertTrue(page.has_previous())
+
+        response = self.client.get(
+            '/auctions/', {'cursor': page.previous_cursor})
+        self.assertEqual(
+            list(response.context['page_obj']), self.listings[:10])
+
+    def test_index_invalid_cursor(self):
+        """Test an invalid cursor on the index page"""
+        response = self.client.get('/auctions/', {'cursor': 'abc'})
+        self.assertEqual(response.status_code, 404)
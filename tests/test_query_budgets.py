@@ -0,0 +1,441 @@
+import json
+import contextlib
+from django import test
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.db.models import Prefetch
+from api import serializers
+from auctions import models
+from authentication import models as auth_models
+
+
+API_BASE_URL = "/auctions/api"
+
+LISTINGS = 40
+USERS = 12
+BIDS_PER_LISTING = 6
+QUESTIONS_PER_LISTING = 3
+
+
+class QueryBudgetMixin:
+    """Assertions on the number of queries run by a block or an endpoint
+    """
+
+    @contextlib.contextmanager
+    def assertQueryBudget(self, budget):
+        """Fails when the block runs more than `budget` queries, listing them
+        """
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        queries = context.captured_queries
+        if len(queries) > budget:
+            self.fail(
+                f"{len(queries)} queries run, over the budget of {budget}:\n" +
+                '\n'.join(
+                    f"{number}. {query['sql']}"
+                    for number, query in enumerate(queries, start=1)
+                )
+            )
+
+    def assertEndpointBudget(self, url, budget, method='get', **kwargs):
+        cache.clear()
+        with self.assertQueryBudget(budget) as context:
+            response = getattr(self.client, method)(url, **kwargs)
+            # Streamed responses run their queries as they are read.
+            content = b''.join(response.streaming_content) \
+                if response.streaming else response.content
+        self.assertLess(response.status_code, 400, content[:500])
+        return len(context.captured_queries)
+
+    def assertPageBudget(self, url, budget, page_sizes=(1, 50),
+                         page_size_param='page_size'):
+        """Checks each page size is in budget, and costs the same queries
+        """
+        separator = '&' if '?' in url else '?'
+        counts = {
+            page_size: self.assertEndpointBudget(
+                f'{url}{separator}{page_size_param}={page_size}', budget)
+            for page_size in page_sizes
+        }
+        self.assertEqual(
+            len(set(counts.values())), 1,
+            f"The queries of {url} depend on the page size: {counts}")
+
+
+class SetUp(QueryBudgetMixin, test.TestCase):
+    """Seeds many listings, bids and users for the query budgets testcase
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        users = auth_models.User.objects.bulk_create([
+            auth_models.User(
+                username=f'user{i}', email=f'user{i}@example.com',
+                first_name="User", last_name=str(i))
+            for i in range(USERS)
+        ])
+        cls.user = users[0]
+        categories = models.Category.objects.bulk_create([
+            models.Category(name=name) for name in ('music', 'toys')
+        ])
+        listings = models.Listing.objects.bulk_create([
+            models.Listing(
+                author=users[i % 2],
+                category=categories[i % 2],
+                title=f"Piano {i}",
+                description="An upright piano",
+                initial_price=10,
+                duration=7,
+                creation_time=now,
+                end_time=now + timezone.timedelta(days=i % 20 - 5),
+                closed=i % 20 < 5,
+                winner=users[i % 2 + 1] if i % 20 < 5 else None,
+                current_price=10 + BIDS_PER_LISTING,
+                current_bidder=users[BIDS_PER_LISTING],
+                current_bid_time=now,
+                bid_count=BIDS_PER_LISTING,
+            )
+            for i in range(LISTINGS)
+        ])
+        cls.listing = next(
+            listing for listing in listings
+            if listing.author == cls.user and not listing.closed)
+        models.Bid.objects.bulk_create([
+            models.Bid(
+                listing=listing, user=users[bidder],
+                value=10 + bidder, creation_time=now)
+            for listing in listings
+            for bidder in range(1, BIDS_PER_LISTING + 1)
+        ])
+        answers = models.Answer.objects.bulk_create([
+            models.Answer(author=listing.author, body="Yes")
+            for listing in listings
+            for _ in range(QUESTIONS_PER_LISTING)
+        ])
+        models.Question.objects.bulk_create([
+            models.Question(
+                listing=listing, user=users[-1], body="Is it tuned?",
+                answer=answers.pop())
+            for listing in listings
+            for _ in range(QUESTIONS_PER_LISTING)
+        ])
+        cls.user.watchlist.add(*listings)
+        users[1].watchlist.add(*listings)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+
+class APIQueryBudgetTestCase(SetUp):
+
+    def test_bids(self):
+        """Check the bids list is in budget"""
+        self.assertPageBudget(f'{API_BASE_URL}/bids/', 3)
+
+    def test_listings(self):
+        """Check the listings list and details are in budget"""
+        self.assertPageBudget(f'{API_BASE_URL}/listings/', 3)
+        self.assertPageBudget(f'{API_BASE_URL}/listings/?category=music', 3)
+        self.assertEndpointBudget(
+            f'{API_BASE_URL}/listings/{self.listing.id}/', 3)
+
+    def test_listing_create(self):
+        """Check creating a listing is in budget"""
+        self.assertEndpointBudget(f'{API_BASE_URL}/listings/', 4, 'post', data={
+            'title': "Guitar",
+            'description': "",
+            'category': self.listing.category_id,
+            'initial_price': 10,
+            'duration': 7,
+        })
+
+    def test_listing_watch(self):
+        """Check watching a listing is in budget"""
+        self.assertEndpointBudget(
+            f'{API_BASE_URL}/listings/watch/', 5, 'post',
+            data={'id': self.listing.id})
+
+    def test_listing_bids(self):
+        """Check the bids of a listing are in budget"""
+        url = f'{API_BASE_URL}/listings/{self.listing.id}/bids/'
+        self.assertEndpointBudget(url, 3)
+        bid = self.listing.bids.first()
+        self.assertEndpointBudget(f'{url}{bid.id}/', 3)
+
+    def test_listing_bid_create(self):
+        """Check bidding on a listing is in budget"""
+        self.client.force_login(auth_models.User.objects.get(username='user2'))
+        self.assertEndpointBudget(
+            f'{API_BASE_URL}/listings/{self.listing.id}/bids/', 6, 'post',
+            data={'value': 100})
+
+    def test_listing_questions(self):
+        """Check the questions of a listing are in budget"""
+        url = f'{API_BASE_URL}/listings/{self.listing.id}/questions/'
+        self.assertEndpointBudget(url, 3)
+        question = self.listing.questions.first()
+        self.assertEndpointBudget(f'{url}{question.id}/', 3)
+
+    def test_listing_question_create_and_answer(self):
+        """Check asking and answering a question are in budget"""
+        url = f'{API_BASE_URL}/listings/{self.listing.id}/questions/'
+        self.assertEndpointBudget(url, 4, 'post', data={'body': "Why?"})
+        question = self.listing.questions.filter(answer=None).get()
+        self.assertEndpointBudget(
+            f'{url}{question.id}/answer/', 6, 'post', data={'body': "Why not"})
+
+    def test_dashboard(self):
+        """Check the dashboard endpoints are in budget"""
+        url = f'{API_BASE_URL}/dashboard/{self.user.id}'
+        self.assertEndpointBudget(f'{url}/home/', 3)
+        self.assertPageBudget(f'{url}/watchlist/', 3)
+        self.assertPageBudget(f'{url}/wins/', 3)
+        self.assertPageBudget(
+            f'{url}/listings/', 4, page_size_param='limit')
+        self.assertPageBudget(f'{url}/bids/', 3)
+        self.assertEndpointBudget(f'{url}/listings/{self.listing.id}/', 4)
+
+    def test_dashboard_listing_update(self):
+        """Check updating a listing from the dashboard is in budget"""
+        self.assertEndpointBudget(
+            f'{API_BASE_URL}/dashboard/{self.user.id}/listings/'
+            f'{self.listing.id}/', 7, 'patch', data={'public': False},
+            content_type='application/json')
+
+
+class HTMLQueryBudgetTestCase(SetUp):
+
+    def test_listings_pages(self):
+        """Check the listings pages are in budget"""
+        self.assertEndpointBudget('/auctions/', 5)
+        self.assertEndpointBudget('/auctions/category/music', 5)
+        self.assertEndpointBudget('/auctions/watchlist', 5)
+        self.assertEndpointBudget('/auctions/?q=piano', 5)
+
+    def test_listing_page(self):
+        """Check the listing page is in budget"""
+        self.assertEndpointBudget(f'/auctions/listing/{self.listing.id}', 7)
+
+    def test_create(self):
+        """Check the create page and its form are in budget"""
+        self.assertEndpointBudget('/auctions/create', 4)
+        self.assertEndpointBudget('/auctions/create', 5, 'post', data={
+            'title': "Guitar",
+            'description': "",
+            'category': self.listing.category_id,
+            'initial_price': 10,
+            'duration': 7,
+        })
+
+    def test_listing_actions(self):
+        """Check bidding, asking, watching and closing are in budget"""
+        pk = self.listing.id
+        self.assertEndpointBudget(f'/auctions/watch/{pk}', 5, 'post')
+        self.assertEndpointBudget(
+            f'/auctions/question/{pk}', 4, 'post', data={'body': "Why?"})
+        self.assertEndpointBudget(f'/auctions/close/{pk}', 11, 'post')
+        self.client.force_login(auth_models.User.objects.get(username='user2'))
+        self.assertEndpointBudget(
+            f'/auctions/bid/{pk}', 7, 'post', data={'value': 100})
+
+
+class QueryBudgetHarnessTestCase(SetUp):
+
+    def test_over_budget(self):
+        """Test an exceeded budget fails with the queries run"""
+        with self.assertRaises(AssertionError) as context:
+            with self.assertQueryBudget(1):
+                list(models.Listing.objects.all()[:1])
+                list(models.Bid.objects.all()[:1])
+        message = str(context.exception)
+        self.assertIn("2 queries run, over the budget of 1", message)
+        self.assertIn('1. SELECT', message)
+        self.assertIn('"auctions_bid"', message)
+
+
+class SparseFieldsTestCase(SetUp):
+
+    def get_sparse(self, url, expected_fields, budget):
+        """Gets `url` in budget, checks its fields, and returns its data
+        and the SQL it ran.
+        """
+        cache.clear()
+        with self.assertQueryBudget(budget) as context:
+            response = self.client.get(url)
+            content = b''.join(response.streaming_content) \
+                if response.streaming else response.content
+        self.assertEqual(response.status_code, 200, content[:500])
+        data = json.loads(content)
+        results = data.get('results', data) if isinstance(data, dict) else data
+        for result in results if isinstance(results, list) else [results]:
+            self.assertEqual(list(result), expected_fields)
+        return data, ' '.join(
+            query['sql'] for query in context.captured_queries)
+
+    def test_listings(self):
+        """Check the listings list selects only the requested columns"""
+        data, sql = self.get_sparse(
+            f'{API_BASE_URL}/listings/?fields=title,end_time&page_size=5',
+            ['title', 'end_time'], 3)
+        self.assertNotIn('JOIN', sql)
+        self.assertNotIn('"description"', sql)
+        # The cursor still carries the ordering keys.
+        self.get_sparse(data['next'], ['title', 'end_time'], 3)
+
+        _, sql = self.get_sparse(
+            f'{API_BASE_URL}/listings/?omit=current_bid,url,description',
+            ['title', 'category', 'initial_price', 'public', 'end_time'], 3)
+        self.assertNotIn('JOIN', sql)
+
+    def test_listing_detail(self):
+        """Check the listing details skip the joins of omitted fields"""
+        _, sql = self.get_sparse(
+            f'{API_BASE_URL}/listings/{self.listing.id}/?fields=id,title',
+            ['id', 'title'], 3)
+        self.assertNotIn('JOIN', sql)
+        _, sql = self.get_sparse(
+            f'{API_BASE_URL}/listings/{self.listing.id}/?fields=category',
+            ['category'], 3)
+        self.assertIn('JOIN "auctions_category"', sql)
+        self.assertEqual(sql.count('JOIN'), 1)
+
+    def test_dashboard_listing(self):
+        """Check omitting the bids of a listing skips their prefetch"""
+        url = f'{API_BASE_URL}/dashboard/{self.user.id}/listings/' \
+            f'{self.listing.id}/'
+        self.get_sparse(
+            f'{url}?fields=title,public', ['title', 'public'], 4)
+        self.assertEndpointBudget(url, 4)
+
+    def test_bids(self):
+        """Check the bids skip the joins of omitted fields, and nested
+        representations stay whole
+        """
+        _, sql = self.get_sparse(
+            f'{API_BASE_URL}/bids/?omit=listing', ['user', 'value', 'on'], 3)
+        self.assertNotIn('"auctions_listing"', sql)
+        data, _ = self.get_sparse(
+            f'{API_BASE_URL}/bids/?fields=listing', ['listing'], 3)
+        self.assertIn('current_bid', data['results'][0]['listing'])
+
+        _, sql = self.get_sparse(
+            f'{API_BASE_URL}/listings/{self.listing.id}/bids/?fields=value',
+            ['value'], 3)
+        self.assertNotIn('JOIN', sql)
+
+    def test_questions(self):
+        """Check the questions skip the joins of omitted fields"""
+        _, sql = self.get_sparse(
+            f'{API_BASE_URL}/listings/{self.listing.id}/questions/'
+            '?fields=id,body', ['id', 'body'], 3)
+        self.assertNotIn('JOIN', sql)
+
+    def test_writes_not_pruned(self):
+        """Test the fields of a write are not pruned"""
+        response = self.client.post(
+            f'{API_BASE_URL}/listings/{self.listing.id}/questions/'
+            '?fields=id', {'body': "Why?"})
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('body', response.json())
+
+
+class BatchListingsTestCase(SetUp):
+
+    def test_batch(self):
+        """Check the listings are retrieved in order, with their missing ids"""
+        listings = list(models.Listing.objects.active().order_by('-id'))
+        hidden = models.Listing.objects.exclude(
+            pk__in=[listing.pk for listing in listings]).first()
+        unknown = models.Listing.objects.order_by('-id').first().pk + 1
+        ids = [listings[3].pk, unknown, listings[0].pk, hidden.pk,
+               listings[3].pk]
+        cache.clear()
+        with self.assertQueryBudget(3):
+            response = self.client.get(
+                f'{API_BASE_URL}/listings/batch/',
+                {'ids': ','.join(map(str, ids))})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(
+            [result['id'] for result in results],
+            [listings[3].pk, listings[0].pk])
+        self.assertEqual(response.json()['missing'], [unknown, hidden.pk])
+        detail = self.client.get(
+            f'{API_BASE_URL}/listings/{listings[3].pk}/').json()
+        self.assertEqual(results[0], detail)
+
+    def test_batch_budget(self):
+        """Check the queries of a batch do not depend on its size"""
+        ids = list(models.Listing.objects.active().values_list('id', flat=True))
+        for size in (1, len(ids)):
+            self.assertEndpointBudget(
+                f'{API_BASE_URL}/listings/batch/?ids='
+                f'{",".join(map(str, ids[:size]))}', 3)
+        self.assertEndpointBudget(
+            f'{API_BASE_URL}/listings/batch/?ids={ids[0]}&fields=id,title', 3)
+
+    def test_invalid_batch(self):
+        """Test invalid, missing and too many ids are refused"""
+        url = f'{API_BASE_URL}/listings/batch/'
+        for ids in ('', 'one,2', ','.join(map(str, range(1, 102))),
+                    '1,99999999999999999999999', str(2 ** 63), '0', '-1'):
+            response = self.client.get(url, {'ids': ids})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('ids', response.json())
+
+
+class QuerysetHooksTestCase(SetUp):
+
+    def get_related(self, serializer_class):
+        request = test.RequestFactory().get('/')
+        return serializer_class(context={'request': request}).get_related()
+
+    def test_nested_relations(self):
+        """Test the relations of nested serializers are derived"""
+        select, prefetch, _ = self.get_related(serializers.BidSerializer)
+        self.assertEqual(
+            select, ['listing', 'listing__current_bidder', 'user'])
+        self.assertEqual(prefetch, [])
+        select, _, _ = self.get_related(serializers.QuestionSerializer)
+        self.assertEqual(select, ['user', 'answer', 'answer__author'])
+
+    def test_nested_lists_prefetched(self):
+        """Test nested lists are prefetched with their own relations"""
+        select, prefetch, _ = self.get_related(
+            serializers.ListingUpdateSerializer)
+        self.assertEqual(select, ['category'])
+        [bids] = prefetch
+        self.assertIsInstance(bids, Prefetch)
+        self.assertEqual(bids.prefetch_to, 'bids')
+        self.assertEqual(bids.queryset.query.select_related, {'user': {}})
+
+    def test_dashboard_annotations(self):
+        """Check the dashboard counts are annotated, and match the rows"""
+        bidder = auth_models.User.objects.get(username='user1')
+        self.client.force_login(bidder)
+        cache.clear()
+        with self.assertQueryBudget(3):
+            response = self.client.get(
+                f'{API_BASE_URL}/dashboard/{bidder.id}/home/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['listings_count'],
+                         bidder.listings.count())
+        self.assertEqual(response.json()['bids_count'], LISTINGS)
+        self.assertEndpointBudget(
+            f'{API_BASE_URL}/dashboard/{bidder.id}/home/?fields=listings', 3)
+
+    def test_nested_lists_budget(self):
+        """Check the nested bids of a listing cost one query, whatever their
+        number
+        """
+        url = f'{API_BASE_URL}/dashboard/{self.user.id}/listings/' \
+            f'{self.listing.id}/'
+        before = self.assertEndpointBudget(url, 4)
+        models.Bid.objects.bulk_create([
+            models.Bid(listing=self.listing, user=user, value=100)
+            for user in auth_models.User.objects.exclude(pk=self.user.pk)
+        ])
+        self.assertEqual(self.assertEndpointBudget(url, 4), before)
@@ -0,0 +1,129 @@
+import random
+import re
+from django import test
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+from auctions import models
+from authentication import models as auth_models
+
+
+# Tables big enough for a sequential scan to matter.
+LARGE_TABLES = ('auctions_listing', 'auctions_bid')
+
+SEQUENTIAL_SCAN = {
+    # "SCAN auctions_listing" without "USING ... INDEX"
+    'sqlite': r'\bSCAN (?P<table>\w+)\b(?! USING)',
+    'postgresql': r'Seq Scan on (?P<table>\w+)',
+}
+
+
+class SetUp(test.TestCase):
+    """Seeds large listings and bids tables for the query plans testcase
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(0)
+        now = timezone.now()
+        users = auth_models.User.objects.bulk_create([
+            auth_models.User(username=f'user{i}', email=f'user{i}@example.com')
+            for i in range(50)
+        ])
+        categories = models.Category.objects.bulk_create([
+            models.Category(name=f'category{i}') for i in range(20)
+        ])
+        listings = models.Listing.objects.bulk_create([
+            models.Listing(
+                author=rng.choice(users),
+                category=rng.choice(categories),
+                title=f"Listing {i}",
+                initial_price=10,
+                duration=7,
+                creation_time=now,
+                end_time=now + timezone.timedelta(
+                    minutes=rng.randint(-7 * 24 * 60, 30 * 24 * 60)),
+                public=rng.random() > 0.05,
+                ended_manually=rng.random() < 0.05,
+                closed=rng.random() < 0.2,
+            )
+            for i in range(5000)
+        ])
+        models.Bid.objects.bulk_create([
+            models.Bid(
+                listing=rng.choice(listings),
+                user=rng.choice(users),
+                value=rng.randint(11, 10_000),
+                creation_time=now - timezone.timedelta(
+                    seconds=rng.randint(0, 30 * 24 * 60 * 60)),
+            )
+            for _ in range(20000)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        cls.user = users[0]
+        cls.listing = listings[0]
+        cls.now = now
+
+    def assertNoSequentialScan(self, queryset):
+        """Fails when the plan of the queryset scans a large table"""
+        plan = queryset.explain()
+        pattern = SEQUENTIAL_SCAN.get(connection.vendor)
+        if pattern is None:
+            self.skipTest(f"No plan parser for {connection.vendor}")
+        scans = {
+            match.group('table') for match in re.finditer(pattern, plan)
+        } & set(LARGE_TABLES)
+        self.assertFalse(
+            scans,
+            f"Sequential scan on {', '.join(sorted(scans))}:\n{plan}\n\n"
+            f"{queryset.query}"
+        )
+
+
+class QueryPlansTestCase(SetUp):
+
+    def test_active_listings(self):
+        """Check the active listings page uses an index"""
+        self.assertNoSequentialScan(
+            models.Listing.objects.active().order_by('end_time', 'id')[:11])
+
+    def test_active_listings_next_page(self):
+        """Check the active listings pages after the first use an index"""
+        end_time = self.now + timezone.timedelta(days=3)
+        self.assertNoSequentialScan(
+            models.Listing.objects.active().filter(
+                Q(end_time__gt=end_time) |
+                Q(end_time=end_time, id__gt=self.listing.id)
+            ).order_by('end_time', 'id')[:11])
+
+    def test_category_listings(self):
+        """Check the category listings page uses an index"""
+        self.assertNoSequentialScan(
+            models.Listing.objects.from_category('category3').order_by(
+                'end_time', 'id')[:11])
+
+    def test_top_bid(self):
+        """Check the top bid lookup uses an index"""
+        self.assertNoSequentialScan(
+            models.Bid.objects.filter(
+                listing=self.listing).order_by('-value')[:1])
+
+    def test_latest_bids(self):
+        """Check the bids list uses an index"""
+        self.assertNoSequentialScan(
+            models.Bid.objects.order_by('-creation_time', '-id')[:11])
+
+    def test_user_bids(self):
+        """Check the dashboard bids list uses an index"""
+        self.assertNoSequentialScan(
+            models.Bid.objects.filter(user=self.user).order_by(
+                '-creation_time', '-id')[:11])
+
+    def test_finished_listings(self):
+        """Check the closing sweeper uses an index"""
+        self.assertNoSequentialScan(
+            models.Listing.objects.filter(
+                closed=False, end_time__lte=self.now
+            ).order_by('end_time').values_list('pk')[:500])
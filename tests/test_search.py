@@ -0,0 +1,89 @@
+import unittest
+from django import test
+from django.db import connection
+from auctions import models, search
+from authentication import models as auth_models
+
+
+class SetUp(test.TestCase):
+    """Setup for search testcase
+    """
+
+    def setUp(self):
+        self.user = auth_models.User.objects.create(
+            username='user1', email='user1@example.com', first_name="User", last_name="One")
+        other = auth_models.User.objects.create(
+            username='user2', email='user2@example.com', first_name="User", last_name="Two")
+        category = models.Category.objects.create(name='music')
+
+        def create(author, title, description, public=True):
+            return models.Listing.objects.create(
+                author=author,
+                title=title,
+                description=description,
+                initial_price=100.00,
+                category=category,
+                duration=7,
+                public=public
+            )
+
+        self.guitar = create(other, "Electric guitar", "Six strings")
+        self.amplifier = create(
+            other, "Amplifier", "Works with any electric guitar")
+        self.drums = create(other, "Drum kit", "Five pieces")
+        self.private = create(
+            self.user, "Acoustic guitar", "Never played", public=False)
+
+
+class SearchTestCase(SetUp):
+
+    def test_search_title_and_description(self):
+        """Check search matches both titles and descriptions"""
+        results = models.Listing.objects.search('guitar')
+        self.assertEqual(set(results), {self.guitar, self.amplifier})
+
+    def test_search_excludes_private_listings(self):
+        """Check search does not return private listings of others"""
+        results = models.Listing.objects.search('acoustic')
+        self.assertFalse(results.exists())
+
+    def test_search_includes_own_private_listings(self):
+        """Check search returns the private listings of the given user"""
+        results = models.Listing.objects.search('guitar', user=self.user)
+        self.assertEqual(
+            set(results), {self.guitar, self.amplifier, self.private})
+
+    def test_index_search(self):
+        """Test the index page search"""
+        response = self.client.get('/auctions/', {'q': 'drum'})
+        self.assertEqual(list(response.context['page_obj']), [self.drums])
+
+    @unittest.skipUnless(
+        connection.vendor == 'postgresql', "Requires PostgreSQL")
+    def test_search_ranking(self):
+        """Check title matches rank above description matches"""
+        self.assertIsInstance(
+            search.get_backend(), search.PostgresSearchBackend)
+        results = models.Listing.objects.search('guitar')
+        self.assertEqual(list(results), [self.guitar, self.amplifier])
+
+    @unittest.skipUnless(
+        connection.vendor == 'postgresql', "Requires PostgreSQL")
+    def test_search_vector_updated_on_save(self):
+        """Check the search vector follows title changes"""
+        self.drums.title = "Cymbals"
+        self.drums.save()
+        results = models.Listing.objects.search('cymbal')
+        self.assertEqual(list(results), [self.drums])
+
+    @unittest.skipUnless(
+        connection.vendor == 'postgresql', "Requires PostgreSQL")
+    def test_search_pagination(self):
+        """Test ranked search results are paginated in relevance order"""
+        response = self.client.get(
+            '/auctions/api/listings/', {'q': 'guitar', 'page_size': 1})
+        self.assertEqual(response.data['results'][0]['title'], self.guitar.title)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(
+            response.data['results'][0]['title'], self.amplifier.title)
+        self.assertIsNone(response.data['next'])
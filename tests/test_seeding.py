@@ -0,0 +1,107 @@
+from io import StringIO
+from unittest import mock
+from django import test
+from django.core import management
+from django.db.models import Count, F, Max
+from auctions import bidding, models, seeding
+from authentication import models as auth_models
+
+
+OPTIONS = {
+    'users': 50,
+    'categories': 5,
+    'listings': 120,
+    'bids': 1500,
+    'watches': 600,
+    'questions': 200,
+    'batch_size': 50,
+}
+
+
+class SeedingTestCase(test.TestCase):
+
+    def seed(self, **options):
+        seeder = seeding.Seeder(seeding.Options(**{**OPTIONS, **options}))
+        return seeder.run()[0]
+
+    def test_rows(self):
+        """Check the requested rows are inserted"""
+        counts = self.seed()
+        self.assertEqual(auth_models.User.objects.count(), 50)
+        self.assertEqual(models.Category.objects.count(), 5)
+        self.assertEqual(models.Listing.objects.count(), 120)
+        self.assertEqual(models.Bid.objects.count(), counts['bids'])
+        self.assertAlmostEqual(counts['bids'], 1500, delta=150)
+        self.assertEqual(
+            models.Listing.watchers.through.objects.count(), counts['watches'])
+        self.assertEqual(models.Question.objects.count(), counts['questions'])
+        self.assertEqual(
+            models.Question.objects.exclude(answer=None).count(),
+            counts['answers'])
+
+    def test_deterministic(self):
+        """Check the same seed gives the same data"""
+        self.seed()
+        first = list(models.Bid.objects.order_by('id').values_list(
+            'listing_id', 'user_id', 'value'))
+        models.Listing.objects.all().delete()
+        auth_models.User.objects.all().delete()
+        self.seed()
+        offset = models.Listing.objects.order_by('id').first().id - 1
+        users_offset = auth_models.User.objects.order_by('id').first().id - 1
+        second = list(models.Bid.objects.order_by('id').values_list(
+            'listing_id', 'user_id', 'value'))
+        self.assertEqual(
+            [(listing - offset, user - users_offset, value)
+             for listing, user, value in second],
+            first)
+
+    def test_consistent_current_bids(self):
+        """Check the denormalized bid columns and the winners are in sync"""
+        self.seed()
+        self.assertEqual(bidding.reconcile_listings(dry_run=True), 0)
+        self.assertFalse(models.Bid.objects.filter(
+            user=F('listing__author')).exists())
+        closed = models.Listing.objects.filter(closed=True, bid_count__gt=0)
+        self.assertTrue(closed.exists())
+        self.assertFalse(closed.exclude(winner=F('current_bidder')).exists())
+
+    def test_skewed_popularity(self):
+        """Check a few listings get a large share of the bids"""
+        self.seed()
+        counts = sorted(models.Listing.objects.values_list(
+            'bid_count', flat=True), reverse=True)
+        self.assertGreater(sum(counts[:12]), sum(counts) * 0.3)
+
+    def test_bypasses_signals(self):
+        """Check no signal handler runs for the seeded rows"""
+        with mock.patch('auctions.listing_cache.bump') as bump:
+            self.seed()
+        bump.assert_not_called()
+
+    def test_sequences(self):
+        """Check rows created after seeding get new primary keys"""
+        self.seed()
+        last = models.Listing.objects.aggregate(last=Max('id'))['last']
+        listing = models.Listing.objects.create(
+            author=auth_models.User.objects.first(),
+            category=models.Category.objects.first(),
+            title="Piano",
+            initial_price=10,
+            duration=7,
+        )
+        self.assertGreater(listing.id, last)
+
+    def test_command(self):
+        """Test the seed_auctions command reports its throughput"""
+        out = StringIO()
+        management.call_command(
+            'seed_auctions', '--users=10', '--categories=2', '--listings=20',
+            '--bids=100', '--watches=20', '--questions=10', '--seed=1',
+            stdout=out)
+        self.assertEqual(models.Listing.objects.count(), 20)
+        self.assertIn('rows/s', out.getvalue())
+        self.assertIn('listings               20', out.getvalue())
+        self.assertEqual(
+            models.Listing.objects.annotate(bids_total=Count('bids')).exclude(
+                bids_total=F('bid_count')).count(), 0)
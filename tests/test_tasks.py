@@ -0,0 +1,101 @@
+from decimal import Decimal
+from django import test
+from django.utils import timezone
+from auctions import bidding, models, tasks
+from authentication import models as auth_models
+
+
+class SetUp(test.TestCase):
+    """Setup for tasks testcase
+    """
+
+    def setUp(self):
+        self.seller = auth_models.User.objects.create(
+            username='seller', email='seller@example.com', first_name="The", last_name="Seller")
+        self.bidder = auth_models.User.objects.create(
+            username='bidder', email='bidder@example.com', first_name="The", last_name="Bidder")
+        category = models.Category.objects.create(name='toys')
+
+        self.listings = []
+        for i in range(5):
+            listing = models.Listing.objects.create(
+                author=self.seller,
+                description="",
+                title=f"Test {i}",
+                initial_price=10.00,
+                category=category,
+                duration=3
+            )
+            bidding.place_bid(listing.id, self.bidder, Decimal('20.00'))
+            self.listings.append(listing)
+
+        # Finish the first three auctions
+        models.Listing.objects.filter(
+            pk__in=[listing.pk for listing in self.listings[:3]]
+        ).update(end_time=timezone.now() - timezone.timedelta(minutes=1))
+
+
+class CloseFinishedListingsTestCase(SetUp):
+
+    def test_close_finished_listings(self):
+        """Check the sweeper closes the finished listings in batches"""
+        closed = tasks.close_finished_listings_task(batch_size=2)
+        self.assertEqual(closed, 3)
+        finished = models.Listing.objects.filter(closed=True)
+        self.assertEqual(finished.count(), 3)
+        self.assertEqual(
+            set(finished.values_list('winner', flat=True)), {self.bidder.pk})
+        self.assertFalse(
+            models.Listing.objects.filter(
+                closed=False, winner__isnull=False).exists())
+
+    def test_close_finished_listings_is_idempotent(self):
+        """Check a second sweep does not close listings again"""
+        tasks.close_finished_listings_task()
+        self.assertEqual(tasks.close_finished_listings_task(), 0)
+
+    def test_close_finished_listings_max_batches(self):
+        """Check the sweeper stops after the given number of batches"""
+        closed = tasks.close_finished_listings_task(
+            batch_size=1, max_batches=2)
+        self.assertEqual(closed, 2)
+
+    def test_manual_ending(self):
+        """Check ending a listing manually declares its winner"""
+        listing = self.listings[4]
+        listing.ended_manually = True
+        listing.save(update_fields=['ended_manually'])
+        listing.refresh_from_db()
+        self.assertTrue(listing.closed)
+        self.assertEqual(listing.winner, self.bidder)
+
+
+class ResolveWinnersTestCase(SetUp):
+
+    def test_resolve_winners(self):
+        """Check the author of the highest bid of each listing wins"""
+        other = auth_models.User.objects.create(
+            username='other', email='other@example.com', first_name="Other", last_name="Bidder")
+        bidding.place_bid(self.listings[4].id, other, Decimal('30.00'))
+        resolved = models.Listing.objects.all().resolve_winners()
+        self.assertEqual(resolved, 5)
+        winners = dict(models.Listing.objects.values_list('pk', 'winner'))
+        self.assertEqual(winners[self.listings[4].pk], other.pk)
+        self.assertEqual(winners[self.listings[0].pk], self.bidder.pk)
+
+    def test_resolve_winners_tie(self):
+        """Check the earliest of two equal bids wins"""
+        other = auth_models.User.objects.create(
+            username='other', email='other@example.com', first_name="Other", last_name="Bidder")
+        listing = self.listings[0]
+        models.Bid.objects.create(
+            listing=listing, user=other, value=Decimal('20.00'))
+        models.Listing.objects.filter(pk=listing.pk).resolve_winners()
+        listing.refresh_from_db()
+        self.assertEqual(listing.winner, self.bidder)
+
+    def test_resolve_winners_queries(self):
+        """Check the winners of many listings are resolved in constant queries"""
+        # Top bids query and one bulk update
+        with self.assertNumQueries(2):
+            models.Listing.objects.all().resolve_winners()
@@ -1,6 +1,6 @@
 from django import test
 from django.db.models import Max
-from auctions import models, views
+from auctions import bidding, models
 from authentication import models as auth_models
 
 
@@ -67,13 +67,13 @@ class SetUp(test.TestCase):
         )
 
         # Set bids
-        models.Bid.objects.create(listing=l5, user=u1, value=11000.00)
-        models.Bid.objects.create(listing=l4, user=u2, value=500.00)
-        models.Bid.objects.create(listing=l3, user=u2, value=550.00)
-        models.Bid.objects.create(listing=l2, user=u1, value=600.00)
-        models.Bid.objects.create(listing=l1, user=u3, value=1500.00)
-        models.Bid.objects.create(listing=l2, user=u3, value=12000.00)
-        models.Bid.objects.create(listing=l1, user=u2, value=2000.00)
+        bidding.place_bid(l5.id, u1, 11000.00)
+        bidding.place_bid(l4.id, u2, 500.00)
+        bidding.place_bid(l3.id, u2, 550.00)
+        bidding.place_bid(l2.id, u1, 600.00)
+        bidding.place_bid(l1.id, u3, 1500.00)
+        bidding.place_bid(l2.id, u3, 12000.00)
+        bidding.place_bid(l1.id, u2, 2000.00)
 
         # Set watchlists
         u2.watchlist.add(l1)
@@ -0,0 +1,161 @@
+from unittest import mock
+from django import test
+from django.core.cache import cache, caches
+from auctions import models, throttling
+from authentication import models as auth_models
+
+
+API_BASE_URL = "/auctions/api"
+
+RATES = {
+    'bids.user': '2/min',
+    'bids.ip': '3/min',
+    'watch.user': '2/min',
+    'search.ip': '2/min',
+}
+
+
+@test.override_settings(THROTTLE_RATES=RATES)
+class SetUp(test.TestCase):
+    """Setup for throttling testcase
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = auth_models.User.objects.create(
+            username='bidder1', email='bidder1@example.com', first_name="Bidder", last_name="One")
+        self.other = auth_models.User.objects.create(
+            username='bidder2', email='bidder2@example.com', first_name="Bidder", last_name="Two")
+        category = models.Category.objects.create(name='music')
+        self.listing = models.Listing.objects.create(
+            author=self.user,
+            title="Piano",
+            description="",
+            initial_price=100.00,
+            category=category,
+            duration=7
+        )
+
+    def post_bid(self, value):
+        return self.client.post(
+            API_BASE_URL + f'/listings/{self.listing.id}/bids/',
+            {'value': value},
+            content_type='application/json',
+        )
+
+
+class TokenBucketTestCase(SetUp):
+
+    def test_bucket_refills(self):
+        """Check a bucket lets a burst through and then refills"""
+        buckets = throttling.buckets('bids', user_id=1)
+        self.assertEqual(throttling.consume(buckets), 0)
+        self.assertEqual(throttling.consume(buckets), 0)
+        self.assertAlmostEqual(throttling.consume(buckets), 30, places=1)
+        # Half a minute later, one token is back.
+        key = buckets[0].key
+        tokens, updated = cache.get(key)
+        cache.set(key, (tokens, updated - 30))
+        self.assertEqual(throttling.consume(buckets), 0)
+
+    def test_unconfigured_scope(self):
+        """Check scopes without rates are not throttled"""
+        self.assertEqual(throttling.buckets('watch', ip='127.0.0.1'), [])
+
+    def test_parse_rate(self):
+        """Check the rates are parsed into capacity and period"""
+        self.assertEqual(throttling.parse_rate('30/min'), (30, 60))
+        self.assertEqual(throttling.parse_rate('1000/day'), (1000, 86400))
+
+    @test.override_settings(CACHES={'default': {
+        'BACKEND': 'commerce.cache.RedisCache',
+        'LOCATION': 'redis://localhost:6379/1',
+    }})
+    def test_redis_script(self):
+        """Check the Redis cache takes the tokens with one script call"""
+        backend = caches['default']
+        client = mock.Mock()
+        client.register_script.return_value.return_value = b'12.5'
+        with mock.patch.object(
+                backend._cache, 'get_client', return_value=client):
+            wait = throttling.consume(
+                throttling.buckets('bids', user_id=1, ip='127.0.0.1'))
+        self.assertEqual(wait, 12.5)
+        client.register_script.assert_called_once_with(
+            throttling.TOKEN_BUCKET_SCRIPT)
+        script = client.register_script.return_value
+        script.assert_called_once_with(
+            keys=[
+                backend.make_key('throttle:bids:user:1'),
+                backend.make_key('throttle:bids:ip:127.0.0.1'),
+            ],
+            args=[2, 2 / 60, 3, 3 / 60])
+
+
+class APIThrottlingTestCase(SetUp):
+
+    def test_bids_throttled_per_user(self):
+        """Test the bids of a user are throttled with a Retry-After"""
+        self.client.force_login(self.user)
+        self.assertEqual(self.post_bid('110.00').status_code, 201)
+        self.assertEqual(self.post_bid('120.00').status_code, 201)
+        response = self.post_bid('130.00')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+
+    def test_bids_throttled_per_ip(self):
+        """Test the bids from an address are throttled across users"""
+        self.client.force_login(self.user)
+        self.post_bid('110.00')
+        self.post_bid('120.00')
+        self.client.force_login(self.other)
+        self.assertEqual(self.post_bid('130.00').status_code, 201)
+        self.assertEqual(self.post_bid('140.00').status_code, 429)
+
+    def test_bids_list_not_throttled(self):
+        """Test reading the bids of a listing is not throttled"""
+        self.client.force_login(self.user)
+        for _ in range(4):
+            response = self.client.get(
+                API_BASE_URL + f'/listings/{self.listing.id}/bids/')
+            self.assertEqual(response.status_code, 200)
+
+    def test_watch_throttled(self):
+        """Test the watch action is throttled"""
+        self.client.force_login(self.user)
+        for status in (200, 200, 429):
+            response = self.client.post(
+                API_BASE_URL + '/listings/watch/', {'id': self.listing.id})
+            self.assertEqual(response.status_code, status)
+
+    def test_search_throttled(self):
+        """Test only the listings searches are throttled"""
+        for _ in range(3):
+            self.client.get(API_BASE_URL + '/listings/')
+        for status in (200, 200, 429):
+            response = self.client.get(
+                API_BASE_URL + '/listings/', {'q': 'piano'})
+            self.assertEqual(response.status_code, status)
+
+
+class ViewsThrottlingTestCase(SetUp):
+
+    def test_bid_view_throttled(self):
+        """Test the bid view is throttled with a Retry-After"""
+        self.client.force_login(self.user)
+        for value in ('110.00', '120.00'):
+            response = self.client.post(
+                f'/auctions/bid/{self.listing.id}', {'value': value})
+            self.assertEqual(response.status_code, 302)
+        response = self.client.post(
+            f'/auctions/bid/{self.listing.id}', {'value': '130.00'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+
+    def test_index_search_throttled(self):
+        """Test the index page is throttled on searches only"""
+        for _ in range(3):
+            self.assertEqual(self.client.get('/auctions/').status_code, 200)
+        for status in (200, 200, 429):
+            response = self.client.get('/auctions/', {'q': 'piano'})
+            self.assertEqual(response.status_code, status)